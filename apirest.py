@@ -3,16 +3,21 @@ API REST - Mottu Tracking System
 Flask API para integração com Mobile App, Java, .NET, etc.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, timedelta
 from typing import Dict, List
+import atexit
 import logging
 from database_module import (
     Database, DatabaseConfig,
     MotoRepository, LocalizacaoRepository, AlertaRepository,
-    ViagemRepository, SensorRepository, DashboardRepository
+    ViagemRepository, SensorRepository, DashboardRepository, MAX_PAGINA
 )
+from sensor_ingestion import SensorIngestor, IngestaoSobrecarregada
+from partition_maintenance import ManutencaoParticoes
+from dashboard_counters import ReconciliacaoContadores
+from trip_metrics import MetricasViagens
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +33,8 @@ config.HOST = "localhost"
 config.DATABASE = "mottu_tracking"
 config.USER = "postgres"
 config.PASSWORD = "sua_senha"
+# Réplicas de leitura (dashboard/consultas); escritas sempre no primário
+# config.REPLICAS = [{'host': 'replica1', 'port': 5432}]
 
 db = Database(config)
 
@@ -38,6 +45,28 @@ alerta_repo = AlertaRepository(db)
 viagem_repo = ViagemRepository(db)
 sensor_repo = SensorRepository(db)
 dashboard_repo = DashboardRepository(db)
+metricas_viagens = MetricasViagens(db)
+
+# Ingestão de leituras IoT em lote (COPY)
+sensor_ingestor = SensorIngestor(db)
+sensor_ingestor.start()
+atexit.register(sensor_ingestor.stop)
+
+# Partições mensais de localizacoes/sensores_iot (criação antecipada e retenção)
+manutencao_particoes = ManutencaoParticoes(db)
+manutencao_particoes.start()
+atexit.register(manutencao_particoes.stop)
+
+# Correção periódica de desvios em dashboard_contadores
+reconciliacao_contadores = ReconciliacaoContadores(db)
+reconciliacao_contadores.start()
+atexit.register(reconciliacao_contadores.stop)
+
+
+@app.before_request
+def iniciar_requisicao():
+    """Cada requisição começa podendo ler das réplicas (read-your-writes por requisição)"""
+    db.iniciar_requisicao()
 
 
 # ============================================
@@ -51,13 +80,17 @@ def listar_motos():
         status = request.args.get('status')
         limit = int(request.args.get('limit', 100))
         
-        motos = moto_repo.listar_motos(status=status, limit=limit)
+        motos = moto_repo.listar_motos(status=status, limit=limit,
+                                       cursor=request.args.get('cursor'))
         
         return jsonify({
             'success': True,
             'data': motos,
-            'count': len(motos)
+            'count': len(motos),
+            'next': motos.proximo_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar motos: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -207,18 +240,78 @@ def obter_historico_localizacao(moto_id):
     """Obtém histórico de localizações de uma moto"""
     try:
         horas = int(request.args.get('horas', 24))
-        historico = loc_repo.obter_historico(moto_id, horas)
+        limit = int(request.args.get('limit', MAX_PAGINA))
+        historico = loc_repo.obter_historico(moto_id, horas, limite=limit,
+                                             cursor=request.args.get('cursor'))
         
         return jsonify({
             'success': True,
             'data': historico,
-            'count': len(historico)
+            'count': len(historico),
+            'next': historico.proximo_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao obter histórico: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def codificar_em_blocos(linhas, formato: str = 'ndjson', linhas_por_bloco: int = 500):
+    """
+    Codifica as linhas à medida que chegam do banco e as envia em blocos
+    (NDJSON: uma linha JSON por registro; 'json': um array JSON).
+    """
+    separador = '\n' if formato == 'ndjson' else ','
+    if formato == 'json':
+        yield '['
+    
+    bloco = []
+    primeiro = True
+    try:
+        for linha in linhas:
+            texto = app.json.dumps(linha)
+            if formato == 'json' and not primeiro:
+                texto = separador + texto
+            elif formato == 'ndjson':
+                texto += separador
+            primeiro = False
+            bloco.append(texto)
+            if len(bloco) >= linhas_por_bloco:
+                yield ''.join(bloco)
+                bloco = []
+    except Exception as e:
+        # O status 200 já foi enviado: a resposta termina incompleta
+        logger.error(f"Erro durante streaming: {e}")
+        if formato == 'ndjson':
+            bloco.append(app.json.dumps({'success': False, 'error': str(e)}) + separador)
+        yield ''.join(bloco)
+        return
+    
+    if formato == 'json':
+        bloco.append(']')
+    yield ''.join(bloco)
+
+
+@app.route('/api/motos/<int:moto_id>/localizacao/historico/stream', methods=['GET'])
+def stream_historico_localizacao(moto_id):
+    """Histórico completo da janela em streaming (memória constante)"""
+    try:
+        horas = int(request.args.get('horas', 24))
+        formato = request.args.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'json'):
+            return jsonify({'success': False, 'error': "formato deve ser 'ndjson' ou 'json'"}), 400
+        
+        linhas = loc_repo.iterar_historico(moto_id, horas)
+        mimetype = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+        return Response(stream_with_context(codificar_em_blocos(linhas, formato)), mimetype=mimetype)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao iniciar streaming do histórico: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/localizacoes', methods=['POST'])
 def registrar_localizacao():
     """Registra nova localização de uma moto (endpoint para IoT/Visão Computacional)"""
@@ -255,6 +348,44 @@ def registrar_localizacao():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/localizacoes/lote', methods=['POST'])
+def registrar_localizacoes_lote():
+    """Registra um lote de localizações (rastreadores que acumulam posições)"""
+    try:
+        dados = request.get_json(silent=True)
+        pontos = dados.get('localizacoes') if isinstance(dados, dict) else dados
+        
+        if not isinstance(pontos, list) or not pontos:
+            return jsonify({
+                'success': False,
+                'error': 'Envie uma lista não vazia de localizações'
+            }), 400
+        if len(pontos) > LocalizacaoRepository.MAX_LOTE:
+            return jsonify({
+                'success': False,
+                'error': f'Lote excede o máximo de {LocalizacaoRepository.MAX_LOTE} itens'
+            }), 413
+        
+        inseridos, erros = loc_repo.registrar_localizacoes_lote(pontos)
+        
+        if not inseridos:
+            status = 400
+        elif erros:
+            status = 207
+        else:
+            status = 201
+        
+        return jsonify({
+            'success': bool(inseridos),
+            'data': inseridos,
+            'errors': erros,
+            'count': len(inseridos)
+        }), status
+    except Exception as e:
+        logger.error(f"Erro ao registrar lote de localizações: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ============================================
 # ENDPOINTS - ALERTAS
 # ============================================
@@ -264,13 +395,18 @@ def listar_alertas():
     """Lista alertas ativos"""
     try:
         severidade = request.args.get('severidade')
-        alertas = alerta_repo.listar_alertas_ativos(severidade)
+        limit = int(request.args.get('limit', 100))
+        alertas = alerta_repo.listar_alertas_ativos(severidade, limite=limit,
+                                                    cursor=request.args.get('cursor'))
         
         return jsonify({
             'success': True,
             'data': alertas,
-            'count': len(alertas)
+            'count': len(alertas),
+            'next': alertas.proximo_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar alertas: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -335,13 +471,18 @@ def resolver_alerta(alerta_id):
 def listar_viagens_ativas():
     """Lista viagens em andamento"""
     try:
-        viagens = viagem_repo.listar_viagens_ativas()
+        limit = int(request.args.get('limit', 100))
+        viagens = viagem_repo.listar_viagens_ativas(limite=limit,
+                                                    cursor=request.args.get('cursor'))
         
         return jsonify({
             'success': True,
             'data': viagens,
-            'count': len(viagens)
+            'count': len(viagens),
+            'next': viagens.proximo_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar viagens: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -380,11 +521,14 @@ def iniciar_viagem():
 
 @app.route('/api/viagens/<int:viagem_id>/finalizar', methods=['PUT'])
 def finalizar_viagem(viagem_id):
-    """Finaliza uma viagem"""
+    """
+    Finaliza uma viagem. A distância vem do trajeto GPS da viagem; o
+    distancia_km enviado só é usado quando não há trajeto registrado.
+    """
     try:
         dados = request.get_json()
         
-        campos_obrigatorios = ['destino_latitude', 'destino_longitude', 'distancia_km', 'valor']
+        campos_obrigatorios = ['destino_latitude', 'destino_longitude', 'valor']
         for campo in campos_obrigatorios:
             if campo not in dados:
                 return jsonify({
@@ -392,17 +536,21 @@ def finalizar_viagem(viagem_id):
                     'error': f'Campo obrigatório: {campo}'
                 }), 400
         
+        # Do primário: a distância é gravada e a réplica pode não ter os últimos pontos
+        metricas = metricas_viagens.calcular([viagem_id], somente_leitura=False).get(viagem_id)
+        
         sucesso = viagem_repo.finalizar_viagem(
             viagem_id=viagem_id,
             destino_lat=dados['destino_latitude'],
             destino_lon=dados['destino_longitude'],
-            distancia_km=dados['distancia_km'],
+            distancia_km=metricas['distancia_km'] if metricas else dados.get('distancia_km'),
             valor=dados['valor']
         )
         
         if sucesso:
             return jsonify({
                 'success': True,
+                'data': metricas,
                 'message': 'Viagem finalizada com sucesso'
             }), 200
         else:
@@ -412,6 +560,21 @@ def finalizar_viagem(viagem_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/viagens/<int:viagem_id>/metricas', methods=['GET'])
+def obter_metricas_viagem(viagem_id):
+    """Distância, tempo em movimento e velocidades do trajeto GPS da viagem"""
+    try:
+        metricas = metricas_viagens.calcular([viagem_id]).get(viagem_id)
+
+        if not metricas:
+            return jsonify({'success': False, 'error': 'Viagem sem trajeto registrado'}), 404
+
+        return jsonify({'success': True, 'data': metricas}), 200
+    except Exception as e:
+        logger.error(f"Erro ao calcular métricas da viagem: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ============================================
 # ENDPOINTS - SENSORES IOT
 # ============================================
@@ -448,6 +611,58 @@ def registrar_leitura_sensor():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/sensores/lote', methods=['POST'])
+def registrar_leituras_lote():
+    """Enfileira leituras de sensores para gravação em lote via COPY"""
+    try:
+        dados = request.get_json(silent=True)
+        leituras = dados.get('leituras') if isinstance(dados, dict) else dados
+        if isinstance(leituras, dict):
+            leituras = [leituras]
+        
+        if not isinstance(leituras, list) or not leituras:
+            return jsonify({
+                'success': False,
+                'error': 'Envie uma leitura ou uma lista de leituras'
+            }), 400
+        
+        try:
+            aceitas = sensor_ingestor.registrar(leituras)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except IngestaoSobrecarregada as e:
+            response = jsonify({'success': False, 'error': str(e)})
+            response.headers['Retry-After'] = '2'
+            return response, 503
+        
+        return jsonify({
+            'success': True,
+            'data': {'aceitas': aceitas, 'pressao': sensor_ingestor.pressao()},
+            'message': 'Leituras enfileiradas para gravação'
+        }), 202
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar leituras: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/sensores/ingestao/metricas', methods=['GET'])
+def metricas_ingestao_sensores():
+    """Estado do buffer de ingestão de sensores"""
+    return jsonify({'success': True, 'data': sensor_ingestor.metricas()}), 200
+
+
+@app.route('/api/db/replicas', methods=['GET'])
+def estado_replicas():
+    """Atraso e uso de cada réplica de leitura"""
+    return jsonify({'success': True, 'data': db.estado_replicas()}), 200
+
+
+@app.route('/api/db/particoes', methods=['GET'])
+def metricas_particoes():
+    """Estado da manutenção de partições (criadas, removidas, retenção)"""
+    return jsonify({'success': True, 'data': manutencao_particoes.metricas()}), 200
+
+
 @app.route('/api/motos/<int:moto_id>/sensores/<tipo_sensor>', methods=['GET'])
 def obter_leituras_sensor(moto_id, tipo_sensor):
     """Obtém últimas leituras de um sensor"""
@@ -481,6 +696,12 @@ def obter_resumo_dashboard():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/dashboard/contadores/reconciliacao', methods=['GET'])
+def metricas_reconciliacao_contadores():
+    """Estado da reconciliação dos contadores do dashboard"""
+    return jsonify({'success': True, 'data': reconciliacao_contadores.metricas()}), 200
+
+
 @app.route('/api/dashboard/estatisticas', methods=['GET'])
 def obter_estatisticas():
     """Obtém estatísticas de uso das motos"""
@@ -554,10 +775,12 @@ if __name__ == '__main__':
     print("  - POST /api/motos")
     print("  - GET  /api/localizacoes")
     print("  - POST /api/localizacoes")
+    print("  - POST /api/localizacoes/lote")
     print("  - GET  /api/alertas")
     print("  - POST /api/alertas")
     print("  - GET  /api/viagens/ativas")
     print("  - POST /api/sensores")
+    print("  - POST /api/sensores/lote")
     print("  - GET  /api/dashboard/resumo")
     print("=" * 50)
     
@@ -0,0 +1,743 @@
+"""
+API REST (ASGI) - Mottu Tracking System
+Mesmos endpoints de apirest.py sobre Starlette + asyncpg
+
+Cada requisição aguardando o banco é só uma corrotina (sem thread presa),
+então um processo atende milhares de rastreadores conectados ao mesmo
+tempo. Os jobs em segundo plano (ingestão COPY de /api/sensores/lote,
+partições, reconciliação dos contadores) continuam no processo Flask.
+
+Executar:
+    uvicorn apirest_asgi:app --host 0.0.0.0 --port 5001
+"""
+
+import json
+import logging
+import math
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from email.utils import format_datetime
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from database_module import DatabaseConfig, MAX_ID, MAX_PAGINA
+from database_async import (
+    AsyncDatabase,
+    AsyncMotoRepository, AsyncLocalizacaoRepository, AsyncAlertaRepository,
+    AsyncViagemRepository, AsyncSensorRepository, AsyncDashboardRepository,
+    AsyncMetricasViagens
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Configurar banco de dados
+config = DatabaseConfig()
+config.HOST = "localhost"
+config.DATABASE = "mottu_tracking"
+config.USER = "postgres"
+config.PASSWORD = "sua_senha"
+
+db = AsyncDatabase(config)
+
+# Inicializar repositórios
+moto_repo = AsyncMotoRepository(db)
+loc_repo = AsyncLocalizacaoRepository(db)
+alerta_repo = AsyncAlertaRepository(db)
+viagem_repo = AsyncViagemRepository(db)
+sensor_repo = AsyncSensorRepository(db)
+dashboard_repo = AsyncDashboardRepository(db)
+metricas_viagens = AsyncMetricasViagens(db)
+
+
+def _json_padrao(valor):
+    """Mesma serialização do jsonify do Flask (datas em formato HTTP, Decimal como texto)"""
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return format_datetime(valor.astimezone(timezone.utc), usegmt=True)
+    if isinstance(valor, date):
+        return format_datetime(datetime(valor.year, valor.month, valor.day, tzinfo=timezone.utc), usegmt=True)
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável em JSON')
+
+
+class RespostaJSON(JSONResponse):
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_padrao, ensure_ascii=False).encode('utf-8')
+
+
+def resposta(conteudo, status: int = 200, headers=None) -> RespostaJSON:
+    return RespostaJSON(conteudo, status_code=status, headers=headers)
+
+
+async def corpo_json(request):
+    """Corpo da requisição como JSON (None se ausente ou inválido)"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def campo_faltando(dados, campos):
+    if not isinstance(dados, dict):
+        return campos[0]
+    for campo in campos:
+        if campo not in dados:
+            return campo
+    return None
+
+
+def converter_numeros(dados, inteiros=(), decimais=()):
+    """
+    Converte os campos numéricos do corpo (números ou texto numérico, como o
+    Postgres aceita do psycopg2 na API Flask): o asyncpg só aceita o tipo
+    Python da coluna. Levanta ValueError com o campo inválido.
+    """
+    for campo in inteiros:
+        valor = dados.get(campo)
+        if valor is None:
+            continue
+        if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+            raise ValueError(f'Valor inválido para {campo}: {valor!r}')
+        try:
+            dados[campo] = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f'Valor inválido para {campo}: {valor!r}')
+        if not -MAX_ID - 1 <= dados[campo] <= MAX_ID:
+            raise ValueError(f'{campo} fora do intervalo')
+    for campo in decimais:
+        valor = dados.get(campo)
+        if valor is None:
+            continue
+        try:
+            dados[campo] = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f'Valor inválido para {campo}: {valor!r}')
+        if isinstance(valor, bool) or not math.isfinite(dados[campo]):
+            raise ValueError(f'Valor inválido para {campo}: {valor!r}')
+
+
+# ============================================
+# ENDPOINTS - MOTOS
+# ============================================
+
+async def listar_motos(request):
+    """Lista todas as motos ou filtra por status"""
+    try:
+        status = request.query_params.get('status')
+        limit = int(request.query_params.get('limit', 100))
+
+        motos = await moto_repo.listar_motos(status=status, limit=limit,
+                                             cursor=request.query_params.get('cursor'))
+
+        return resposta({
+            'success': True,
+            'data': motos,
+            'count': len(motos),
+            'next': motos.proximo_cursor
+        })
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao listar motos: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_moto(request):
+    """Obtém informações de uma moto específica"""
+    try:
+        moto = await moto_repo.obter_moto(request.path_params['moto_id'])
+
+        if not moto:
+            return resposta({'success': False, 'error': 'Moto não encontrada'}, 404)
+
+        return resposta({'success': True, 'data': moto})
+    except Exception as e:
+        logger.error(f"Erro ao obter moto: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def criar_moto(request):
+    """Cria uma nova moto"""
+    try:
+        dados = await corpo_json(request)
+
+        campo = campo_faltando(dados, ['placa', 'modelo', 'marca', 'ano'])
+        if campo:
+            return resposta({'success': False, 'error': f'Campo obrigatório: {campo}'}, 400)
+        converter_numeros(dados, inteiros=['ano'])
+
+        moto_id = await moto_repo.criar_moto(
+            placa=dados['placa'],
+            modelo=dados['modelo'],
+            marca=dados['marca'],
+            ano=dados['ano'],
+            cor=dados.get('cor'),
+            numero_chassi=dados.get('numero_chassi'),
+            status=dados.get('status', 'disponivel')
+        )
+
+        return resposta({
+            'success': True,
+            'data': {'id': moto_id},
+            'message': 'Moto criada com sucesso'
+        }, 201)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao criar moto: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def atualizar_status_moto(request):
+    """Atualiza o status de uma moto"""
+    try:
+        dados = await corpo_json(request) or {}
+        novo_status = dados.get('status')
+
+        if not novo_status:
+            return resposta({'success': False, 'error': 'Status não fornecido'}, 400)
+
+        if await moto_repo.atualizar_status(request.path_params['moto_id'], novo_status):
+            return resposta({'success': True, 'message': 'Status atualizado com sucesso'})
+        return resposta({'success': False, 'error': 'Moto não encontrada'}, 404)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar status: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def atualizar_bateria(request):
+    """Atualiza o nível de bateria da moto"""
+    try:
+        dados = await corpo_json(request) or {}
+        converter_numeros(dados, inteiros=['percentual'])
+        percentual = dados.get('percentual')
+
+        if percentual is None or not (0 <= percentual <= 100):
+            return resposta({
+                'success': False,
+                'error': 'Percentual deve estar entre 0 e 100'
+            }, 400)
+
+        if await moto_repo.atualizar_bateria(request.path_params['moto_id'], percentual):
+            return resposta({'success': True, 'message': 'Bateria atualizada com sucesso'})
+        return resposta({'success': False, 'error': 'Moto não encontrada'}, 404)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar bateria: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINTS - LOCALIZAÇÃO
+# ============================================
+
+async def obter_todas_localizacoes(request):
+    """Obtém localização atual de todas as motos"""
+    try:
+        localizacoes = await loc_repo.obter_todas_localizacoes_atuais()
+
+        return resposta({
+            'success': True,
+            'data': localizacoes,
+            'count': len(localizacoes)
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter localizações: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_localizacao_moto(request):
+    """Obtém localização atual de uma moto"""
+    try:
+        localizacao = await loc_repo.obter_localizacao_atual(request.path_params['moto_id'])
+
+        if not localizacao:
+            return resposta({'success': False, 'error': 'Localização não encontrada'}, 404)
+
+        return resposta({'success': True, 'data': localizacao})
+    except Exception as e:
+        logger.error(f"Erro ao obter localização: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_historico_localizacao(request):
+    """Obtém histórico de localizações de uma moto"""
+    try:
+        horas = int(request.query_params.get('horas', 24))
+        limit = int(request.query_params.get('limit', MAX_PAGINA))
+        historico = await loc_repo.obter_historico(request.path_params['moto_id'], horas, limite=limit,
+                                                   cursor=request.query_params.get('cursor'))
+
+        return resposta({
+            'success': True,
+            'data': historico,
+            'count': len(historico),
+            'next': historico.proximo_cursor
+        })
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def codificar_em_blocos(linhas, formato: str = 'ndjson', linhas_por_bloco: int = 500):
+    """Versão assíncrona de apirest.codificar_em_blocos"""
+    separador = '\n' if formato == 'ndjson' else ','
+    if formato == 'json':
+        yield '['
+
+    bloco = []
+    primeiro = True
+    try:
+        async for linha in linhas:
+            texto = json.dumps(linha, default=_json_padrao, ensure_ascii=False)
+            if formato == 'json' and not primeiro:
+                texto = separador + texto
+            elif formato == 'ndjson':
+                texto += separador
+            primeiro = False
+            bloco.append(texto)
+            if len(bloco) >= linhas_por_bloco:
+                yield ''.join(bloco)
+                bloco = []
+    except Exception as e:
+        # O status 200 já foi enviado: a resposta termina incompleta
+        logger.error(f"Erro durante streaming: {e}")
+        if formato == 'ndjson':
+            bloco.append(json.dumps({'success': False, 'error': str(e)}) + separador)
+        yield ''.join(bloco)
+        return
+
+    if formato == 'json':
+        bloco.append(']')
+    yield ''.join(bloco)
+
+
+async def stream_historico_localizacao(request):
+    """Histórico completo da janela em streaming (memória constante)"""
+    try:
+        horas = int(request.query_params.get('horas', 24))
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'json'):
+            return resposta({'success': False, 'error': "formato deve ser 'ndjson' ou 'json'"}, 400)
+
+        linhas = loc_repo.iterar_historico(request.path_params['moto_id'], horas)
+        media_type = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+        return StreamingResponse(codificar_em_blocos(linhas, formato), media_type=media_type)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao iniciar streaming do histórico: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def registrar_localizacao(request):
+    """Registra nova localização de uma moto (endpoint para IoT/Visão Computacional)"""
+    try:
+        dados = await corpo_json(request)
+
+        campo = campo_faltando(dados, ['moto_id', 'latitude', 'longitude'])
+        if campo:
+            return resposta({'success': False, 'error': f'Campo obrigatório: {campo}'}, 400)
+        converter_numeros(dados, inteiros=['moto_id'],
+                          decimais=['latitude', 'longitude', 'velocidade', 'precisao', 'altitude'])
+
+        loc_id = await loc_repo.registrar_localizacao(
+            moto_id=dados['moto_id'],
+            latitude=dados['latitude'],
+            longitude=dados['longitude'],
+            velocidade=dados.get('velocidade', 0),
+            origem=dados.get('origem', 'iot'),
+            direcao=dados.get('direcao'),
+            precisao=dados.get('precisao'),
+            altitude=dados.get('altitude')
+        )
+
+        return resposta({
+            'success': True,
+            'data': {'id': loc_id},
+            'message': 'Localização registrada com sucesso'
+        }, 201)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao registrar localização: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def registrar_localizacoes_lote(request):
+    """Registra um lote de localizações (rastreadores que acumulam posições)"""
+    try:
+        dados = await corpo_json(request)
+        pontos = dados.get('localizacoes') if isinstance(dados, dict) else dados
+
+        if not isinstance(pontos, list) or not pontos:
+            return resposta({'success': False, 'error': 'Envie uma lista não vazia de localizações'}, 400)
+        if len(pontos) > AsyncLocalizacaoRepository.MAX_LOTE:
+            return resposta({
+                'success': False,
+                'error': f'Lote excede o máximo de {AsyncLocalizacaoRepository.MAX_LOTE} itens'
+            }, 413)
+
+        inseridos, erros = await loc_repo.registrar_localizacoes_lote(pontos)
+
+        if not inseridos:
+            status = 400
+        elif erros:
+            status = 207
+        else:
+            status = 201
+
+        return resposta({
+            'success': bool(inseridos),
+            'data': inseridos,
+            'errors': erros,
+            'count': len(inseridos)
+        }, status)
+    except Exception as e:
+        logger.error(f"Erro ao registrar lote de localizações: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINTS - ALERTAS
+# ============================================
+
+async def listar_alertas(request):
+    """Lista alertas ativos"""
+    try:
+        severidade = request.query_params.get('severidade')
+        limit = int(request.query_params.get('limit', 100))
+        alertas = await alerta_repo.listar_alertas_ativos(severidade, limite=limit,
+                                                          cursor=request.query_params.get('cursor'))
+
+        return resposta({
+            'success': True,
+            'data': alertas,
+            'count': len(alertas),
+            'next': alertas.proximo_cursor
+        })
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao listar alertas: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def criar_alerta(request):
+    """Cria um novo alerta"""
+    try:
+        dados = await corpo_json(request)
+
+        if campo_faltando(dados, ['tipo', 'mensagem']):
+            return resposta({'success': False, 'error': 'Tipo e mensagem são obrigatórios'}, 400)
+        converter_numeros(dados, inteiros=['moto_id'])
+
+        alerta_id = await alerta_repo.criar_alerta(
+            moto_id=dados.get('moto_id'),
+            tipo=dados['tipo'],
+            mensagem=dados['mensagem'],
+            severidade=dados.get('severidade', 'media'),
+            detalhes=dados.get('detalhes')
+        )
+
+        return resposta({
+            'success': True,
+            'data': {'id': alerta_id},
+            'message': 'Alerta criado com sucesso'
+        }, 201)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao criar alerta: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def resolver_alerta(request):
+    """Marca um alerta como resolvido"""
+    try:
+        dados = await corpo_json(request) or {}
+        resolvido_por = dados.get('resolvido_por', 'Sistema')
+
+        if await alerta_repo.resolver_alerta(request.path_params['alerta_id'], resolvido_por):
+            return resposta({'success': True, 'message': 'Alerta resolvido com sucesso'})
+        return resposta({'success': False, 'error': 'Alerta não encontrado'}, 404)
+    except Exception as e:
+        logger.error(f"Erro ao resolver alerta: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINTS - VIAGENS
+# ============================================
+
+async def listar_viagens_ativas(request):
+    """Lista viagens em andamento"""
+    try:
+        limit = int(request.query_params.get('limit', 100))
+        viagens = await viagem_repo.listar_viagens_ativas(limite=limit,
+                                                          cursor=request.query_params.get('cursor'))
+
+        return resposta({
+            'success': True,
+            'data': viagens,
+            'count': len(viagens),
+            'next': viagens.proximo_cursor
+        })
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao listar viagens: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def iniciar_viagem(request):
+    """Inicia uma nova viagem"""
+    try:
+        dados = await corpo_json(request)
+
+        campo = campo_faltando(dados, ['moto_id', 'entregador_id', 'origem_latitude', 'origem_longitude'])
+        if campo:
+            return resposta({'success': False, 'error': f'Campo obrigatório: {campo}'}, 400)
+        converter_numeros(dados, inteiros=['moto_id', 'entregador_id'],
+                          decimais=['origem_latitude', 'origem_longitude'])
+
+        viagem_id = await viagem_repo.iniciar_viagem(
+            moto_id=dados['moto_id'],
+            entregador_id=dados['entregador_id'],
+            origem_lat=dados['origem_latitude'],
+            origem_lon=dados['origem_longitude']
+        )
+
+        return resposta({
+            'success': True,
+            'data': {'id': viagem_id},
+            'message': 'Viagem iniciada com sucesso'
+        }, 201)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao iniciar viagem: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def finalizar_viagem(request):
+    """Finaliza uma viagem (distância do trajeto GPS; distancia_km só sem trajeto)"""
+    try:
+        dados = await corpo_json(request)
+
+        campo = campo_faltando(dados, ['destino_latitude', 'destino_longitude', 'valor'])
+        if campo:
+            return resposta({'success': False, 'error': f'Campo obrigatório: {campo}'}, 400)
+        converter_numeros(dados, decimais=['destino_latitude', 'destino_longitude', 'valor', 'distancia_km'])
+
+        viagem_id = request.path_params['viagem_id']
+        # Do primário: a distância é gravada e a réplica pode não ter os últimos pontos
+        metricas = (await metricas_viagens.calcular([viagem_id], somente_leitura=False)).get(viagem_id)
+
+        sucesso = await viagem_repo.finalizar_viagem(
+            viagem_id=viagem_id,
+            destino_lat=dados['destino_latitude'],
+            destino_lon=dados['destino_longitude'],
+            distancia_km=metricas['distancia_km'] if metricas else dados.get('distancia_km'),
+            valor=dados['valor']
+        )
+
+        if sucesso:
+            return resposta({'success': True, 'data': metricas, 'message': 'Viagem finalizada com sucesso'})
+        return resposta({'success': False, 'error': 'Viagem não encontrada'}, 404)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao finalizar viagem: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_metricas_viagem(request):
+    """Distância, tempo em movimento e velocidades do trajeto GPS da viagem"""
+    try:
+        viagem_id = request.path_params['viagem_id']
+        metricas = (await metricas_viagens.calcular([viagem_id])).get(viagem_id)
+
+        if not metricas:
+            return resposta({'success': False, 'error': 'Viagem sem trajeto registrado'}, 404)
+
+        return resposta({'success': True, 'data': metricas})
+    except Exception as e:
+        logger.error(f"Erro ao calcular métricas da viagem: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINTS - SENSORES IOT
+# ============================================
+
+async def registrar_leitura_sensor(request):
+    """Registra leitura de sensor IoT"""
+    try:
+        dados = await corpo_json(request)
+
+        campo = campo_faltando(dados, ['moto_id', 'tipo_sensor', 'valor'])
+        if campo:
+            return resposta({'success': False, 'error': f'Campo obrigatório: {campo}'}, 400)
+        converter_numeros(dados, inteiros=['moto_id'], decimais=['valor'])
+
+        sensor_id = await sensor_repo.registrar_leitura(
+            moto_id=dados['moto_id'],
+            tipo_sensor=dados['tipo_sensor'],
+            valor=dados['valor'],
+            unidade=dados.get('unidade'),
+            metadata=dados.get('metadata')
+        )
+
+        return resposta({
+            'success': True,
+            'data': {'id': sensor_id},
+            'message': 'Leitura registrada com sucesso'
+        }, 201)
+    except ValueError as e:
+        return resposta({'success': False, 'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Erro ao registrar leitura: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_leituras_sensor(request):
+    """Obtém últimas leituras de um sensor"""
+    try:
+        limite = int(request.query_params.get('limite', 10))
+        leituras = await sensor_repo.obter_ultimas_leituras(
+            request.path_params['moto_id'], request.path_params['tipo_sensor'], limite
+        )
+
+        return resposta({'success': True, 'data': leituras, 'count': len(leituras)})
+    except Exception as e:
+        logger.error(f"Erro ao obter leituras: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINTS - DASHBOARD
+# ============================================
+
+async def obter_resumo_dashboard(request):
+    """Obtém resumo para o dashboard"""
+    try:
+        return resposta({'success': True, 'data': await dashboard_repo.obter_resumo()})
+    except Exception as e:
+        logger.error(f"Erro ao obter resumo: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_estatisticas(request):
+    """Obtém estatísticas de uso das motos"""
+    try:
+        estatisticas = await dashboard_repo.obter_estatisticas_motos()
+        return resposta({'success': True, 'data': estatisticas, 'count': len(estatisticas)})
+    except Exception as e:
+        logger.error(f"Erro ao obter estatísticas: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+async def obter_motos_alertas(request):
+    """Obtém motos com alertas ativos"""
+    try:
+        motos = await dashboard_repo.obter_motos_com_alertas()
+        return resposta({'success': True, 'data': motos, 'count': len(motos)})
+    except Exception as e:
+        logger.error(f"Erro ao obter motos com alertas: {e}")
+        return resposta({'success': False, 'error': str(e)}, 500)
+
+
+# ============================================
+# ENDPOINT - HEALTH CHECK
+# ============================================
+
+async def health_check(request):
+    """Verifica se a API está funcionando"""
+    return resposta({
+        'success': True,
+        'message': 'API Mottu Tracking (ASGI) está funcionando',
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+# ============================================
+# TRATAMENTO DE ERROS
+# ============================================
+
+async def not_found(request, exc):
+    return resposta({'success': False, 'error': 'Endpoint não encontrado'}, 404)
+
+
+async def internal_error(request, exc):
+    return resposta({'success': False, 'error': 'Erro interno do servidor'}, 500)
+
+
+# ============================================
+# APLICAÇÃO
+# ============================================
+
+@asynccontextmanager
+async def lifespan(app):
+    await db.conectar()
+    try:
+        yield
+    finally:
+        await db.close_all_connections()
+
+
+routes = [
+    Route('/api/motos', listar_motos, methods=['GET']),
+    Route('/api/motos', criar_moto, methods=['POST']),
+    Route('/api/motos/{moto_id:int}', obter_moto, methods=['GET']),
+    Route('/api/motos/{moto_id:int}/status', atualizar_status_moto, methods=['PUT']),
+    Route('/api/motos/{moto_id:int}/bateria', atualizar_bateria, methods=['PUT']),
+    Route('/api/localizacoes', obter_todas_localizacoes, methods=['GET']),
+    Route('/api/localizacoes', registrar_localizacao, methods=['POST']),
+    Route('/api/localizacoes/lote', registrar_localizacoes_lote, methods=['POST']),
+    Route('/api/motos/{moto_id:int}/localizacao', obter_localizacao_moto, methods=['GET']),
+    Route('/api/motos/{moto_id:int}/localizacao/historico', obter_historico_localizacao, methods=['GET']),
+    Route('/api/motos/{moto_id:int}/localizacao/historico/stream', stream_historico_localizacao,
+          methods=['GET']),
+    Route('/api/alertas', listar_alertas, methods=['GET']),
+    Route('/api/alertas', criar_alerta, methods=['POST']),
+    Route('/api/alertas/{alerta_id:int}/resolver', resolver_alerta, methods=['PUT']),
+    Route('/api/viagens/ativas', listar_viagens_ativas, methods=['GET']),
+    Route('/api/viagens', iniciar_viagem, methods=['POST']),
+    Route('/api/viagens/{viagem_id:int}/finalizar', finalizar_viagem, methods=['PUT']),
+    Route('/api/viagens/{viagem_id:int}/metricas', obter_metricas_viagem, methods=['GET']),
+    Route('/api/sensores', registrar_leitura_sensor, methods=['POST']),
+    Route('/api/motos/{moto_id:int}/sensores/{tipo_sensor}', obter_leituras_sensor, methods=['GET']),
+    Route('/api/dashboard/resumo', obter_resumo_dashboard, methods=['GET']),
+    Route('/api/dashboard/estatisticas', obter_estatisticas, methods=['GET']),
+    Route('/api/dashboard/motos-alertas', obter_motos_alertas, methods=['GET']),
+    Route('/api/health', health_check, methods=['GET']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("=" * 50)
+    print("API REST (ASGI) - Mottu Tracking System")
+    print("=" * 50)
+    uvicorn.run(app, host='0.0.0.0', port=5001)
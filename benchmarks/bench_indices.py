@@ -0,0 +1,246 @@
+"""
+Benchmark do plano de índices (migração 004)
+
+Para cada consulta quente do repositório mostra o plano (EXPLAIN ANALYZE)
+com o índice novo e com o índice que existia antes dele, além do tamanho
+de cada índice. Tudo roda em uma única transação desfeita no final: os
+dados de teste, o DROP INDEX e o índice antigo recriado não ficam no banco.
+
+DROP INDEX bloqueia a tabela até o fim da transação: não rodar em um banco
+com tráfego.
+
+Uso:
+    python benchmarks/bench_indices.py [--linhas 200000]
+        [--host localhost] [--port 5432] [--database mottu_tracking]
+        [--user postgres] [--password ...]
+"""
+
+import argparse
+import json
+
+import psycopg2
+
+TIPOS_SENSOR = ['gps', 'acelerometro', 'giroscopio', 'temperatura',
+                'bateria', 'velocidade', 'pressao_pneu', 'camera']
+
+# indice: criado pela migração 004; antes: índice que ele substitui (None = nenhum)
+CASOS = [
+    {
+        'nome': 'historico por moto (keyset)',
+        'indice': 'idx_localizacoes_moto_timestamp',
+        'antes': 'CREATE INDEX idx_localizacoes_moto_timestamp ON localizacoes(moto_id, timestamp)',
+        'consulta': """
+            SELECT * FROM localizacoes
+            WHERE moto_id = %(moto_id)s
+            AND timestamp >= NOW() - 24 * INTERVAL '1 hour'
+            AND (timestamp, id) < (NOW() - INTERVAL '1 hour', 2147483647)
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 100
+        """
+    },
+    {
+        'nome': 'janela de tempo em localizacoes',
+        'indice': 'idx_localizacoes_timestamp',
+        'antes': 'CREATE INDEX idx_localizacoes_timestamp ON localizacoes(timestamp)',
+        'consulta': """
+            SELECT count(*) FROM localizacoes
+            WHERE timestamp >= NOW() - INTERVAL '2 hours'
+            AND timestamp < NOW() - INTERVAL '1 hour'
+        """
+    },
+    {
+        'nome': 'ultimas leituras do sensor',
+        'indice': 'idx_sensores_moto_tipo_timestamp',
+        'antes': 'CREATE INDEX idx_sensores_moto_tipo_timestamp ON sensores_iot(moto_id, tipo_sensor, timestamp)',
+        'consulta': """
+            SELECT * FROM sensores_iot
+            WHERE moto_id = %(moto_id)s AND tipo_sensor = 'temperatura'
+            ORDER BY timestamp DESC
+            LIMIT 10
+        """
+    },
+    {
+        'nome': 'janela de tempo em sensores_iot',
+        'indice': 'idx_sensores_timestamp',
+        'antes': 'CREATE INDEX idx_sensores_timestamp ON sensores_iot(timestamp DESC)',
+        'consulta': """
+            SELECT count(*) FROM sensores_iot
+            WHERE timestamp >= NOW() - INTERVAL '2 hours'
+            AND timestamp < NOW() - INTERVAL '1 hour'
+        """
+    },
+    {
+        'nome': 'alertas ativos',
+        'indice': 'idx_alertas_ativos',
+        'antes': 'CREATE INDEX idx_nao_resolvidos ON alertas(resolvido, data_criacao)',
+        'consulta': """
+            SELECT * FROM alertas
+            WHERE resolvido = FALSE
+            ORDER BY data_criacao DESC, id DESC
+            LIMIT 100
+        """
+    },
+    {
+        'nome': 'viagens em andamento',
+        'indice': 'idx_viagens_ativas',
+        'antes': None,
+        'consulta': """
+            SELECT v.*, m.placa, e.nome as entregador_nome
+            FROM viagens v
+            JOIN motos m ON v.moto_id = m.id
+            JOIN entregadores e ON v.entregador_id = e.id
+            WHERE v.status = 'em_andamento'
+            ORDER BY v.data_inicio DESC, v.id DESC
+            LIMIT 100
+        """
+    }
+]
+
+
+def popular(cur, linhas):
+    """Dados de teste em ordem de tempo (última semana); triggers desligados"""
+    for tabela in ('localizacoes', 'sensores_iot', 'alertas', 'viagens', 'motos', 'entregadores'):
+        cur.execute(f"ALTER TABLE {tabela} DISABLE TRIGGER USER")
+
+    cur.execute("""
+        INSERT INTO motos (placa, modelo, marca, ano)
+        SELECT 'BX' || lpad(i::text, 5, '0'), 'Bench', 'Bench', 2024
+        FROM generate_series(1, 200) i
+        RETURNING id
+    """)
+    motos = [r[0] for r in cur.fetchall()]
+    cur.execute("""
+        INSERT INTO entregadores (nome, cpf, cnh)
+        SELECT 'Bench ' || i, 'BX' || i, 'BX' || i FROM generate_series(1, 50) i
+        RETURNING id
+    """)
+    entregadores = [r[0] for r in cur.fetchall()]
+
+    params = {'motos': motos, 'entregadores': entregadores, 'n': linhas}
+    cur.execute("""
+        INSERT INTO localizacoes (moto_id, latitude, longitude, timestamp)
+        SELECT (%(motos)s::int[])[1 + i %% cardinality(%(motos)s::int[])],
+               -23.55, -46.63,
+               NOW() - INTERVAL '7 days' + i * INTERVAL '7 days' / %(n)s
+        FROM generate_series(1, %(n)s) i
+    """, params)
+    cur.execute("""
+        INSERT INTO sensores_iot (moto_id, tipo_sensor, valor, timestamp)
+        SELECT (%(motos)s::int[])[1 + (i / 8) %% cardinality(%(motos)s::int[])],
+               (%(tipos)s::text[])[1 + i %% 8], random() * 100,
+               NOW() - INTERVAL '7 days' + i * INTERVAL '7 days' / %(n)s
+        FROM generate_series(1, %(n)s) i
+    """, dict(params, tipos=TIPOS_SENSOR))
+    # 2% dos alertas abertos e 1% das viagens em andamento
+    cur.execute("""
+        INSERT INTO alertas (moto_id, tipo, mensagem, resolvido, data_criacao)
+        SELECT (%(motos)s::int[])[1 + i %% cardinality(%(motos)s::int[])],
+               'outro', 'bench', i %% 50 <> 0,
+               NOW() - INTERVAL '7 days' + i * INTERVAL '7 days' / %(n)s
+        FROM generate_series(1, %(n)s / 4) i
+    """, params)
+    cur.execute("""
+        INSERT INTO viagens (moto_id, entregador_id, data_inicio, data_fim, status)
+        SELECT (%(motos)s::int[])[1 + i %% cardinality(%(motos)s::int[])],
+               (%(entregadores)s::int[])[1 + i %% cardinality(%(entregadores)s::int[])],
+               NOW() - INTERVAL '7 days' + i * INTERVAL '7 days' / %(n)s,
+               CASE WHEN i %% 100 = 0 THEN NULL ELSE NOW() END,
+               CASE WHEN i %% 100 = 0 THEN 'em_andamento' ELSE 'concluida' END
+        FROM generate_series(1, %(n)s / 4) i
+    """, params)
+    cur.execute("ANALYZE localizacoes, sensores_iot, alertas, viagens, motos, entregadores")
+    return motos[0]
+
+
+def resumo_plano(plano):
+    """Nós do plano em uma linha, ex.: Limit > Index Scan (idx_...)"""
+    nos = []
+
+    def visitar(no):
+        nome = no['Node Type']
+        if 'Index Name' in no:
+            nome += f" ({no['Index Name']})"
+        nos.append(nome)
+        for filho in no.get('Plans', []):
+            visitar(filho)
+
+    visitar(plano)
+    # Partições repetem o mesmo nó: mostra cada um uma vez
+    return ' > '.join(dict.fromkeys(nos))
+
+
+def explicar(cur, consulta, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + consulta, params)
+    resultado = cur.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    plano = resultado[0]
+    blocos = plano['Plan'].get('Shared Hit Blocks', 0) + plano['Plan'].get('Shared Read Blocks', 0)
+    return resumo_plano(plano['Plan']), plano['Execution Time'], blocos
+
+
+def folhas(cur, indice):
+    """O próprio índice ou, em tabela particionada, o índice de cada partição"""
+    cur.execute("SELECT relid FROM pg_partition_tree(%s::regclass) WHERE isleaf", (indice,))
+    return [r[0] for r in cur.fetchall()] or [indice]
+
+
+def tamanho_indice(cur, indice):
+    cur.execute("SELECT sum(pg_relation_size(i::regclass)) FROM unnest(%s::text[]) i",
+                ([str(f) for f in folhas(cur, indice)],))
+    return cur.fetchone()[0]
+
+
+def resumir_brin(cur, indice):
+    """Resume as faixas ainda não resumidas (o que o autovacuum faria)"""
+    cur.execute("SELECT amname FROM pg_class c JOIN pg_am a ON a.oid = c.relam WHERE c.oid = %s::regclass",
+                (indice,))
+    if cur.fetchone()[0] == 'brin':
+        for folha in folhas(cur, indice):
+            cur.execute("SELECT brin_summarize_new_values(%s::regclass)", (str(folha),))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Planos das consultas quentes com e sem os índices da migração 004')
+    parser.add_argument('--linhas', type=int, default=200000)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='mottu_tracking')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(host=args.host, port=args.port, dbname=args.database,
+                            user=args.user, password=args.password)
+    try:
+        with conn.cursor() as cur:
+            print(f"Populando {args.linhas} localizações/leituras (transação desfeita no final)...")
+            params = {'moto_id': popular(cur, args.linhas)}
+
+            for caso in CASOS:
+                print(f"\n{caso['nome']} [{caso['indice']}]")
+                resumir_brin(cur, caso['indice'])
+                # Aquecimento do cache antes de medir
+                explicar(cur, caso['consulta'], params)
+                plano, tempo, blocos = explicar(cur, caso['consulta'], params)
+                tamanho = tamanho_indice(cur, caso['indice'])
+                print(f"  depois: {tempo:>9.2f} ms {blocos:>7} blocos {tamanho / 1024:>8.0f} kB  {plano}")
+
+                cur.execute("SAVEPOINT antes")
+                cur.execute(f"DROP INDEX {caso['indice']}")
+                if caso['antes']:
+                    cur.execute(caso['antes'])
+                    tamanho = tamanho_indice(cur, caso['antes'].split()[2])
+                else:
+                    tamanho = 0
+                explicar(cur, caso['consulta'], params)
+                plano, tempo, blocos = explicar(cur, caso['consulta'], params)
+                print(f"  antes:  {tempo:>9.2f} ms {blocos:>7} blocos {tamanho / 1024:>8.0f} kB  {plano}")
+                cur.execute("ROLLBACK TO SAVEPOINT antes")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
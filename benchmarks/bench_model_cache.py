@@ -0,0 +1,122 @@
+"""
+Benchmark do cache do modelo YOLO (model_cache.py)
+
+Mede o tempo de carga da rede (cv2.dnn.readNet) e de carga + primeira
+inferência a partir dos arquivos Darknet originais e do cache fundido, e
+confere que as saídas das duas redes coincidem. Sem models/yolov3.* usa
+uma rede sintética com o backbone do YOLOv3 (pesos aleatórios, ~200 MB).
+
+Uso:
+    python benchmarks/bench_model_cache.py [--weights models/yolov3.weights]
+        [--config models/yolov3.cfg] [--repeticoes 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import model_cache  # noqa: E402
+
+ANCHORS = '10,13,16,30,33,23,30,61,62,45,59,119,116,90,156,198,373,326'
+
+
+def gerar_modelo_sintetico(pasta, tamanho=416):
+    """Darknet-53 + uma cabeça yolo, com batch norm e pesos aleatórios"""
+    secoes = [f"[net]\nbatch=1\nwidth={tamanho}\nheight={tamanho}\nchannels=3\n"]
+    camadas = []
+    canais = 3
+
+    def conv(filtros, size, stride=1, bn=1, ativacao='leaky'):
+        nonlocal canais
+        secoes.append(f"[convolutional]\nbatch_normalize={bn}\nfilters={filtros}\nsize={size}\n"
+                      f"stride={stride}\npad=1\nactivation={ativacao}\n")
+        camadas.append((filtros, filtros * canais * size * size, bn))
+        canais = filtros
+
+    conv(32, 3)
+    for filtros, repeticoes in ((64, 1), (128, 2), (256, 8), (512, 8), (1024, 4)):
+        conv(filtros, 3, 2)
+        for _ in range(repeticoes):
+            conv(filtros // 2, 1)
+            conv(filtros, 3)
+            secoes.append("[shortcut]\nfrom=-3\nactivation=linear\n")
+    conv(512, 1)
+    conv(1024, 3)
+    conv(255, 1, bn=0, ativacao='linear')
+    secoes.append(f"[yolo]\nmask=6,7,8\nanchors={ANCHORS}\nclasses=80\nnum=9\n")
+
+    config_path = os.path.join(pasta, 'sintetico.cfg')
+    weights_path = os.path.join(pasta, 'sintetico.weights')
+    with open(config_path, 'w') as f:
+        f.write("\n".join(secoes))
+
+    rng = np.random.default_rng(0)
+    with open(weights_path, 'wb') as f:
+        f.write(model_cache._header_bytes(0, 2, 0, 0))
+        for filtros, n_pesos, bn in camadas:
+            if bn:
+                for baixo, alto in ((-.1, .1), (.5, 1.5), (-.1, .1), (.5, 1.5)):
+                    rng.uniform(baixo, alto, filtros).astype('<f4').tofile(f)
+            else:
+                rng.uniform(-.1, .1, filtros).astype('<f4').tofile(f)
+            rng.normal(0, .02, n_pesos).astype('<f4').tofile(f)
+    return weights_path, config_path
+
+
+def medir(carregar, entrada, repeticoes):
+    """Menor tempo de carga e de carga + primeira inferência; saídas da última"""
+    cargas, totais = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        net = carregar()
+        carregada = time.perf_counter()
+        net.setInput(entrada)
+        saidas = net.forward(net.getUnconnectedOutLayersNames())
+        fim = time.perf_counter()
+        cargas.append(carregada - inicio)
+        totais.append(fim - inicio)
+    return min(cargas), min(totais), saidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga do modelo YOLO com e sem o cache fundido')
+    parser.add_argument('--weights', default='models/yolov3.weights')
+    parser.add_argument('--config', default='models/yolov3.cfg')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        weights_path, config_path = args.weights, args.config
+        if not (os.path.exists(weights_path) and os.path.exists(config_path)):
+            print("Modelo não encontrado: usando rede sintética (backbone do YOLOv3)")
+            weights_path, config_path = gerar_modelo_sintetico(pasta)
+
+        cache_dir = os.path.join(pasta, 'cache')
+        inicio = time.perf_counter()
+        manifest = model_cache.convert_model(weights_path, config_path, cache_dir)
+        print(f"Conversão (uma vez): {time.perf_counter() - inicio:.2f} s")
+
+        entrada = np.random.default_rng(1).random((1, 3, 416, 416), dtype=np.float32)
+        carga_o, total_o, saidas_o = medir(
+            lambda: cv2.dnn.readNet(weights_path, config_path), entrada, args.repeticoes)
+        carga_c, total_c, saidas_c = medir(
+            lambda: model_cache._read_cached_net(manifest, cache_dir), entrada, args.repeticoes)
+
+        print(f"\n{'':12} {'carga':>10} {'carga + 1ª inferência':>24}")
+        print(f"{'originais':12} {carga_o:>9.3f}s {total_o:>23.3f}s")
+        print(f"{'cache':12} {carga_c:>9.3f}s {total_c:>23.3f}s")
+        print(f"{'ganho':12} {carga_o / carga_c:>9.1f}x {total_o / total_c:>23.2f}x")
+
+        diferenca = max(float(np.max(np.abs(a - b))) for a, b in zip(saidas_o, saidas_c))
+        print(f"\nMaior diferença entre as saídas: {diferenca:.2e}")
+
+
+if __name__ == '__main__':
+    main()
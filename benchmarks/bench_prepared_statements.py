@@ -0,0 +1,113 @@
+"""
+Benchmark dos prepared statements do repositório
+
+Compara, na mesma conexão, o SQL enviado a cada chamada (cur.execute) com
+o RegistroStatements (PREPARE uma vez + EXECUTE por nome) para as consultas
+quentes de localização. Cada rodada usa uma transação desfeita no final: o
+banco não é alterado.
+
+Uso:
+    python benchmarks/bench_prepared_statements.py [--iteracoes 5000]
+        [--host localhost] [--port 5432] [--database mottu_tracking]
+        [--user postgres] [--password ...]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database'))
+
+import psycopg2  # noqa: E402
+
+from database_module import RegistroStatements  # noqa: E402
+
+CONSULTAS = {
+    'localizacao_atual': """
+        SELECT localizacao_id AS id, moto_id, latitude, longitude, velocidade,
+               direcao, timestamp, origem_dados, precisao, altitude
+        FROM localizacao_atual
+        WHERE moto_id = %s
+    """,
+    'localizacao_registrar': """
+        INSERT INTO localizacoes
+        (moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """
+}
+
+
+def parametros(nome, moto_id, i):
+    if nome == 'localizacao_atual':
+        return (moto_id,)
+    return (moto_id, -23.55 + i * 1e-6, -46.63, 30.0, 'gps', 'N', 5.0, 760.0)
+
+
+def medir(cur, nome, moto_id, iteracoes, executar):
+    tempos = []
+    for i in range(iteracoes):
+        inicio = time.perf_counter()
+        executar(cur, nome, parametros(nome, moto_id, i))
+        cur.fetchall()
+        tempos.append((time.perf_counter() - inicio) * 1e6)
+    tempos.sort()
+    return {
+        'media_us': statistics.fmean(tempos),
+        'p50_us': tempos[len(tempos) // 2],
+        'p99_us': tempos[int(len(tempos) * 0.99)]
+    }
+
+
+def rodada(conn, nome, executar, iteracoes):
+    """Mede uma consulta em uma transação própria, desfeita no final"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO motos (placa, modelo, marca, ano) "
+                "VALUES ('BENCH01', 'Bench', 'Bench', 2024) RETURNING id"
+            )
+            moto_id = cur.fetchone()[0]
+            cur.execute(CONSULTAS['localizacao_registrar'], parametros('localizacao_registrar', moto_id, 0))
+            # Aquecimento (cache do Postgres e do PREPARE)
+            medir(cur, nome, moto_id, 100, executar)
+            return medir(cur, nome, moto_id, iteracoes, executar)
+    finally:
+        conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQL a cada chamada vs prepared statements')
+    parser.add_argument('--iteracoes', type=int, default=5000)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='mottu_tracking')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(host=args.host, port=args.port, dbname=args.database,
+                            user=args.user, password=args.password)
+    registro = RegistroStatements()
+    for nome, sql in CONSULTAS.items():
+        registro.registrar(nome, sql)
+
+    try:
+        print(f"{'consulta':<24} {'modo':<10} {'media (us)':>11} {'p50 (us)':>10} {'p99 (us)':>10}")
+        for nome, sql in CONSULTAS.items():
+            modos = (
+                ('texto', lambda c, _, p, sql=sql: c.execute(sql, p)),
+                ('preparado', registro.executar)
+            )
+            for modo, executar in modos:
+                r = rodada(conn, nome, executar, args.iteracoes)
+                print(f"{nome:<24} {modo:<10} {r['media_us']:>11.1f} "
+                      f"{r['p50_us']:>10.1f} {r['p99_us']:>10.1f}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
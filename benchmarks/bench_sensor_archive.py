@@ -0,0 +1,98 @@
+"""
+Benchmark da compressão do arquivo de sensores (sensor_archive.py)
+
+Grava um dia de leituras (uma a cada 3 s) de cada série com
+SensorArchive.write_segment e compara o tamanho em disco do segmento com
+os dados crus (int64 + float64 por leitura) e com os mesmos planos de
+bytes do XOR gravados sem compressão. Mede o tempo de leitura do dia e
+confere que ela devolve os mesmos valores.
+
+Uso:
+    python benchmarks/bench_sensor_archive.py [--leituras 28800]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sensor_archive import SensorArchive, encode_timestamps  # noqa: E402
+
+
+def series(count):
+    """Séries no formato gerado pelos simuladores de main.py"""
+    rng = random.Random(0)
+    hours = np.arange(count) * 3 / 3600
+    base_temp = 22 + 6 * np.sin((hours - 9) / 24 * 2 * np.pi)
+    temperature = [round(t + rng.uniform(-3, 3), 1) for t in base_temp]
+    walk, smooth = 25.0, []
+    for _ in range(count):
+        walk += rng.choice((-0.1, 0, 0, 0, 0.1))
+        smooth.append(round(walk, 1))
+    return {
+        'temperature (SmartParkingIoT)': temperature,
+        'temperature (SimpleIoTSystem)': [round(20 + rng.uniform(-5, 10), 1) for _ in range(count)],
+        'temperatura estável (±0,1)': smooth,
+        'humidity': [round(max(30, min(90, 80 - (t - 20) * 2 + rng.uniform(-10, 10))), 1)
+                     for t in temperature],
+        'motion': [float(rng.random() < 0.1) for _ in range(count)],
+        'float sem arredondar': [20 + rng.gauss(0, 2) for _ in range(count)]
+    }
+
+
+def uncompressed_size(timestamps, values):
+    """Bytes dos planos do XOR e dos deltas de timestamp em .npy sem compressão"""
+    deltas, _ = encode_timestamps(timestamps)
+    bits = values.view('<u8')
+    xored = bits.copy()
+    xored[1:] ^= bits[:-1]
+    planes = xored.view(np.uint8).reshape(-1, 8)
+    kept = sum(1 for j in range(8) if planes[:, j].any())
+    return 2 * 128 + deltas.nbytes + kept * values.size
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compressão dos segmentos do arquivo de sensores')
+    parser.add_argument('--leituras', type=int, default=28800, help='leituras por dia (padrão: a cada 3 s)')
+    args = parser.parse_args()
+
+    start = np.datetime64('2025-01-01T00:00:00', 'us')
+    timestamps = start + np.arange(args.leituras) * np.timedelta64(3, 's')
+    raw = args.leituras * 16
+
+    print(f"{args.leituras} leituras/dia; dados crus {raw / 1024:.0f} kB por série\n")
+    print(f"{'série':32} {'codificação':>11} {'sem deflate':>11} {'segmento':>10} "
+          f"{'razão':>7} {'B/leitura':>10} {'gravação':>9} {'leitura':>8}")
+
+    with tempfile.TemporaryDirectory() as path:
+        archive = SensorArchive(path)
+        for i, (name, data) in enumerate(series(args.leituras).items()):
+            values = np.array(data, dtype=np.float64)
+            begin = time.perf_counter()
+            meta = archive.write_segment('sensor_data', f's{i}', '2025-01-01', timestamps, values)
+            elapsed = time.perf_counter() - begin
+
+            begin = time.perf_counter()
+            read_ts, read_values = archive.read_segment('sensor_data', f's{i}', '2025-01-01')
+            read_time = time.perf_counter() - begin
+            assert np.array_equal(read_ts, timestamps)
+            assert np.array_equal(read_values.view('<u8'), values.view('<u8'))
+
+            size = directory_size(os.path.join(path, 'sensor_data', f's{i}', '2025-01-01'))
+            print(f"{name:32} {meta['encoding']:>11} {uncompressed_size(timestamps, values) / 1024:>9.1f}kB "
+                  f"{size / 1024:>8.1f}kB {raw / size:>6.1f}x {size / args.leituras:>10.2f} "
+                  f"{elapsed * 1000:>7.1f}ms {read_time * 1000:>6.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
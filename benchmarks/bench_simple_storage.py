@@ -0,0 +1,152 @@
+"""
+Benchmark do armazenamento do SimpleIoTSystem
+
+Compara o formato antigo (`readings`: uma linha por sensor, commit por
+ciclo) com `readings_wide` nos modos 'wide' e 'batched', e mede a
+migração de um banco antigo.
+
+Uso:
+    python benchmarks/bench_simple_storage.py [--ticks 20000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from simple_storage import WideRowStore, migrate_readings, wide_row  # noqa: E402
+
+
+def generate_ticks(count):
+    start = datetime(2025, 1, 1)
+    ticks = []
+    for i in range(count):
+        sensors = {
+            'temperature': round(20 + random.uniform(-5, 10), 1),
+            'humidity': round(40 + random.uniform(-20, 40), 1),
+            'motion': random.choice([True, False]),
+            'light': round(200 + random.uniform(-100, 300), 1),
+            'motorcycles': random.randint(0, 3)
+        }
+        ticks.append(((start + timedelta(seconds=3 * i)).isoformat(), sensors))
+    return ticks
+
+
+def create_legacy(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS readings (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            sensor_type TEXT,
+            value REAL
+        )
+    ''')
+    # Mesmo índice criado pela manutenção (database.tables.sensor_readings)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON readings(timestamp)')
+    conn.commit()
+
+
+def write_legacy(conn, ticks):
+    """Caminho antigo: um execute por sensor e um commit por ciclo"""
+    for timestamp, sensors in ticks:
+        cursor = conn.cursor()
+        for sensor_type, value in sensors.items():
+            if sensor_type != 'motion':
+                cursor.execute(
+                    'INSERT INTO readings (timestamp, sensor_type, value) VALUES (?, ?, ?)',
+                    (timestamp, sensor_type, float(value))
+                )
+        conn.commit()
+
+
+def db_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal', path + '-journal') if os.path.exists(p))
+
+
+def run_case(name, ticks, workdir, writer):
+    path = os.path.join(workdir, f'{name}.db')
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    rows = writer(conn, ticks, workdir)
+    elapsed = time.perf_counter() - start
+    conn.execute('VACUUM')
+    conn.close()
+    return {
+        'case': name,
+        'ticks_per_s': len(ticks) / elapsed,
+        'rows_per_s': rows / elapsed,
+        'size_kb': db_size(path) / 1024
+    }
+
+
+def legacy_case(conn, ticks, _):
+    create_legacy(conn)
+    write_legacy(conn, ticks)
+    return len(ticks) * 4
+
+
+def wide_case(conn, ticks, _):
+    store = WideRowStore(conn, mode='wide')
+    for timestamp, sensors in ticks:
+        store.write(wide_row(timestamp, sensors))
+    return len(ticks)
+
+
+def batched_case(conn, ticks, workdir):
+    store = WideRowStore(conn, mode='batched', batch_size=100, flush_interval_s=30,
+                         journal_path=os.path.join(workdir, 'bench.journal'))
+    for timestamp, sensors in ticks:
+        store.write(wide_row(timestamp, sensors))
+    store.close()
+    return len(ticks)
+
+
+def bench_migration(ticks, workdir):
+    path = os.path.join(workdir, 'migration.db')
+    conn = sqlite3.connect(path)
+    create_legacy(conn)
+    with conn:
+        for timestamp, sensors in ticks:
+            conn.executemany(
+                'INSERT INTO readings (timestamp, sensor_type, value) VALUES (?, ?, ?)',
+                [(timestamp, k, float(v)) for k, v in sensors.items() if k != 'motion']
+            )
+    conn.execute('VACUUM')
+    before = db_size(path)
+
+    start = time.perf_counter()
+    migrated = migrate_readings(conn)
+    elapsed = time.perf_counter() - start
+    conn.execute('VACUUM')
+    conn.close()
+    return migrated, elapsed, before, db_size(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de readings vs readings_wide')
+    parser.add_argument('--ticks', type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    ticks = generate_ticks(args.ticks)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'caso':<10} {'ciclos/s':>12} {'linhas/s':>12} {'tamanho (KB)':>14}")
+        for name, writer in (('legacy', legacy_case), ('wide', wide_case), ('batched', batched_case)):
+            result = run_case(name, ticks, workdir, writer)
+            print(f"{result['case']:<10} {result['ticks_per_s']:>12.0f} "
+                  f"{result['rows_per_s']:>12.0f} {result['size_kb']:>14.1f}")
+
+        migrated, elapsed, before, after = bench_migration(ticks, workdir)
+        print(f"\nMigracao: {migrated} ciclos em {elapsed:.2f}s | "
+              f"{before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""
+Pipeline de duas etapas: recortes por motocicleta
+
+A primeira etapa (YOLO) encontra as motos; esta segunda etapa recorta cada
+bounding box, agrupa recortes de vários frames em lotes e executa
+analisadores secundários plugáveis (cor/modelo por HSV, região da placa,
+...) num pool de workers. O custo passa a crescer com o número de motos,
+não com o tamanho do frame.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECONDARY_ANALYSIS = {
+    'enabled': True,
+    'max_batch_size': 32,
+    'max_wait_ms': 20,
+    'workers': 2,
+    'analysers': ['hsv_colour', 'plate_region']
+}
+
+MOTORCYCLE_CLASSES = ('motorcycle', 'motorbike')
+
+
+class SecondaryAnalyser:
+    """
+    Base dos analisadores da segunda etapa.
+
+    `analyse_batch(crops)` recebe uma lista de recortes BGR e retorna um
+    dicionário de resultados para cada recorte, na mesma ordem.
+    """
+
+    name = 'base'
+
+    def analyse_batch(self, crops):
+        raise NotImplementedError
+
+
+class HSVColourClassifier(SecondaryAnalyser):
+    """
+    Classifica cor dominante e modelo Mottu pelo espaço HSV.
+
+    Todos os recortes do lote são redimensionados e empilhados numa única
+    imagem, convertidos para HSV de uma vez e as máscaras são calculadas
+    vetorizadas por recorte.
+    """
+
+    name = 'hsv_colour'
+
+    # Faixas de matiz do OpenCV (0-179)
+    HUE_RANGES = {
+        'vermelho': [(0, 10), (170, 180)],
+        'laranja': [(10, 22)],
+        'amarelo': [(22, 35)],
+        'verde': [(35, 85)],
+        'azul': [(85, 130)],
+        'roxo': [(130, 170)]
+    }
+
+    # Verde Mottu (vibrante)
+    MOTTU_GREEN = ((35, 100, 80), (85, 255, 255))
+
+    def __init__(self, size=64):
+        self.size = size
+
+    def analyse_batch(self, crops):
+        if not crops:
+            return []
+
+        n, size = len(crops), self.size
+        stacked = np.vstack([cv2.resize(crop, (size, size)) for crop in crops])
+        hsv = cv2.cvtColor(stacked, cv2.COLOR_BGR2HSV).reshape(n, size * size, 3)
+        gray = cv2.cvtColor(stacked, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 50, 150).reshape(n, size * size)
+
+        hue = hsv[..., 0]
+        sat = hsv[..., 1]
+        val = hsv[..., 2]
+
+        chromatic = (sat > 60) & (val > 50)
+        lower, upper = self.MOTTU_GREEN
+        mottu_green = (
+            (hue >= lower[0]) & (hue <= upper[0])
+            & (sat >= lower[1]) & (val >= lower[2])
+        ).mean(axis=1)
+        edge_density = (edges > 0).mean(axis=1)
+        brightness = val.mean(axis=1) / 255.0
+
+        colour_shares = {}
+        for colour, ranges in self.HUE_RANGES.items():
+            in_range = np.zeros_like(chromatic)
+            for low, high in ranges:
+                in_range |= (hue >= low) & (hue < high)
+            colour_shares[colour] = (in_range & chromatic).mean(axis=1)
+
+        names = list(colour_shares)
+        shares = np.stack([colour_shares[c] for c in names], axis=1)
+        chromatic_share = chromatic.mean(axis=1)
+
+        results = []
+        for i in range(n):
+            if chromatic_share[i] < 0.15:
+                colour = 'branco' if brightness[i] > 0.6 else ('preto' if brightness[i] < 0.3 else 'cinza')
+            else:
+                colour = names[int(np.argmax(shares[i]))]
+
+            results.append({
+                'cor_dominante': colour,
+                'verde_mottu': round(float(mottu_green[i]), 3),
+                'densidade_bordas': round(float(edge_density[i]), 3),
+                'modelo': self._classify_model(mottu_green[i], edge_density[i])
+            })
+        return results
+
+    @staticmethod
+    def _classify_model(green_share, edge_density):
+        """Pontuação dos modelos Mottu (ver docs/architecture.md)"""
+        if green_share < 0.10:
+            return None
+        if edge_density > 0.18:
+            return 'Mottu Sport 110i'
+        if edge_density < 0.08:
+            return 'Mottu E'
+        return 'Mottu Pop'
+
+
+class PlateRegionFinder(SecondaryAnalyser):
+    """
+    Localiza a região provável da placa na metade inferior do recorte.
+
+    Placas de moto Mercosul têm 200x170 mm, então procura retângulos
+    claros/escuros de alto contraste com proporção próxima de 1.2.
+    """
+
+    name = 'plate_region'
+
+    def __init__(self, min_aspect=0.9, max_aspect=1.8, min_area_ratio=0.004, max_area_ratio=0.08):
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+        self.min_area_ratio = min_area_ratio
+        self.max_area_ratio = max_area_ratio
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5))
+
+    def analyse_batch(self, crops):
+        return [self._find(crop) for crop in crops]
+
+    def _find(self, crop):
+        height, width = crop.shape[:2]
+        top = height // 2
+        lower = crop[top:]
+        if lower.size == 0:
+            return {'placa_regiao': None, 'placa_score': 0.0}
+
+        gray = cv2.cvtColor(lower, cv2.COLOR_BGR2GRAY)
+        blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, self.kernel)
+        _, mask = cv2.threshold(blackhat, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        crop_area = float(height * width)
+        best, best_score = None, 0.0
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if h == 0:
+                continue
+            area_ratio = (w * h) / crop_area
+            aspect = w / h
+            if not (self.min_area_ratio <= area_ratio <= self.max_area_ratio):
+                continue
+            if not (self.min_aspect <= aspect <= self.max_aspect):
+                continue
+            # Retângulo bem preenchido e centralizado pontua mais
+            fill = cv2.contourArea(contour) / float(w * h)
+            centre = 1.0 - abs((x + w / 2) / width - 0.5)
+            score = fill * centre
+            if score > best_score:
+                best, best_score = [x, y + top, w, h], score
+
+        return {'placa_regiao': best, 'placa_score': round(best_score, 3)}
+
+
+ANALYSERS = {
+    HSVColourClassifier.name: HSVColourClassifier,
+    PlateRegionFinder.name: PlateRegionFinder
+}
+
+
+def register_analyser(analyser_cls):
+    """Registra um novo analisador secundário pelo atributo `name`"""
+    ANALYSERS[analyser_cls.name] = analyser_cls
+    return analyser_cls
+
+
+def build_analysers(names):
+    analysers = []
+    for name in names:
+        if name not in ANALYSERS:
+            logger.warning(f"Analisador secundario desconhecido: {name}")
+            continue
+        analysers.append(ANALYSERS[name]())
+    return analysers
+
+
+class _FrameTask:
+    """Acompanha os recortes pendentes de um frame"""
+
+    def __init__(self, detections, crop_count):
+        self.detections = detections
+        self.pending = crop_count
+        self.future = Future()
+        self.lock = threading.Lock()
+
+    def crop_done(self):
+        with self.lock:
+            self.pending -= 1
+            finished = self.pending == 0
+        if finished:
+            self.future.set_result(self.detections)
+
+
+class CropPipeline:
+    """
+    Segunda etapa: agrupa recortes de vários frames e executa os analisadores.
+
+    `submit(frame, detections)` copia os recortes das motos e retorna um
+    Future com as mesmas detecções acrescidas da chave `analise`.
+    """
+
+    def __init__(self, analysers, max_batch_size=32, max_wait_ms=20, workers=2,
+                 classes=MOTORCYCLE_CLASSES, max_queue=1024):
+        self.analysers = analysers
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.classes = set(classes)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                            thread_name_prefix='crop-analyser')
+        self._thread = None
+        self._running = False
+
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._crops = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._dispatch, name='crop-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._executor.shutdown(wait=False)
+
+    def submit(self, frame, detections):
+        """Enfileira os recortes das motos detectadas no frame"""
+        height, width = frame.shape[:2]
+        crops = []
+        for detection in detections:
+            if detection.get('class', detection.get('class_name')) not in self.classes:
+                continue
+            x, y, w, h = detection['bbox']
+            x1, y1 = max(0, int(x)), max(0, int(y))
+            x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+            # Cópia: o frame pode ser desenhado/descartado pelo chamador
+            crops.append((detection, frame[y1:y2, x1:x2].copy(), (x1, y1)))
+
+        task = _FrameTask(detections, len(crops))
+        if not crops:
+            task.future.set_result(detections)
+            return task.future
+
+        for detection, crop, offset in crops:
+            self._queue.put((task, detection, crop, offset))
+        return task.future
+
+    def _dispatch(self):
+        while self._running:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._executor.submit(self._analyse, batch)
+
+    def _analyse(self, batch):
+        crops = [crop for _, _, crop, _ in batch]
+        results = [{} for _ in batch]
+        for analyser in self.analysers:
+            try:
+                for result, partial in zip(results, analyser.analyse_batch(crops)):
+                    result.update(partial)
+            except Exception as e:
+                logger.error(f"Erro no analisador {analyser.name}: {e}")
+
+        for (task, detection, _, (offset_x, offset_y)), result in zip(batch, results):
+            region = result.get('placa_regiao')
+            if region:
+                # Coordenadas do recorte -> coordenadas do frame
+                result['placa_regiao'] = [region[0] + offset_x, region[1] + offset_y, region[2], region[3]]
+            detection['analise'] = result
+            task.crop_done()
+
+        with self._metrics_lock:
+            self._batches += 1
+            self._crops += len(batch)
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'crops': self._crops,
+                'avg_batch_size': round(self._crops / self._batches, 2) if self._batches else 0
+            }
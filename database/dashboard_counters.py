@@ -0,0 +1,92 @@
+"""
+Reconciliação dos contadores do dashboard - Mottu Tracking System
+
+`dashboard_contadores` é mantida por triggers em motos, alertas, viagens e
+entregadores, então `GET /api/dashboard/resumo` não conta tabelas. Operações
+que não disparam triggers por linha (TRUNCATE, cargas com triggers
+desabilitados) deixam os contadores desatualizados: este job os recalcula
+periodicamente com reconciliar_contadores_dashboard().
+
+Roda em uma thread da API ou pelo cron:
+    python dashboard_counters.py
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+import psycopg2
+
+from database_module import Database, DashboardRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliacaoContadores:
+    """Corrige periodicamente desvios de dashboard_contadores"""
+
+    def __init__(self, db: Database, intervalo_minutos: float = 15):
+        self.repo = DashboardRepository(db)
+        self.intervalo = intervalo_minutos * 60
+
+        self._parar = threading.Event()
+        self._thread = None
+
+        self._execucoes = 0
+        self._correcoes = 0
+        self._ultima_execucao = None
+        self._ultimas_correcoes = []
+        self._ultimo_erro = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._run, name='reconciliacao-contadores', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._parar.is_set():
+            try:
+                self.executar()
+            except psycopg2.Error as e:
+                self._ultimo_erro = str(e).strip()
+                logger.error(f"Erro na reconciliação dos contadores: {e}")
+            self._parar.wait(self.intervalo)
+
+    def executar(self) -> List[Dict]:
+        """Recalcula os contadores; retorna os que estavam divergentes"""
+        corrigidos = self.repo.reconciliar_contadores()
+        if corrigidos:
+            logger.warning(f"Contadores do dashboard corrigidos: {corrigidos}")
+        self._execucoes += 1
+        self._correcoes += len(corrigidos)
+        self._ultima_execucao = datetime.now().isoformat()
+        self._ultimas_correcoes = [dict(c) for c in corrigidos]
+        return corrigidos
+
+    def metricas(self) -> Dict:
+        return {
+            'execucoes': self._execucoes,
+            'correcoes': self._correcoes,
+            'ultima_execucao': self._ultima_execucao,
+            'ultimas_correcoes': self._ultimas_correcoes,
+            'ultimo_erro': self._ultimo_erro
+        }
+
+
+if __name__ == '__main__':
+    db = Database()
+    try:
+        corrigidos = ReconciliacaoContadores(db).executar()
+        print(f"✓ {len(corrigidos)} contadores corrigidos")
+        for c in corrigidos:
+            print(f"  {c['chave']}: {c['valor_anterior']} -> {c['valor_real']}")
+    finally:
+        db.close_all_connections()
@@ -0,0 +1,527 @@
+"""
+Database Async Module - Mottu Tracking System
+Repositórios asyncio sobre asyncpg
+
+Mesmos métodos e assinaturas de database_module.py, como corrotinas, para
+servir a API em ASGI (apirest_asgi.py): uma requisição esperando o banco
+não prende uma thread. O asyncpg já mantém um cache de prepared statements
+por conexão, então não há registro de statements como no módulo síncrono.
+
+Réplicas de leitura ainda não são usadas aqui: `somente_leitura` é aceito
+por compatibilidade e todas as consultas vão ao primário.
+"""
+
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from database_module import (
+    CachePlacas, DatabaseConfig, LocalizacaoRepository, Pagina, MAX_PAGINA,
+    RegistroStatements, codificar_cursor, decodificar_cursor
+)
+from trip_metrics import PONTOS_VIAGENS_SQL, calcular_metricas
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """Pool asyncpg (criado em `conectar`, dentro do event loop da aplicação)"""
+
+    def __init__(self, config: DatabaseConfig = None):
+        self.config = config or DatabaseConfig()
+        self.pool = None
+        self.placas = CachePlacas(self.config.CACHE_PLACAS)
+
+    async def conectar(self):
+        """Inicializa o pool de conexões"""
+        try:
+            self.pool = await asyncpg.create_pool(
+                host=self.config.HOST,
+                port=self.config.PORT,
+                database=self.config.DATABASE,
+                user=self.config.USER,
+                password=self.config.PASSWORD,
+                min_size=self.config.MIN_CONNECTIONS,
+                max_size=self.config.MAX_CONNECTIONS,
+                init=self._configurar_conexao
+            )
+            logger.info("Pool de conexões assíncrono inicializado com sucesso")
+        except Exception as e:
+            logger.error(f"Erro ao inicializar pool assíncrono: {e}")
+            raise
+
+    @staticmethod
+    async def _configurar_conexao(conn):
+        # Colunas JSON como dict (igual ao psycopg2) e parâmetros JSON como objetos Python
+        await conn.set_type_codec('json', encoder=json.dumps, decoder=json.loads,
+                                  schema='pg_catalog')
+
+    @asynccontextmanager
+    async def get_connection(self, somente_leitura: bool = False):
+        """Conexão do pool dentro de uma transação (commit ao sair, rollback em erro)"""
+        async with self.pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    yield conn
+            except Exception as e:
+                logger.error(f"Erro na transação: {e}")
+                raise
+
+    async def close_all_connections(self):
+        """Fecha todas as conexões do pool"""
+        if self.pool:
+            await self.pool.close()
+            logger.info("Todas as conexões assíncronas foram fechadas")
+
+
+def _como_dict(registro) -> Optional[Dict]:
+    return dict(registro) if registro is not None else None
+
+
+async def buscar_pagina(db: AsyncDatabase, query: str, params: List, limite: int,
+                        chaves: Tuple[str, ...]) -> Pagina:
+    """Versão assíncrona de database_module.buscar_pagina (LIMIT é o último parâmetro)"""
+    limite = max(1, min(int(limite), MAX_PAGINA))
+    async with db.get_connection(somente_leitura=True) as conn:
+        linhas = [dict(r) for r in await conn.fetch(query, *params, limite + 1)]
+
+    if len(linhas) <= limite:
+        return Pagina(linhas)
+    linhas = linhas[:limite]
+    return Pagina(linhas, codificar_cursor([linhas[-1][chave] for chave in chaves]))
+
+
+class AsyncMotoRepository:
+    """Repositório assíncrono para operações com a tabela motos"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def criar_moto(self, placa: str, modelo: str, marca: str, ano: int, **kwargs) -> int:
+        """Cria uma nova moto no sistema"""
+        query = """
+            INSERT INTO motos (placa, modelo, marca, ano, cor, numero_chassi, status)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            moto_id = await conn.fetchval(
+                query, placa, modelo, marca, ano,
+                kwargs.get('cor'),
+                kwargs.get('numero_chassi'),
+                kwargs.get('status', 'disponivel')
+            )
+            logger.info(f"Moto criada com ID: {moto_id}")
+        self.db.placas.guardar(placa, moto_id)
+        return moto_id
+
+    async def obter_moto(self, moto_id: int) -> Optional[Dict]:
+        """Obtém informações de uma moto"""
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return _como_dict(await conn.fetchrow("SELECT * FROM motos WHERE id = $1", moto_id))
+
+    async def obter_id_por_placa(self, placa: str) -> Optional[int]:
+        """Id da moto pela placa (cache LRU; na falta, índice único de placa)"""
+        moto_id = self.db.placas.obter(placa)
+        if moto_id is not None:
+            return moto_id
+
+        async with self.db.get_connection() as conn:
+            moto_id = await conn.fetchval("SELECT id FROM motos WHERE placa = $1", placa)
+        if moto_id is not None:
+            self.db.placas.guardar(placa, moto_id)
+        return moto_id
+
+    async def listar_motos(self, status: Optional[str] = None, limit: int = 100,
+                           cursor: Optional[str] = None) -> Pagina:
+        """Lista motos por id com filtro opcional de status (paginado por cursor)"""
+        filtros = []
+        params = []
+        if status:
+            params.append(status)
+            filtros.append(f"status = ${len(params)}")
+        if cursor:
+            params.extend(decodificar_cursor(cursor, 1))
+            filtros.append(f"id > ${len(params)}")
+
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        query = f"SELECT * FROM motos {where} ORDER BY id LIMIT ${len(params) + 1}"
+        return await buscar_pagina(self.db, query, params, limit, ('id',))
+
+    async def atualizar_status(self, moto_id: int, novo_status: str) -> bool:
+        """Atualiza o status de uma moto"""
+        async with self.db.get_connection() as conn:
+            resultado = await conn.execute(
+                "UPDATE motos SET status = $1 WHERE id = $2", novo_status, moto_id
+            )
+            return resultado != 'UPDATE 0'
+
+    async def atualizar_bateria(self, moto_id: int, percentual: int) -> bool:
+        """Atualiza o nível de bateria (trigger cria alerta automaticamente)"""
+        async with self.db.get_connection() as conn:
+            resultado = await conn.execute(
+                "UPDATE motos SET bateria_percentual = $1 WHERE id = $2", percentual, moto_id
+            )
+            return resultado != 'UPDATE 0'
+
+
+class AsyncLocalizacaoRepository:
+    """Repositório assíncrono para operações de localização"""
+
+    ORIGENS_VALIDAS = LocalizacaoRepository.ORIGENS_VALIDAS
+    MAX_LOTE = LocalizacaoRepository.MAX_LOTE
+    # Validação é a mesma do repositório síncrono (não acessa o banco)
+    validar_localizacao = LocalizacaoRepository.validar_localizacao
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def registrar_localizacao(self, moto_id: int, latitude: float, longitude: float,
+                                    velocidade: float = 0, origem: str = 'iot', **kwargs) -> int:
+        """Registra nova localização da moto"""
+        query = """
+            INSERT INTO localizacoes
+            (moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            return await conn.fetchval(
+                query, moto_id, latitude, longitude, velocidade, origem,
+                kwargs.get('direcao'),
+                kwargs.get('precisao'),
+                kwargs.get('altitude')
+            )
+
+    async def registrar_por_placa(self, placa: str, latitude: float, longitude: float,
+                                  modelo: str, marca: str, ano: int, velocidade: float = 0,
+                                  origem: str = 'visao_computacional') -> Dict:
+        """Localização pela placa em um único comando (ver LocalizacaoRepository)"""
+        moto_id = self.db.placas.obter(placa)
+        if moto_id is not None:
+            try:
+                loc_id = await self.registrar_localizacao(moto_id, latitude, longitude, velocidade, origem)
+                return {'moto_id': moto_id, 'localizacao_id': loc_id, 'moto_criada': False}
+            except asyncpg.ForeignKeyViolationError:
+                # Moto removida depois de entrar no cache
+                self.db.placas.invalidar(placa)
+
+        query = """
+            WITH moto AS (
+                INSERT INTO motos (placa, modelo, marca, ano)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (placa) DO UPDATE SET ultima_atualizacao = CURRENT_TIMESTAMP
+                RETURNING id, xmax = 0 AS criada
+            )
+            INSERT INTO localizacoes (moto_id, latitude, longitude, velocidade, origem_dados)
+            SELECT id, $5, $6, $7, $8 FROM moto
+            RETURNING moto_id, id, (SELECT criada FROM moto)
+        """
+
+        async with self.db.get_connection() as conn:
+            moto_id, loc_id, criada = await conn.fetchrow(
+                query, placa, modelo, marca, ano, latitude, longitude, velocidade, origem
+            )
+        self.db.placas.guardar(placa, moto_id)
+        if criada:
+            logger.info(f"Moto criada com ID: {moto_id}")
+        return {'moto_id': moto_id, 'localizacao_id': loc_id, 'moto_criada': criada}
+
+    async def registrar_localizacoes_lote(self, pontos: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Registra um lote de localizações em uma transação (mesma semântica do
+        repositório síncrono). As colunas vão como arrays em um único
+        INSERT ... SELECT FROM unnest(...).
+        """
+        erros = []
+        validos = []
+        for indice, dados in enumerate(pontos):
+            linha, erro = self.validar_localizacao(dados)
+            if erro:
+                erros.append({'index': indice, 'error': erro})
+            else:
+                validos.append((indice, linha))
+
+        if not validos:
+            return [], erros
+
+        query = """
+            INSERT INTO localizacoes
+            (moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude, timestamp)
+            SELECT moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude,
+                   COALESCE(timestamp, CURRENT_TIMESTAMP)
+            FROM unnest($1::INTEGER[], $2::FLOAT8[], $3::FLOAT8[], $4::FLOAT8[], $5::TEXT[],
+                        $6::TEXT[], $7::FLOAT8[], $8::FLOAT8[], $9::TIMESTAMP[])
+                AS t(moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude, timestamp)
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            # FK violada abortaria o lote inteiro: separa antes as motos inexistentes
+            existentes = {
+                r['id'] for r in await conn.fetch(
+                    "SELECT id FROM motos WHERE id = ANY($1::INTEGER[])",
+                    list({linha[0] for _, linha in validos})
+                )
+            }
+            inserir = []
+            for indice, linha in validos:
+                if linha[0] in existentes:
+                    inserir.append((indice, linha))
+                else:
+                    erros.append({'index': indice, 'error': f'Moto não encontrada: {linha[0]}'})
+
+            inseridos = []
+            if inserir:
+                colunas = [list(coluna) for coluna in zip(*(linha for _, linha in inserir))]
+                colunas[5] = [str(d) if d is not None else None for d in colunas[5]]
+                ids = await conn.fetch(query, *colunas)
+                inseridos = [
+                    {'index': indice, 'id': row['id']}
+                    for (indice, _), row in zip(inserir, ids)
+                ]
+
+        erros.sort(key=lambda erro: erro['index'])
+        logger.info(f"Lote de localizações: {len(inseridos)} inseridas, {len(erros)} rejeitadas")
+        return inseridos, erros
+
+    async def obter_localizacao_atual(self, moto_id: int) -> Optional[Dict]:
+        """Obtém a localização mais recente de uma moto (tabela localizacao_atual)"""
+        query = """
+            SELECT localizacao_id AS id, moto_id, latitude, longitude, velocidade,
+                   direcao, timestamp, origem_dados, precisao, altitude
+            FROM localizacao_atual
+            WHERE moto_id = $1
+        """
+
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return _como_dict(await conn.fetchrow(query, moto_id))
+
+    async def obter_historico(self, moto_id: int, horas: int = 24, limite: int = MAX_PAGINA,
+                              cursor: Optional[str] = None) -> Pagina:
+        """Obtém histórico de localizações, mais recentes primeiro (paginado por cursor)"""
+        params = [moto_id, horas]
+        filtro_cursor = ""
+        if cursor:
+            params.extend(decodificar_cursor(cursor, 2))
+            filtro_cursor = "AND (timestamp, id) < ($3, $4)"
+
+        query = f"""
+            SELECT * FROM localizacoes
+            WHERE moto_id = $1
+            AND timestamp >= NOW() - $2 * INTERVAL '1 hour'
+            {filtro_cursor}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ${len(params) + 1}
+        """
+        return await buscar_pagina(self.db, query, params, limite, ('timestamp', 'id'))
+
+    async def iterar_historico(self, moto_id: int, horas: int = 24,
+                               itersize: int = 2000) -> AsyncIterator[Dict]:
+        """Histórico via cursor no servidor, em blocos de `itersize` linhas"""
+        query = """
+            SELECT * FROM localizacoes
+            WHERE moto_id = $1
+            AND timestamp >= NOW() - $2 * INTERVAL '1 hour'
+            ORDER BY timestamp DESC, id DESC
+        """
+
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            async for registro in conn.cursor(query, moto_id, horas, prefetch=itersize):
+                yield dict(registro)
+
+    async def obter_todas_localizacoes_atuais(self) -> List[Dict]:
+        """Obtém localização atual de todas as motos (view sobre localizacao_atual)"""
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return [dict(r) for r in await conn.fetch("SELECT * FROM v_localizacao_atual")]
+
+
+class AsyncAlertaRepository:
+    """Repositório assíncrono para operações com alertas"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def criar_alerta(self, moto_id: Optional[int], tipo: str, mensagem: str,
+                           severidade: str = 'media', detalhes: Dict = None) -> int:
+        """Cria um novo alerta"""
+        query = """
+            INSERT INTO alertas (moto_id, tipo, severidade, mensagem, detalhes)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            return await conn.fetchval(query, moto_id, tipo, severidade, mensagem, detalhes or None)
+
+    async def listar_alertas_ativos(self, severidade: Optional[str] = None, limite: int = 100,
+                                    cursor: Optional[str] = None) -> Pagina:
+        """Lista alertas não resolvidos, mais recentes primeiro (paginado por cursor)"""
+        filtros = ["resolvido = FALSE"]
+        params = []
+        if severidade:
+            params.append(severidade)
+            filtros.append(f"severidade = ${len(params)}")
+        if cursor:
+            params.extend(decodificar_cursor(cursor, 2))
+            filtros.append(f"(data_criacao, id) < (${len(params) - 1}, ${len(params)})")
+
+        query = f"""
+            SELECT * FROM alertas
+            WHERE {' AND '.join(filtros)}
+            ORDER BY data_criacao DESC, id DESC
+            LIMIT ${len(params) + 1}
+        """
+        return await buscar_pagina(self.db, query, params, limite, ('data_criacao', 'id'))
+
+    async def resolver_alerta(self, alerta_id: int, resolvido_por: str) -> bool:
+        """Marca um alerta como resolvido"""
+        query = """
+            UPDATE alertas
+            SET resolvido = TRUE, data_resolucao = NOW(), resolvido_por = $1
+            WHERE id = $2
+        """
+
+        async with self.db.get_connection() as conn:
+            return await conn.execute(query, resolvido_por, alerta_id) != 'UPDATE 0'
+
+
+class AsyncViagemRepository:
+    """Repositório assíncrono para operações com viagens"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def iniciar_viagem(self, moto_id: int, entregador_id: int,
+                             origem_lat: float, origem_lon: float) -> int:
+        """Inicia uma nova viagem"""
+        query = """
+            INSERT INTO viagens
+            (moto_id, entregador_id, data_inicio, origem_latitude, origem_longitude, status)
+            VALUES ($1, $2, NOW(), $3, $4, 'em_andamento')
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            return await conn.fetchval(query, moto_id, entregador_id, origem_lat, origem_lon)
+
+    async def finalizar_viagem(self, viagem_id: int, destino_lat: float,
+                               destino_lon: float, distancia_km: Optional[float], valor: float) -> bool:
+        """Finaliza uma viagem (distancia_km None = desconhecida)"""
+        query = """
+            UPDATE viagens
+            SET data_fim = NOW(), destino_latitude = $1, destino_longitude = $2,
+                distancia_km = $3, valor = $4, status = 'concluida'
+            WHERE id = $5
+        """
+
+        async with self.db.get_connection() as conn:
+            resultado = await conn.execute(query, destino_lat, destino_lon, distancia_km, valor, viagem_id)
+            return resultado != 'UPDATE 0'
+
+    async def listar_viagens_ativas(self, limite: int = 100, cursor: Optional[str] = None) -> Pagina:
+        """Lista viagens em andamento, mais recentes primeiro (paginado por cursor)"""
+        params = []
+        filtro_cursor = ""
+        if cursor:
+            params.extend(decodificar_cursor(cursor, 2))
+            filtro_cursor = "AND (v.data_inicio, v.id) < ($1, $2)"
+
+        query = f"""
+            SELECT v.*, m.placa, e.nome as entregador_nome
+            FROM viagens v
+            JOIN motos m ON v.moto_id = m.id
+            JOIN entregadores e ON v.entregador_id = e.id
+            WHERE v.status = 'em_andamento'
+            {filtro_cursor}
+            ORDER BY v.data_inicio DESC, v.id DESC
+            LIMIT ${len(params) + 1}
+        """
+        return await buscar_pagina(self.db, query, params, limite, ('data_inicio', 'id'))
+
+
+class AsyncSensorRepository:
+    """Repositório assíncrono para dados de sensores IoT"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def registrar_leitura(self, moto_id: int, tipo_sensor: str,
+                                valor: float, unidade: str = None, metadata: Dict = None) -> int:
+        """Registra leitura de sensor"""
+        query = """
+            INSERT INTO sensores_iot
+            (moto_id, tipo_sensor, valor, unidade, metadata, status_sensor)
+            VALUES ($1, $2, $3, $4, $5, 'online')
+            RETURNING id
+        """
+
+        async with self.db.get_connection() as conn:
+            return await conn.fetchval(query, moto_id, tipo_sensor, valor, unidade, metadata or None)
+
+    async def obter_ultimas_leituras(self, moto_id: int, tipo_sensor: str,
+                                     limite: int = 10) -> List[Dict]:
+        """Obtém últimas leituras de um sensor específico"""
+        query = """
+            SELECT * FROM sensores_iot
+            WHERE moto_id = $1 AND tipo_sensor = $2
+            ORDER BY timestamp DESC
+            LIMIT $3
+        """
+
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return [dict(r) for r in await conn.fetch(query, moto_id, tipo_sensor, limite)]
+
+
+class AsyncDashboardRepository:
+    """Repositório assíncrono para dados do dashboard"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def obter_resumo(self) -> Dict:
+        """Obtém resumo do dashboard (contadores mantidos por trigger)"""
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            linhas = await conn.fetch("SELECT chave, valor FROM dashboard_contadores ORDER BY chave")
+            return {r['chave']: r['valor'] for r in linhas}
+
+    async def reconciliar_contadores(self) -> List[Dict]:
+        """Recalcula os contadores a partir de v_dashboard_resumo e retorna os corrigidos"""
+        async with self.db.get_connection() as conn:
+            return [dict(r) for r in await conn.fetch("SELECT * FROM reconciliar_contadores_dashboard()")]
+
+    async def obter_estatisticas_motos(self) -> List[Dict]:
+        """Obtém estatísticas de uso das motos"""
+        query = "SELECT * FROM v_estatisticas_motos ORDER BY total_viagens DESC"
+
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return [dict(r) for r in await conn.fetch(query)]
+
+    async def obter_motos_com_alertas(self) -> List[Dict]:
+        """Obtém motos com alertas ativos"""
+        query = "SELECT * FROM v_motos_com_alertas ORDER BY alertas_criticos DESC, total_alertas DESC"
+
+        async with self.db.get_connection(somente_leitura=True) as conn:
+            return [dict(r) for r in await conn.fetch(query)]
+
+
+class AsyncMetricasViagens:
+    """Métricas de trajeto das viagens (ver trip_metrics.MetricasViagens)"""
+
+    PONTOS_SQL = RegistroStatements.converter_placeholders(PONTOS_VIAGENS_SQL)[0]
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def calcular(self, viagem_ids: List[int], somente_leitura: bool = True) -> Dict[int, Dict]:
+        """Métricas das viagens informadas (somente_leitura=False quando o resultado é gravado)"""
+        if not viagem_ids:
+            return {}
+        async with self.db.get_connection(somente_leitura=somente_leitura) as conn:
+            linhas = await conn.fetch(self.PONTOS_SQL, list(viagem_ids))
+        return calcular_metricas([tuple(linha) for linha in linhas])
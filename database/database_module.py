@@ -4,10 +4,17 @@ PostgreSQL Connection and Operations
 """
 
 import psycopg2
-from psycopg2 import pool, extras
-from typing import List, Dict, Any, Optional, Tuple
+from psycopg2 import pool, extras, errors
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
+import base64
+import contextvars
+import itertools
 import json
+import re
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 import logging
 
@@ -25,6 +32,52 @@ class DatabaseConfig:
     PASSWORD = "sua_senha_aqui"
     MIN_CONNECTIONS = 1
     MAX_CONNECTIONS = 20
+    # Réplicas de leitura: [{'host': ..., 'port': ...}] (demais campos herdam do primário)
+    REPLICAS = []
+    MAX_REPLICA_LAG_S = 5.0
+    REPLICA_LAG_CHECK_S = 2.0
+    # Entradas do cache placa -> id das motos (LRU, por processo)
+    CACHE_PLACAS = 4096
+    # Retenção das partições mensais: {'localizacoes': 12, 'sensores_iot': 6}
+    # (meses mantidos além do atual). Vazio: nenhuma partição é removida
+    RETENCAO_PARTICOES = {}
+    # Com False as partições vencidas só são desanexadas (DETACH, sem DROP)
+    APAGAR_PARTICOES = False
+
+
+# Marcado quando o contexto atual (requisição/thread) escreveu no primário:
+# as leituras seguintes desse contexto também vão ao primário (read-your-writes)
+_leitura_no_primario = contextvars.ContextVar('leitura_no_primario', default=False)
+
+# Posição do WAL já gravada no primário (o que uma réplica em dia já aplicou)
+LSN_PRIMARIO_SQL = "SELECT pg_current_wal_flush_lsn()"
+
+# Atraso de replicação em segundos: 0 no primário ou com o WAL do primário
+# (parâmetro) já aplicado; NULL se a réplica não está recebendo WAL (receiver
+# parado/desconectado: replay >= receive valeria mesmo com dados velhos).
+# Sem pg_read_all_stats o status vem NULL e vale só a comparação com o primário.
+LAG_REPLICA_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class Replica:
+    """Pool de uma réplica de leitura e o último atraso medido"""
+    
+    def __init__(self, nome: str, pool_conexoes):
+        self.nome = nome
+        self.pool = pool_conexoes
+        self.lag_s = None
+        self.verificado_em = 0.0
+        self.leituras = 0
+        self.ultimo_erro = None
 
 
 class Database:
@@ -33,10 +86,15 @@ class Database:
     def __init__(self, config: DatabaseConfig = None):
         self.config = config or DatabaseConfig()
         self.connection_pool = None
+        self.replicas = []
+        self.statements = RegistroStatements()
+        self.placas = CachePlacas(self.config.CACHE_PLACAS)
+        self._rodizio = itertools.count()
+        self._lock_replicas = threading.Lock()
         self._initialize_pool()
     
     def _initialize_pool(self):
-        """Inicializa o pool de conexões"""
+        """Inicializa o pool de conexões (primário e réplicas)"""
         try:
             self.connection_pool = psycopg2.pool.ThreadedConnectionPool(
                 self.config.MIN_CONNECTIONS,
@@ -51,11 +109,99 @@ class Database:
         except Exception as e:
             logger.error(f"Erro ao inicializar pool de conexões: {e}")
             raise
+        
+        for replica in self.config.REPLICAS:
+            nome = f"{replica['host']}:{replica.get('port', self.config.PORT)}"
+            try:
+                pool_replica = psycopg2.pool.ThreadedConnectionPool(
+                    replica.get('min_connections', self.config.MIN_CONNECTIONS),
+                    replica.get('max_connections', self.config.MAX_CONNECTIONS),
+                    host=replica['host'],
+                    port=replica.get('port', self.config.PORT),
+                    database=replica.get('database', self.config.DATABASE),
+                    user=replica.get('user', self.config.USER),
+                    password=replica.get('password', self.config.PASSWORD)
+                )
+            except psycopg2.Error as e:
+                # Réplica fora do ar não impede a API de subir: leituras vão ao primário
+                logger.error(f"Erro ao inicializar pool da réplica {nome}: {e}")
+                continue
+            self.replicas.append(Replica(nome, pool_replica))
+            logger.info(f"Pool da réplica {nome} inicializado")
+    
+    def iniciar_requisicao(self):
+        """Início de requisição: leituras voltam a poder ir para as réplicas"""
+        _leitura_no_primario.set(False)
+    
+    @staticmethod
+    def _consultar_autocommit(pool_conexoes, query: str, params: Tuple = ()):
+        conn = pool_conexoes.getconn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchone()[0]
+        finally:
+            if not conn.closed:
+                conn.autocommit = False
+            pool_conexoes.putconn(conn)
+    
+    def _medir_lag(self, replica: Replica):
+        lsn_primario = self._consultar_autocommit(self.connection_pool, LSN_PRIMARIO_SQL)
+        lag = self._consultar_autocommit(replica.pool, LAG_REPLICA_SQL, (lsn_primario,))
+        if lag is None:
+            replica.lag_s = None
+            replica.ultimo_erro = 'Réplica sem streaming de WAL do primário (ou atraso desconhecido)'
+            logger.warning(f"Réplica {replica.nome} não está recebendo WAL do primário")
+            return
+        replica.lag_s = float(lag)
+        replica.ultimo_erro = None
+    
+    def _escolher_replica(self) -> Optional[Replica]:
+        """Réplica em rodízio cujo atraso está dentro de MAX_REPLICA_LAG_S"""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._rodizio) % len(self.replicas)]
+            agora = time.monotonic()
+            with self._lock_replicas:
+                verificar = agora - replica.verificado_em >= self.config.REPLICA_LAG_CHECK_S
+                if verificar:
+                    replica.verificado_em = agora
+            if verificar:
+                try:
+                    self._medir_lag(replica)
+                except psycopg2.Error as e:
+                    replica.lag_s = None
+                    replica.ultimo_erro = str(e).strip()
+                    logger.warning(f"Réplica {replica.nome} indisponível: {e}")
+            if replica.lag_s is not None and replica.lag_s <= self.config.MAX_REPLICA_LAG_S:
+                return replica
+        return None
     
     @contextmanager
-    def get_connection(self):
-        """Context manager para obter conexão do pool"""
-        conn = self.connection_pool.getconn()
+    def get_connection(self, somente_leitura: bool = False):
+        """
+        Context manager para obter conexão do pool. Com `somente_leitura`
+        usa uma réplica em dia, se houver; senão (ou após uma escrita neste
+        contexto) usa o primário.
+        """
+        pool_conexoes = self.connection_pool
+        conn = None
+        if somente_leitura and self.replicas and not _leitura_no_primario.get():
+            replica = self._escolher_replica()
+            if replica is not None:
+                try:
+                    conn = replica.pool.getconn()
+                    pool_conexoes = replica.pool
+                    replica.leituras += 1
+                except psycopg2.Error as e:
+                    replica.lag_s = None
+                    replica.ultimo_erro = str(e).strip()
+                    logger.warning(f"Réplica {replica.nome} indisponível, lendo do primário: {e}")
+        elif not somente_leitura:
+            _leitura_no_primario.set(True)
+        
+        if conn is None:
+            conn = pool_conexoes.getconn()
         try:
             yield conn
             conn.commit()
@@ -64,20 +210,234 @@ class Database:
             logger.error(f"Erro na transação: {e}")
             raise
         finally:
-            self.connection_pool.putconn(conn)
+            pool_conexoes.putconn(conn)
+    
+    def estado_replicas(self) -> List[Dict]:
+        """Atraso, leituras atendidas e último erro de cada réplica"""
+        return [{
+            'replica': r.nome,
+            'lag_s': r.lag_s,
+            'em_uso': r.lag_s is not None and r.lag_s <= self.config.MAX_REPLICA_LAG_S,
+            'leituras': r.leituras,
+            'ultimo_erro': r.ultimo_erro
+        } for r in self.replicas]
     
     def close_all_connections(self):
         """Fecha todas as conexões do pool"""
         if self.connection_pool:
             self.connection_pool.closeall()
+            for replica in self.replicas:
+                replica.pool.closeall()
+            self.statements.limpar()
             logger.info("Todas as conexões foram fechadas")
 
 
+# PREPARED STATEMENTS
+# ============================================
+
+class RegistroStatements:
+    """
+    Consultas quentes preparadas (PREPARE) uma vez por conexão do pool, na
+    primeira execução, e depois executadas por nome (EXECUTE): o Postgres
+    deixa de reanalisar e replanejar o SQL a cada chamada.
+    
+    O controle do que já foi preparado é por (conexão, pid do backend), então
+    uma conexão reaberta pelo pool é preparada de novo. Se o servidor tiver
+    descartado os statements (DISCARD ALL de um pooler), o EXECUTE que abre a
+    transação é refeito após um novo PREPARE.
+    """
+    
+    def __init__(self):
+        self._sql = {}
+        self._num_params = {}
+        self._preparados = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def converter_placeholders(query: str) -> Tuple[str, int]:
+        """%s (psycopg2) -> $1, $2... (PREPARE)"""
+        contador = 0
+        
+        def trocar(match):
+            nonlocal contador
+            if match.group(0) == '%%':
+                return '%'
+            contador += 1
+            return f'${contador}'
+        
+        return re.sub(r'%%|%s', trocar, query), contador
+    
+    def registrar(self, nome: str, query: str):
+        """Registra a consulta `nome` (idempotente para o mesmo SQL)"""
+        sql, num_params = self.converter_placeholders(query)
+        with self._lock:
+            if self._sql.get(nome, sql) != sql:
+                raise ValueError(f'Statement {nome} já registrado com outro SQL')
+            self._sql[nome] = sql
+            self._num_params[nome] = num_params
+    
+    def _chave(self, conn) -> Tuple[int, int]:
+        return id(conn), conn.info.backend_pid
+    
+    def _preparar(self, cur, nome: str):
+        chave = self._chave(cur.connection)
+        with self._lock:
+            preparados = self._preparados.setdefault(chave, set())
+            if nome in preparados:
+                return
+        cur.execute(f"PREPARE {nome} AS {self._sql[nome]}")
+        with self._lock:
+            preparados.add(nome)
+    
+    def _esquecer(self, conn):
+        with self._lock:
+            self._preparados.pop(self._chave(conn), None)
+    
+    def executar(self, cur, nome: str, params: Tuple = ()):
+        """Executa o statement `nome` no cursor (preparando-o se preciso)"""
+        conn = cur.connection
+        inicio_transacao = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if self._num_params[nome]:
+            comando = f"EXECUTE {nome} ({', '.join(['%s'] * self._num_params[nome])})"
+        else:
+            comando = f"EXECUTE {nome}"
+        
+        self._preparar(cur, nome)
+        try:
+            cur.execute(comando, params)
+        except errors.InvalidSqlStatementName:
+            self._esquecer(conn)
+            # Só é seguro repetir se nada mais foi feito nesta transação
+            if not inicio_transacao:
+                raise
+            conn.rollback()
+            self._preparar(cur, nome)
+            cur.execute(comando, params)
+    
+    def limpar(self):
+        """Esquece o estado das conexões (ex.: após closeall do pool)"""
+        with self._lock:
+            self._preparados.clear()
+
+
+# CACHE DE PLACAS
+# ============================================
+
+class CachePlacas:
+    """
+    Cache LRU placa -> id da moto, compartilhado pelos repositórios do
+    processo. Placas não mudam de moto, então só é preciso invalidar quando
+    uma moto é removida (ou o id em cache é recusado pela FK).
+    """
+    
+    def __init__(self, maximo: int = 4096):
+        self.maximo = maximo
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+    
+    def obter(self, placa: str) -> Optional[int]:
+        with self._lock:
+            moto_id = self._ids.get(placa)
+            if moto_id is None:
+                self.faltas += 1
+                return None
+            self._ids.move_to_end(placa)
+            self.acertos += 1
+            return moto_id
+    
+    def guardar(self, placa: str, moto_id: int):
+        with self._lock:
+            self._ids[placa] = moto_id
+            self._ids.move_to_end(placa)
+            if len(self._ids) > self.maximo:
+                self._ids.popitem(last=False)
+    
+    def invalidar(self, placa: Optional[str] = None):
+        """Remove uma placa do cache (ou todas, sem argumento)"""
+        with self._lock:
+            if placa is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(placa, None)
+    
+    def metricas(self) -> Dict:
+        with self._lock:
+            return {'entradas': len(self._ids), 'acertos': self.acertos, 'faltas': self.faltas}
+
+
+# PAGINAÇÃO (KEYSET)
+# ============================================
+
+MAX_PAGINA = 500
+# Ids das tabelas são SERIAL (int4)
+MAX_ID = 2 ** 31 - 1
+
+
+class Pagina(list):
+    """Linhas de uma página; `proximo_cursor` é None na última"""
+    
+    def __init__(self, linhas, proximo_cursor: Optional[str] = None):
+        super().__init__(linhas)
+        self.proximo_cursor = proximo_cursor
+
+
+def codificar_cursor(valores: List[Any]) -> str:
+    """Chave de ordenação da última linha -> cursor opaco (base64 de JSON)"""
+    dados = json.dumps(valores, default=lambda v: v.isoformat())
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str, tamanho: int) -> List[Any]:
+    """
+    Cursor opaco -> valores da chave: timestamps (datetime) seguidos do id.
+    Levanta ValueError se o cursor não tem esse formato, antes de a
+    consulta chegar ao banco.
+    """
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(dados)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise ValueError('Cursor inválido')
+
+    *tempos, ultimo_id = valores
+    if type(ultimo_id) is not int or not -MAX_ID - 1 <= ultimo_id <= MAX_ID:
+        raise ValueError('Cursor inválido')
+    try:
+        return [datetime.fromisoformat(v) for v in tempos] + [ultimo_id]
+    except (TypeError, ValueError):
+        raise ValueError('Cursor inválido')
+
+
+def buscar_pagina(db: 'Database', query: str, params: Tuple, limite: int,
+                  chaves: Tuple[str, ...]) -> Pagina:
+    """
+    Executa `query` (já filtrada pelo cursor e com LIMIT %s no final) pedindo
+    uma linha a mais para saber se há próxima página. `chaves` são as colunas
+    do ORDER BY, usadas para montar o próximo cursor.
+    """
+    limite = max(1, min(int(limite), MAX_PAGINA))
+    with db.get_connection(somente_leitura=True) as conn:
+        with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
+            cur.execute(query, (*params, limite + 1))
+            linhas = cur.fetchall()
+    
+    if len(linhas) <= limite:
+        return Pagina(linhas)
+    linhas = linhas[:limite]
+    return Pagina(linhas, codificar_cursor([linhas[-1][chave] for chave in chaves]))
+
+
 class MotoRepository:
     """Repositório para operações com a tabela motos"""
     
     def __init__(self, db: Database):
         self.db = db
+        self.db.statements.registrar('moto_obter', "SELECT * FROM motos WHERE id = %s")
+        self.db.statements.registrar('moto_id_por_placa', "SELECT id FROM motos WHERE placa = %s")
     
     def criar_moto(self, placa: str, modelo: str, marca: str, ano: int, **kwargs) -> int:
         """Cria uma nova moto no sistema"""
@@ -97,30 +457,47 @@ class MotoRepository:
                 ))
                 moto_id = cur.fetchone()[0]
                 logger.info(f"Moto criada com ID: {moto_id}")
-                return moto_id
+        self.db.placas.guardar(placa, moto_id)
+        return moto_id
     
     def obter_moto(self, moto_id: int) -> Optional[Dict]:
         """Obtém informações de uma moto"""
-        query = "SELECT * FROM motos WHERE id = %s"
-        
-        with self.db.get_connection() as conn:
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query, (moto_id,))
+                self.db.statements.executar(cur, 'moto_obter', (moto_id,))
                 return cur.fetchone()
     
-    def listar_motos(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
-        """Lista motos com filtro opcional de status"""
-        if status:
-            query = "SELECT * FROM motos WHERE status = %s LIMIT %s"
-            params = (status, limit)
-        else:
-            query = "SELECT * FROM motos LIMIT %s"
-            params = (limit,)
+    def obter_id_por_placa(self, placa: str) -> Optional[int]:
+        """Id da moto pela placa (cache LRU; na falta, índice único de placa)"""
+        moto_id = self.db.placas.obter(placa)
+        if moto_id is not None:
+            return moto_id
         
+        # No primário: o id é usado em escritas logo em seguida
         with self.db.get_connection() as conn:
-            with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query, params)
-                return cur.fetchall()
+            with conn.cursor() as cur:
+                self.db.statements.executar(cur, 'moto_id_por_placa', (placa,))
+                linha = cur.fetchone()
+        if linha is None:
+            return None
+        self.db.placas.guardar(placa, linha[0])
+        return linha[0]
+    
+    def listar_motos(self, status: Optional[str] = None, limit: int = 100,
+                     cursor: Optional[str] = None) -> Pagina:
+        """Lista motos por id com filtro opcional de status (paginado por cursor)"""
+        filtros = []
+        params = []
+        if status:
+            filtros.append("status = %s")
+            params.append(status)
+        if cursor:
+            filtros.append("id > %s")
+            params.extend(decodificar_cursor(cursor, 1))
+        
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        query = f"SELECT * FROM motos {where} ORDER BY id LIMIT %s"
+        return buscar_pagina(self.db, query, tuple(params), limit, ('id',))
     
     def atualizar_status(self, moto_id: int, novo_status: str) -> bool:
         """Atualiza o status de uma moto"""
@@ -144,22 +521,42 @@ class MotoRepository:
 class LocalizacaoRepository:
     """Repositório para operações de localização"""
     
+    ORIGENS_VALIDAS = ('iot', 'visao_computacional', 'manual', 'gps')
+    MAX_LOTE = 5000
+    
     def __init__(self, db: Database):
         self.db = db
-    
-    def registrar_localizacao(self, moto_id: int, latitude: float, longitude: float, 
-                             velocidade: float = 0, origem: str = 'iot', **kwargs) -> int:
-        """Registra nova localização da moto"""
-        query = """
+        self.db.statements.registrar('localizacao_registrar', """
             INSERT INTO localizacoes 
             (moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
-        """
-        
+        """)
+        # xmax = 0 só na linha recém-inserida: diferencia criação de conflito
+        self.db.statements.registrar('localizacao_registrar_por_placa', """
+            WITH moto AS (
+                INSERT INTO motos (placa, modelo, marca, ano)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (placa) DO UPDATE SET ultima_atualizacao = CURRENT_TIMESTAMP
+                RETURNING id, xmax = 0 AS criada
+            )
+            INSERT INTO localizacoes (moto_id, latitude, longitude, velocidade, origem_dados)
+            SELECT id, %s, %s, %s, %s FROM moto
+            RETURNING moto_id, id, (SELECT criada FROM moto)
+        """)
+        self.db.statements.registrar('localizacao_atual', """
+            SELECT localizacao_id AS id, moto_id, latitude, longitude, velocidade,
+                   direcao, timestamp, origem_dados, precisao, altitude
+            FROM localizacao_atual
+            WHERE moto_id = %s
+        """)
+    
+    def registrar_localizacao(self, moto_id: int, latitude: float, longitude: float, 
+                             velocidade: float = 0, origem: str = 'iot', **kwargs) -> int:
+        """Registra nova localização da moto"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(query, (
+                self.db.statements.executar(cur, 'localizacao_registrar', (
                     moto_id, latitude, longitude, velocidade, origem,
                     kwargs.get('direcao'),
                     kwargs.get('precisao'),
@@ -167,39 +564,181 @@ class LocalizacaoRepository:
                 ))
                 return cur.fetchone()[0]
     
-    def obter_localizacao_atual(self, moto_id: int) -> Optional[Dict]:
-        """Obtém a localização mais recente de uma moto"""
+    def registrar_por_placa(self, placa: str, latitude: float, longitude: float,
+                            modelo: str, marca: str, ano: int, velocidade: float = 0,
+                            origem: str = 'visao_computacional') -> Dict:
+        """
+        Registra a localização de uma moto identificada pela placa em um
+        único comando. Placa em cache: INSERT direto com o id. Fora do cache:
+        upsert da moto (ON CONFLICT (placa)) e INSERT da localização no mesmo
+        comando; a moto só é criada (com modelo/marca/ano) se a placa for nova.
+        """
+        moto_id = self.db.placas.obter(placa)
+        if moto_id is not None:
+            try:
+                loc_id = self.registrar_localizacao(moto_id, latitude, longitude, velocidade, origem)
+                return {'moto_id': moto_id, 'localizacao_id': loc_id, 'moto_criada': False}
+            except errors.ForeignKeyViolation:
+                # Moto removida depois de entrar no cache
+                self.db.placas.invalidar(placa)
+        
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                self.db.statements.executar(cur, 'localizacao_registrar_por_placa', (
+                    placa, modelo, marca, ano, latitude, longitude, velocidade, origem
+                ))
+                moto_id, loc_id, criada = cur.fetchone()
+        self.db.placas.guardar(placa, moto_id)
+        if criada:
+            logger.info(f"Moto criada com ID: {moto_id}")
+        return {'moto_id': moto_id, 'localizacao_id': loc_id, 'moto_criada': criada}
+    
+    @classmethod
+    def validar_localizacao(cls, dados: Dict) -> Tuple[Optional[Tuple], Optional[str]]:
+        """Valida um ponto e retorna (linha para INSERT, erro)"""
+        if not isinstance(dados, dict):
+            return None, 'Item deve ser um objeto'
+        for campo in ('moto_id', 'latitude', 'longitude'):
+            if dados.get(campo) is None:
+                return None, f'Campo obrigatório: {campo}'
+        try:
+            moto_id = int(dados['moto_id'])
+            latitude = float(dados['latitude'])
+            longitude = float(dados['longitude'])
+            velocidade = float(dados.get('velocidade') or 0)
+            precisao = float(dados['precisao']) if dados.get('precisao') is not None else None
+            altitude = float(dados['altitude']) if dados.get('altitude') is not None else None
+            timestamp = datetime.fromisoformat(dados['timestamp']) if dados.get('timestamp') else None
+        except (TypeError, ValueError) as e:
+            return None, f'Valor inválido: {e}'
+        
+        if not -90 <= latitude <= 90:
+            return None, 'latitude fora do intervalo [-90, 90]'
+        if not -180 <= longitude <= 180:
+            return None, 'longitude fora do intervalo [-180, 180]'
+        if not 0 <= velocidade < 1000:
+            return None, 'velocidade fora do intervalo [0, 1000)'
+        origem = dados.get('origem', 'iot')
+        if origem not in cls.ORIGENS_VALIDAS:
+            return None, f'origem inválida: {origem}'
+        direcao = dados.get('direcao')
+        if direcao is not None and len(str(direcao)) > 20:
+            return None, 'direcao deve ter no máximo 20 caracteres'
+        
+        return (moto_id, latitude, longitude, velocidade, origem,
+                direcao, precisao, altitude, timestamp), None
+    
+    def registrar_localizacoes_lote(self, pontos: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Registra um lote de localizações em uma transação.
+        
+        Itens inválidos (ou de motos inexistentes) não impedem os demais.
+        Os válidos vão em um único INSERT multi-VALUES (execute_values com
+        page_size = tamanho do lote). Retorna (inseridos, erros), ambos com
+        o índice do item no lote.
+        """
+        erros = []
+        validos = []
+        for indice, dados in enumerate(pontos):
+            linha, erro = self.validar_localizacao(dados)
+            if erro:
+                erros.append({'index': indice, 'error': erro})
+            else:
+                validos.append((indice, linha))
+        
+        if not validos:
+            return [], erros
+        
         query = """
-            SELECT * FROM localizacoes 
-            WHERE moto_id = %s 
-            ORDER BY timestamp DESC 
-            LIMIT 1
+            INSERT INTO localizacoes
+            (moto_id, latitude, longitude, velocidade, origem_dados, direcao, precisao, altitude, timestamp)
+            VALUES %s
+            RETURNING id
         """
+        template = "(%s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))"
         
         with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                # FK violada abortaria o lote inteiro: separa antes as motos inexistentes
+                cur.execute(
+                    "SELECT id FROM motos WHERE id = ANY(%s)",
+                    (list({linha[0] for _, linha in validos}),)
+                )
+                existentes = {row[0] for row in cur.fetchall()}
+                inserir = []
+                for indice, linha in validos:
+                    if linha[0] in existentes:
+                        inserir.append((indice, linha))
+                    else:
+                        erros.append({'index': indice, 'error': f'Moto não encontrada: {linha[0]}'})
+                
+                inseridos = []
+                if inserir:
+                    ids = extras.execute_values(
+                        cur, query, [linha for _, linha in inserir],
+                        template=template, page_size=len(inserir), fetch=True
+                    )
+                    inseridos = [
+                        {'index': indice, 'id': row[0]}
+                        for (indice, _), row in zip(inserir, ids)
+                    ]
+        
+        erros.sort(key=lambda erro: erro['index'])
+        logger.info(f"Lote de localizações: {len(inseridos)} inseridas, {len(erros)} rejeitadas")
+        return inseridos, erros
+    
+    def obter_localizacao_atual(self, moto_id: int) -> Optional[Dict]:
+        """Obtém a localização mais recente de uma moto (tabela localizacao_atual)"""
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query, (moto_id,))
+                self.db.statements.executar(cur, 'localizacao_atual', (moto_id,))
                 return cur.fetchone()
     
-    def obter_historico(self, moto_id: int, horas: int = 24) -> List[Dict]:
-        """Obtém histórico de localizações"""
+    def obter_historico(self, moto_id: int, horas: int = 24, limite: int = MAX_PAGINA,
+                        cursor: Optional[str] = None) -> Pagina:
+        """Obtém histórico de localizações, mais recentes primeiro (paginado por cursor)"""
+        params = [moto_id, horas]
+        filtro_cursor = ""
+        if cursor:
+            filtro_cursor = "AND (timestamp, id) < (%s, %s)"
+            params.extend(decodificar_cursor(cursor, 2))
+        
+        query = f"""
+            SELECT * FROM localizacoes 
+            WHERE moto_id = %s 
+            AND timestamp >= NOW() - %s * INTERVAL '1 hour'
+            {filtro_cursor}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """
+        return buscar_pagina(self.db, query, tuple(params), limite, ('timestamp', 'id'))
+    
+    def iterar_historico(self, moto_id: int, horas: int = 24,
+                         itersize: int = 2000) -> Iterator[Dict]:
+        """
+        Histórico de localizações via cursor no servidor (named cursor):
+        as linhas chegam em blocos de `itersize`, sem carregar o resultado
+        inteiro. A conexão fica presa ao gerador até ele terminar ou ser fechado.
+        """
         query = """
             SELECT * FROM localizacoes 
             WHERE moto_id = %s 
-            AND timestamp >= NOW() - INTERVAL '%s hours'
-            ORDER BY timestamp DESC
+            AND timestamp >= NOW() - %s * INTERVAL '1 hour'
+            ORDER BY timestamp DESC, id DESC
         """
         
-        with self.db.get_connection() as conn:
-            with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
+        with self.db.get_connection(somente_leitura=True) as conn:
+            with conn.cursor(name=f'historico_{moto_id}',
+                             cursor_factory=extras.RealDictCursor) as cur:
+                cur.itersize = itersize
                 cur.execute(query, (moto_id, horas))
-                return cur.fetchall()
+                yield from cur
     
     def obter_todas_localizacoes_atuais(self) -> List[Dict]:
-        """Obtém localização atual de todas as motos (usando view)"""
+        """Obtém localização atual de todas as motos (view sobre localizacao_atual)"""
         query = "SELECT * FROM v_localizacao_atual"
         
-        with self.db.get_connection() as conn:
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
                 cur.execute(query)
                 return cur.fetchall()
@@ -228,27 +767,25 @@ class AlertaRepository:
                 ))
                 return cur.fetchone()[0]
     
-    def listar_alertas_ativos(self, severidade: Optional[str] = None) -> List[Dict]:
-        """Lista alertas não resolvidos"""
+    def listar_alertas_ativos(self, severidade: Optional[str] = None, limite: int = 100,
+                              cursor: Optional[str] = None) -> Pagina:
+        """Lista alertas não resolvidos, mais recentes primeiro (paginado por cursor)"""
+        filtros = ["resolvido = FALSE"]
+        params = []
         if severidade:
-            query = """
-                SELECT * FROM alertas 
-                WHERE resolvido = FALSE AND severidade = %s
-                ORDER BY data_criacao DESC
-            """
-            params = (severidade,)
-        else:
-            query = """
-                SELECT * FROM alertas 
-                WHERE resolvido = FALSE
-                ORDER BY data_criacao DESC
-            """
-            params = ()
+            filtros.append("severidade = %s")
+            params.append(severidade)
+        if cursor:
+            filtros.append("(data_criacao, id) < (%s, %s)")
+            params.extend(decodificar_cursor(cursor, 2))
         
-        with self.db.get_connection() as conn:
-            with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query, params)
-                return cur.fetchall()
+        query = f"""
+            SELECT * FROM alertas 
+            WHERE {' AND '.join(filtros)}
+            ORDER BY data_criacao DESC, id DESC
+            LIMIT %s
+        """
+        return buscar_pagina(self.db, query, tuple(params), limite, ('data_criacao', 'id'))
     
     def resolver_alerta(self, alerta_id: int, resolvido_por: str) -> bool:
         """Marca um alerta como resolvido"""
@@ -286,8 +823,8 @@ class ViagemRepository:
                 return cur.fetchone()[0]
     
     def finalizar_viagem(self, viagem_id: int, destino_lat: float, 
-                        destino_lon: float, distancia_km: float, valor: float) -> bool:
-        """Finaliza uma viagem"""
+                        destino_lon: float, distancia_km: Optional[float], valor: float) -> bool:
+        """Finaliza uma viagem (distancia_km None = desconhecida)"""
         query = """
             UPDATE viagens 
             SET data_fim = NOW(), destino_latitude = %s, destino_longitude = %s,
@@ -300,21 +837,25 @@ class ViagemRepository:
                 cur.execute(query, (destino_lat, destino_lon, distancia_km, valor, viagem_id))
                 return cur.rowcount > 0
     
-    def listar_viagens_ativas(self) -> List[Dict]:
-        """Lista viagens em andamento"""
-        query = """
+    def listar_viagens_ativas(self, limite: int = 100, cursor: Optional[str] = None) -> Pagina:
+        """Lista viagens em andamento, mais recentes primeiro (paginado por cursor)"""
+        params = []
+        filtro_cursor = ""
+        if cursor:
+            filtro_cursor = "AND (v.data_inicio, v.id) < (%s, %s)"
+            params.extend(decodificar_cursor(cursor, 2))
+        
+        query = f"""
             SELECT v.*, m.placa, e.nome as entregador_nome
             FROM viagens v
             JOIN motos m ON v.moto_id = m.id
             JOIN entregadores e ON v.entregador_id = e.id
             WHERE v.status = 'em_andamento'
-            ORDER BY v.data_inicio DESC
+            {filtro_cursor}
+            ORDER BY v.data_inicio DESC, v.id DESC
+            LIMIT %s
         """
-        
-        with self.db.get_connection() as conn:
-            with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query)
-                return cur.fetchall()
+        return buscar_pagina(self.db, query, tuple(params), limite, ('data_inicio', 'id'))
 
 
 class SensorRepository:
@@ -322,20 +863,25 @@ class SensorRepository:
     
     def __init__(self, db: Database):
         self.db = db
-    
-    def registrar_leitura(self, moto_id: int, tipo_sensor: str, 
-                         valor: float, unidade: str = None, metadata: Dict = None) -> int:
-        """Registra leitura de sensor"""
-        query = """
+        self.db.statements.registrar('sensor_registrar', """
             INSERT INTO sensores_iot 
             (moto_id, tipo_sensor, valor, unidade, metadata, status_sensor)
             VALUES (%s, %s, %s, %s, %s, 'online')
             RETURNING id
-        """
-        
+        """)
+        self.db.statements.registrar('sensor_ultimas_leituras', """
+            SELECT * FROM sensores_iot
+            WHERE moto_id = %s AND tipo_sensor = %s
+            ORDER BY timestamp DESC
+            LIMIT %s
+        """)
+    
+    def registrar_leitura(self, moto_id: int, tipo_sensor: str, 
+                         valor: float, unidade: str = None, metadata: Dict = None) -> int:
+        """Registra leitura de sensor"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(query, (
+                self.db.statements.executar(cur, 'sensor_registrar', (
                     moto_id, tipo_sensor, valor, unidade,
                     json.dumps(metadata) if metadata else None
                 ))
@@ -344,16 +890,9 @@ class SensorRepository:
     def obter_ultimas_leituras(self, moto_id: int, tipo_sensor: str, 
                               limite: int = 10) -> List[Dict]:
         """Obtém últimas leituras de um sensor específico"""
-        query = """
-            SELECT * FROM sensores_iot
-            WHERE moto_id = %s AND tipo_sensor = %s
-            ORDER BY timestamp DESC
-            LIMIT %s
-        """
-        
-        with self.db.get_connection() as conn:
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
-                cur.execute(query, (moto_id, tipo_sensor, limite))
+                self.db.statements.executar(cur, 'sensor_ultimas_leituras', (moto_id, tipo_sensor, limite))
                 return cur.fetchall()
 
 
@@ -364,19 +903,28 @@ class DashboardRepository:
         self.db = db
     
     def obter_resumo(self) -> Dict:
-        """Obtém resumo do dashboard (usando view)"""
-        query = "SELECT * FROM v_dashboard_resumo"
+        """Obtém resumo do dashboard (contadores mantidos por trigger)"""
+        query = "SELECT chave, valor FROM dashboard_contadores ORDER BY chave"
+        
+        with self.db.get_connection(somente_leitura=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                return dict(cur.fetchall())
+    
+    def reconciliar_contadores(self) -> List[Dict]:
+        """Recalcula os contadores a partir de v_dashboard_resumo e retorna os corrigidos"""
+        query = "SELECT * FROM reconciliar_contadores_dashboard()"
         
         with self.db.get_connection() as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
                 cur.execute(query)
-                return cur.fetchone()
+                return cur.fetchall()
     
     def obter_estatisticas_motos(self) -> List[Dict]:
         """Obtém estatísticas de uso das motos"""
         query = "SELECT * FROM v_estatisticas_motos ORDER BY total_viagens DESC"
         
-        with self.db.get_connection() as conn:
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
                 cur.execute(query)
                 return cur.fetchall()
@@ -385,7 +933,7 @@ class DashboardRepository:
         """Obtém motos com alertas ativos"""
         query = "SELECT * FROM v_motos_com_alertas ORDER BY alertas_criticos DESC, total_alertas DESC"
         
-        with self.db.get_connection() as conn:
+        with self.db.get_connection(somente_leitura=True) as conn:
             with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
                 cur.execute(query)
                 return cur.fetchall()
@@ -33,20 +33,47 @@ CREATE TABLE motos (
 -- TABELA: localizacoes
 -- Registra a localização das motos em tempo real
 -- ============================================
+-- Particionada por mês em timestamp (partições criadas por
+-- criar_particoes_mensais; retenção por remover_particoes_antigas)
 CREATE TABLE localizacoes (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     moto_id INTEGER NOT NULL,
     latitude DECIMAL(10, 8) NOT NULL,
     longitude DECIMAL(11, 8) NOT NULL,
     velocidade DECIMAL(5, 2) DEFAULT 0,
     direcao VARCHAR(20),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     origem_dados VARCHAR(20) DEFAULT 'iot' CHECK (origem_dados IN ('iot', 'visao_computacional', 'manual', 'gps')),
     precisao DECIMAL(5, 2),
     altitude DECIMAL(8, 2),
-    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE,
-    INDEX idx_moto_timestamp (moto_id, timestamp),
-    INDEX idx_timestamp (timestamp)
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+
+-- Posição atual/histórico por moto (ORDER BY timestamp DESC, id DESC sem sort)
+CREATE INDEX idx_localizacoes_moto_timestamp ON localizacoes(moto_id, timestamp DESC, id DESC);
+-- Só recebe inserções em ordem de tempo: BRIN ocupa poucas páginas;
+-- autosummarize deixa o autovacuum resumir cada faixa de páginas preenchida
+CREATE INDEX idx_localizacoes_timestamp ON localizacoes USING BRIN (timestamp) WITH (autosummarize = on);
+
+-- Recebe linhas fora das partições existentes (ex.: timestamps muito antigos)
+CREATE TABLE localizacoes_default PARTITION OF localizacoes DEFAULT;
+
+-- ============================================
+-- TABELA: localizacao_atual
+-- Última posição de cada moto (mantida por trigger em localizacoes)
+-- ============================================
+CREATE TABLE localizacao_atual (
+    moto_id INTEGER PRIMARY KEY REFERENCES motos(id) ON DELETE CASCADE,
+    localizacao_id INTEGER NOT NULL,
+    latitude DECIMAL(10, 8) NOT NULL,
+    longitude DECIMAL(11, 8) NOT NULL,
+    velocidade DECIMAL(5, 2),
+    direcao VARCHAR(20),
+    timestamp TIMESTAMP NOT NULL,
+    origem_dados VARCHAR(20),
+    precisao DECIMAL(5, 2),
+    altitude DECIMAL(8, 2)
 );
 
 -- ============================================
@@ -81,8 +108,7 @@ CREATE TABLE motos_areas (
         END
     ) STORED,
     FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE,
-    FOREIGN KEY (area_id) REFERENCES areas_patio(id) ON DELETE CASCADE,
-    INDEX idx_moto_periodo (moto_id, entrada, saida)
+    FOREIGN KEY (area_id) REFERENCES areas_patio(id) ON DELETE CASCADE
 );
 
 -- ============================================
@@ -104,9 +130,7 @@ CREATE TABLE alertas (
     data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     data_resolucao TIMESTAMP,
     resolvido_por VARCHAR(100),
-    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE SET NULL,
-    INDEX idx_moto_alertas (moto_id, data_criacao),
-    INDEX idx_nao_resolvidos (resolvido, data_criacao)
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE SET NULL
 );
 
 -- ============================================
@@ -128,8 +152,7 @@ CREATE TABLE manutencoes (
     mecanico VARCHAR(100),
     observacoes TEXT,
     proxima_manutencao DATE,
-    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE,
-    INDEX idx_moto_manutencao (moto_id, data_inicio)
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE
 );
 
 -- ============================================
@@ -176,17 +199,16 @@ CREATE TABLE viagens (
     avaliacao_entregador INTEGER CHECK (avaliacao_entregador BETWEEN 1 AND 5),
     observacoes TEXT,
     FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE RESTRICT,
-    FOREIGN KEY (entregador_id) REFERENCES entregadores(id) ON DELETE RESTRICT,
-    INDEX idx_moto_viagens (moto_id, data_inicio),
-    INDEX idx_entregador_viagens (entregador_id, data_inicio)
+    FOREIGN KEY (entregador_id) REFERENCES entregadores(id) ON DELETE RESTRICT
 );
 
 -- ============================================
 -- TABELA: sensores_iot
 -- Dados dos sensores IoT instalados nas motos
 -- ============================================
+-- Particionada por mês em timestamp, como localizacoes
 CREATE TABLE sensores_iot (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     moto_id INTEGER NOT NULL,
     tipo_sensor VARCHAR(50) NOT NULL CHECK (tipo_sensor IN (
         'gps', 'acelerometro', 'giroscopio', 'temperatura', 
@@ -194,12 +216,17 @@ CREATE TABLE sensores_iot (
     )),
     valor DECIMAL(10, 4),
     unidade VARCHAR(20),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     status_sensor VARCHAR(20) DEFAULT 'online' CHECK (status_sensor IN ('online', 'offline', 'erro', 'calibracao')),
     metadata JSON,
-    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE,
-    INDEX idx_moto_sensor_timestamp (moto_id, tipo_sensor, timestamp)
-);
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX idx_sensores_moto_tipo_timestamp ON sensores_iot(moto_id, tipo_sensor, timestamp DESC);
+CREATE INDEX idx_sensores_timestamp ON sensores_iot USING BRIN (timestamp) WITH (autosummarize = on);
+
+CREATE TABLE sensores_iot_default PARTITION OF sensores_iot DEFAULT;
 
 -- ============================================
 -- TABELA: deteccoes_visao
@@ -216,9 +243,7 @@ CREATE TABLE deteccoes_visao (
     imagem_url VARCHAR(500),
     tipo_deteccao VARCHAR(30) CHECK (tipo_deteccao IN ('placa', 'moto', 'capacete', 'movimento', 'anomalia')),
     processado BOOLEAN DEFAULT FALSE,
-    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE SET NULL,
-    INDEX idx_timestamp (timestamp),
-    INDEX idx_camera (camera_id, timestamp)
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE SET NULL
 );
 
 -- ============================================
@@ -274,9 +299,18 @@ CREATE TABLE logs_sistema (
     ip_address VARCHAR(45),
     user_agent TEXT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE SET NULL,
-    INDEX idx_timestamp (timestamp),
-    INDEX idx_usuario (usuario_id, timestamp)
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE SET NULL
+);
+
+-- ============================================
+-- TABELA: dashboard_contadores
+-- Contagens de v_dashboard_resumo mantidas por trigger (uma linha por
+-- contador); reconciliar_contadores_dashboard() corrige desvios
+-- ============================================
+CREATE TABLE dashboard_contadores (
+    chave VARCHAR(50) PRIMARY KEY,
+    valor BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ============================================
@@ -290,19 +324,13 @@ SELECT
     m.placa,
     m.modelo,
     m.status,
-    l.latitude,
-    l.longitude,
-    l.velocidade,
-    l.timestamp,
-    l.origem_dados
+    la.latitude,
+    la.longitude,
+    la.velocidade,
+    la.timestamp,
+    la.origem_dados
 FROM motos m
-INNER JOIN LATERAL (
-    SELECT latitude, longitude, velocidade, timestamp, origem_dados
-    FROM localizacoes
-    WHERE moto_id = m.id
-    ORDER BY timestamp DESC
-    LIMIT 1
-) l ON true;
+INNER JOIN localizacao_atual la ON la.moto_id = m.id;
 
 -- View: Motos com alertas ativos
 CREATE VIEW v_motos_com_alertas AS
@@ -362,6 +390,40 @@ AFTER INSERT ON localizacoes
 FOR EACH ROW
 EXECUTE FUNCTION atualizar_timestamp_moto();
 
+-- Trigger: Manter localizacao_atual (um upsert por comando INSERT)
+CREATE OR REPLACE FUNCTION atualizar_localizacao_atual()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO localizacao_atual AS la
+        (moto_id, localizacao_id, latitude, longitude, velocidade, direcao,
+         timestamp, origem_dados, precisao, altitude)
+    SELECT DISTINCT ON (n.moto_id)
+        n.moto_id, n.id, n.latitude, n.longitude, n.velocidade, n.direcao,
+        n.timestamp, n.origem_dados, n.precisao, n.altitude
+    FROM novas_localizacoes n
+    WHERE n.timestamp IS NOT NULL
+    ORDER BY n.moto_id, n.timestamp DESC, n.id DESC
+    ON CONFLICT (moto_id) DO UPDATE SET
+        localizacao_id = EXCLUDED.localizacao_id,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        velocidade = EXCLUDED.velocidade,
+        direcao = EXCLUDED.direcao,
+        timestamp = EXCLUDED.timestamp,
+        origem_dados = EXCLUDED.origem_dados,
+        precisao = EXCLUDED.precisao,
+        altitude = EXCLUDED.altitude
+    WHERE la.timestamp <= EXCLUDED.timestamp;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_localizacao_atual
+AFTER INSERT ON localizacoes
+REFERENCING NEW TABLE AS novas_localizacoes
+FOR EACH STATEMENT
+EXECUTE FUNCTION atualizar_localizacao_atual();
+
 -- Trigger: Criar alerta de bateria baixa
 CREATE OR REPLACE FUNCTION verificar_bateria_baixa()
 RETURNS TRIGGER AS $$
@@ -385,6 +447,91 @@ AFTER UPDATE OF bateria_percentual ON motos
 FOR EACH ROW
 EXECUTE FUNCTION verificar_bateria_baixa();
 
+-- Trigger: Manter dashboard_contadores (mesmas contagens de v_dashboard_resumo)
+-- Chaves do contador em que uma linha de `tabela` entra (NULL = nenhuma)
+CREATE OR REPLACE FUNCTION chaves_contadores_dashboard(tabela TEXT, linha JSONB)
+RETURNS TEXT[] AS $$
+    SELECT CASE tabela
+        WHEN 'motos' THEN ARRAY[
+            CASE linha->>'status'
+                WHEN 'disponivel' THEN 'motos_disponiveis'
+                WHEN 'em_uso' THEN 'motos_em_uso'
+                WHEN 'manutencao' THEN 'motos_manutencao'
+            END
+        ]
+        WHEN 'alertas' THEN ARRAY[
+            CASE WHEN (linha->>'resolvido')::BOOLEAN = FALSE THEN 'alertas_ativos' END,
+            CASE WHEN (linha->>'resolvido')::BOOLEAN = FALSE
+                      AND linha->>'severidade' = 'critica' THEN 'alertas_criticos' END
+        ]
+        WHEN 'viagens' THEN ARRAY[
+            CASE WHEN linha->>'status' = 'em_andamento' THEN 'viagens_ativas' END
+        ]
+        WHEN 'entregadores' THEN ARRAY[
+            CASE WHEN linha->>'status' = 'ativo' THEN 'entregadores_ativos' END
+        ]
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION atualizar_contadores_dashboard()
+RETURNS TRIGGER AS $$
+DECLARE
+    antigas TEXT[] := '{}';
+    novas TEXT[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        antigas := chaves_contadores_dashboard(TG_TABLE_NAME, to_jsonb(OLD));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        novas := chaves_contadores_dashboard(TG_TABLE_NAME, to_jsonb(NEW));
+    END IF;
+
+    -- UPDATE que não muda a contagem (ex.: severidade de alerta resolvido)
+    IF antigas IS NOT DISTINCT FROM novas THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE dashboard_contadores c
+    SET valor = c.valor + d.delta,
+        atualizado_em = CURRENT_TIMESTAMP
+    FROM (
+        SELECT chave, SUM(delta) AS delta
+        FROM (
+            SELECT unnest(novas), 1
+            UNION ALL
+            SELECT unnest(antigas), -1
+        ) AS mudancas(chave, delta)
+        WHERE chave IS NOT NULL
+        GROUP BY chave
+        HAVING SUM(delta) <> 0
+    ) d
+    WHERE c.chave = d.chave;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Só colunas que afetam as contagens (motos.ultima_atualizacao muda a cada localização)
+CREATE TRIGGER trigger_contadores_motos
+AFTER INSERT OR UPDATE OF status OR DELETE ON motos
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE TRIGGER trigger_contadores_alertas
+AFTER INSERT OR UPDATE OF resolvido, severidade OR DELETE ON alertas
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE TRIGGER trigger_contadores_viagens
+AFTER INSERT OR UPDATE OF status OR DELETE ON viagens
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE TRIGGER trigger_contadores_entregadores
+AFTER INSERT OR UPDATE OF status OR DELETE ON entregadores
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
 -- ============================================
 -- FUNÇÕES ÚTEIS
 -- ============================================
@@ -437,14 +584,156 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-- Função: Corrigir desvios de dashboard_contadores (TRUNCATE, cargas com
+-- triggers desabilitados...) recontando com v_dashboard_resumo.
+-- Retorna só as chaves corrigidas.
+CREATE OR REPLACE FUNCTION reconciliar_contadores_dashboard()
+RETURNS TABLE (chave VARCHAR, valor_anterior BIGINT, valor_real BIGINT) AS $$
+BEGIN
+    -- Bloqueia os triggers durante a recontagem: nenhum incremento se perde
+    LOCK TABLE dashboard_contadores IN EXCLUSIVE MODE;
+
+    INSERT INTO dashboard_contadores (chave, valor)
+    SELECT r.key, 0
+    FROM v_dashboard_resumo v, jsonb_each_text(to_jsonb(v)) r
+    ON CONFLICT DO NOTHING;
+
+    RETURN QUERY
+    UPDATE dashboard_contadores c
+    SET valor = r.value::BIGINT,
+        atualizado_em = CURRENT_TIMESTAMP
+    FROM v_dashboard_resumo v,
+         jsonb_each_text(to_jsonb(v)) r,
+         (SELECT a.chave, a.valor FROM dashboard_contadores a) anterior
+    WHERE c.chave = r.key
+    AND anterior.chave = c.chave
+    AND c.valor <> r.value::BIGINT
+    RETURNING c.chave, anterior.valor, c.valor;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cria as linhas dos contadores (zeradas)
+SELECT * FROM reconciliar_contadores_dashboard();
+
+-- ============================================
+-- PARTICIONAMENTO
+-- ============================================
+
+-- Função: Criar partições mensais de `tabela` até `meses_a_frente` meses à frente
+-- (a partir de `inicio`, padrão mês atual). Linhas do mês que tenham caído na
+-- partição DEFAULT são movidas para a nova partição.
+CREATE OR REPLACE FUNCTION criar_particoes_mensais(
+    tabela TEXT,
+    meses_a_frente INTEGER DEFAULT 3,
+    inicio DATE DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    mes DATE := date_trunc('month', COALESCE(inicio, CURRENT_DATE))::DATE;
+    ultimo DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => meses_a_frente))::DATE;
+    proximo DATE;
+    nome TEXT;
+    padrao TEXT := tabela || '_default';
+    criadas INTEGER := 0;
+    linhas_no_padrao BOOLEAN;
+BEGIN
+    WHILE mes <= ultimo LOOP
+        proximo := (mes + INTERVAL '1 month')::DATE;
+        nome := tabela || '_p' || to_char(mes, 'YYYYMM');
+
+        IF to_regclass(nome) IS NULL THEN
+            linhas_no_padrao := FALSE;
+            IF to_regclass(padrao) IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE timestamp >= %L AND timestamp < %L)',
+                               padrao, mes, proximo)
+                INTO linhas_no_padrao;
+            END IF;
+
+            IF linhas_no_padrao THEN
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                               nome, tabela);
+                EXECUTE format('WITH movidas AS (DELETE FROM %I WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM movidas',
+                               padrao, mes, proximo, nome);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               tabela, nome, mes, proximo);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               nome, tabela, mes, proximo);
+            END IF;
+            criadas := criadas + 1;
+        END IF;
+
+        mes := proximo;
+    END LOOP;
+    RETURN criadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Função: Retenção por partição (DETACH + DROP em vez de DELETE).
+-- Mantém o mês atual e os `meses_retencao` meses anteriores; por padrão
+-- só desanexa (DROP apenas com apenas_desanexar = FALSE).
+CREATE OR REPLACE FUNCTION remover_particoes_antigas(
+    tabela TEXT,
+    meses_retencao INTEGER,
+    apenas_desanexar BOOLEAN DEFAULT TRUE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    limite DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => meses_retencao))::DATE;
+    particao RECORD;
+    removidas INTEGER := 0;
+BEGIN
+    FOR particao IN
+        SELECT c.relname
+        FROM pg_inherits i
+        INNER JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = tabela::REGCLASS
+        AND c.relname ~ ('^' || tabela || '_p[0-9]{6}$')
+        AND to_date(right(c.relname, 6), 'YYYYMM') < limite
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', tabela, particao.relname);
+        IF NOT apenas_desanexar THEN
+            EXECUTE format('DROP TABLE %I', particao.relname);
+        END IF;
+        removidas := removidas + 1;
+    END LOOP;
+    RETURN removidas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partições do mês atual e dos próximos 3 meses
+-- (database/partition_maintenance.py mantém a janela à frente e aplica a retenção)
+SELECT criar_particoes_mensais('localizacoes', 3);
+SELECT criar_particoes_mensais('sensores_iot', 3);
+
+
 -- ÍNDICES ADICIONAIS PARA PERFORMANCE
 -- ============================================
 
 CREATE INDEX idx_motos_status ON motos(status);
+CREATE INDEX idx_motos_areas_periodo ON motos_areas(moto_id, entrada, saida);
+
+CREATE INDEX idx_alertas_moto_data ON alertas(moto_id, data_criacao);
 CREATE INDEX idx_alertas_tipo_severidade ON alertas(tipo, severidade, resolvido);
+-- Parcial: só alertas abertos (listar_alertas_ativos), uma fração da tabela
+CREATE INDEX idx_alertas_ativos ON alertas(data_criacao DESC, id DESC) WHERE resolvido = FALSE;
+
+CREATE INDEX idx_manutencoes_moto_data ON manutencoes(moto_id, data_inicio);
+
+CREATE INDEX idx_viagens_moto_data ON viagens(moto_id, data_inicio);
+CREATE INDEX idx_viagens_entregador_data ON viagens(entregador_id, data_inicio);
 CREATE INDEX idx_viagens_status_data ON viagens(status, data_inicio);
-CREATE INDEX idx_sensores_timestamp ON sensores_iot(timestamp DESC);
+-- Parcial: viagens em andamento (listar_viagens_ativas)
+CREATE INDEX idx_viagens_ativas ON viagens(data_inicio DESC, id DESC) WHERE status = 'em_andamento';
+
+-- Tabelas só de inserção em ordem de tempo: BRIN em vez de B-tree
+CREATE INDEX idx_deteccoes_timestamp ON deteccoes_visao USING BRIN (timestamp) WITH (autosummarize = on);
+CREATE INDEX idx_deteccoes_camera ON deteccoes_visao(camera_id, timestamp);
 CREATE INDEX idx_deteccoes_processado ON deteccoes_visao(processado, timestamp);
+CREATE INDEX idx_logs_timestamp ON logs_sistema USING BRIN (timestamp) WITH (autosummarize = on);
+CREATE INDEX idx_logs_usuario ON logs_sistema(usuario_id, timestamp);
 
 
 -- DADOS DE EXEMPLO (OPCIONAL)
@@ -0,0 +1,85 @@
+-- ============================================
+-- MIGRAÇÃO 001: tabela localizacao_atual
+-- Uma linha por moto com a última posição, mantida por trigger a cada
+-- INSERT em localizacoes. v_localizacao_atual passa a ler dela em vez de
+-- um LATERAL ... ORDER BY timestamp DESC LIMIT 1 por moto.
+-- ============================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS localizacao_atual (
+    moto_id INTEGER PRIMARY KEY REFERENCES motos(id) ON DELETE CASCADE,
+    localizacao_id INTEGER NOT NULL,
+    latitude DECIMAL(10, 8) NOT NULL,
+    longitude DECIMAL(11, 8) NOT NULL,
+    velocidade DECIMAL(5, 2),
+    direcao VARCHAR(20),
+    timestamp TIMESTAMP NOT NULL,
+    origem_dados VARCHAR(20),
+    precisao DECIMAL(5, 2),
+    altitude DECIMAL(8, 2)
+);
+
+-- Trigger por comando: um único upsert por INSERT, inclusive em lotes
+-- (mais recente por moto). Pontos atrasados não sobrescrevem posições novas.
+CREATE OR REPLACE FUNCTION atualizar_localizacao_atual()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO localizacao_atual AS la
+        (moto_id, localizacao_id, latitude, longitude, velocidade, direcao,
+         timestamp, origem_dados, precisao, altitude)
+    SELECT DISTINCT ON (n.moto_id)
+        n.moto_id, n.id, n.latitude, n.longitude, n.velocidade, n.direcao,
+        n.timestamp, n.origem_dados, n.precisao, n.altitude
+    FROM novas_localizacoes n
+    WHERE n.timestamp IS NOT NULL
+    ORDER BY n.moto_id, n.timestamp DESC, n.id DESC
+    ON CONFLICT (moto_id) DO UPDATE SET
+        localizacao_id = EXCLUDED.localizacao_id,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        velocidade = EXCLUDED.velocidade,
+        direcao = EXCLUDED.direcao,
+        timestamp = EXCLUDED.timestamp,
+        origem_dados = EXCLUDED.origem_dados,
+        precisao = EXCLUDED.precisao,
+        altitude = EXCLUDED.altitude
+    WHERE la.timestamp <= EXCLUDED.timestamp;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_localizacao_atual ON localizacoes;
+CREATE TRIGGER trigger_localizacao_atual
+AFTER INSERT ON localizacoes
+REFERENCING NEW TABLE AS novas_localizacoes
+FOR EACH STATEMENT
+EXECUTE FUNCTION atualizar_localizacao_atual();
+
+-- Carga inicial a partir do histórico existente
+INSERT INTO localizacao_atual
+    (moto_id, localizacao_id, latitude, longitude, velocidade, direcao,
+     timestamp, origem_dados, precisao, altitude)
+SELECT DISTINCT ON (moto_id)
+    moto_id, id, latitude, longitude, velocidade, direcao,
+    timestamp, origem_dados, precisao, altitude
+FROM localizacoes
+WHERE timestamp IS NOT NULL
+ORDER BY moto_id, timestamp DESC, id DESC
+ON CONFLICT (moto_id) DO NOTHING;
+
+CREATE OR REPLACE VIEW v_localizacao_atual AS
+SELECT 
+    m.id,
+    m.placa,
+    m.modelo,
+    m.status,
+    la.latitude,
+    la.longitude,
+    la.velocidade,
+    la.timestamp,
+    la.origem_dados
+FROM motos m
+INNER JOIN localizacao_atual la ON la.moto_id = m.id;
+
+COMMIT;
@@ -0,0 +1,193 @@
+-- ============================================
+-- MIGRAÇÃO 002: particionamento de localizacoes e sensores_iot
+-- As duas tabelas passam a ser particionadas por mês em timestamp
+-- (PARTITION BY RANGE). A retenção vira DETACH/DROP de partições inteiras
+-- em vez de DELETE; database/partition_maintenance.py cria as partições futuras.
+--
+-- Requer a migração 001. Reescreve as tabelas: aplicar em janela de
+-- manutenção (as duas ficam bloqueadas durante a cópia).
+-- ============================================
+
+BEGIN;
+
+-- Função: Criar partições mensais de `tabela` até `meses_a_frente` meses à frente
+-- (a partir de `inicio`, padrão mês atual). Linhas do mês que tenham caído na
+-- partição DEFAULT são movidas para a nova partição.
+CREATE OR REPLACE FUNCTION criar_particoes_mensais(
+    tabela TEXT,
+    meses_a_frente INTEGER DEFAULT 3,
+    inicio DATE DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    mes DATE := date_trunc('month', COALESCE(inicio, CURRENT_DATE))::DATE;
+    ultimo DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => meses_a_frente))::DATE;
+    proximo DATE;
+    nome TEXT;
+    padrao TEXT := tabela || '_default';
+    criadas INTEGER := 0;
+    linhas_no_padrao BOOLEAN;
+BEGIN
+    WHILE mes <= ultimo LOOP
+        proximo := (mes + INTERVAL '1 month')::DATE;
+        nome := tabela || '_p' || to_char(mes, 'YYYYMM');
+
+        IF to_regclass(nome) IS NULL THEN
+            linhas_no_padrao := FALSE;
+            IF to_regclass(padrao) IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE timestamp >= %L AND timestamp < %L)',
+                               padrao, mes, proximo)
+                INTO linhas_no_padrao;
+            END IF;
+
+            IF linhas_no_padrao THEN
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                               nome, tabela);
+                EXECUTE format('WITH movidas AS (DELETE FROM %I WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM movidas',
+                               padrao, mes, proximo, nome);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               tabela, nome, mes, proximo);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               nome, tabela, mes, proximo);
+            END IF;
+            criadas := criadas + 1;
+        END IF;
+
+        mes := proximo;
+    END LOOP;
+    RETURN criadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Função: Retenção por partição (DETACH + DROP em vez de DELETE).
+-- Mantém o mês atual e os `meses_retencao` meses anteriores; por padrão
+-- só desanexa (DROP apenas com apenas_desanexar = FALSE).
+CREATE OR REPLACE FUNCTION remover_particoes_antigas(
+    tabela TEXT,
+    meses_retencao INTEGER,
+    apenas_desanexar BOOLEAN DEFAULT TRUE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    limite DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => meses_retencao))::DATE;
+    particao RECORD;
+    removidas INTEGER := 0;
+BEGIN
+    FOR particao IN
+        SELECT c.relname
+        FROM pg_inherits i
+        INNER JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = tabela::REGCLASS
+        AND c.relname ~ ('^' || tabela || '_p[0-9]{6}$')
+        AND to_date(right(c.relname, 6), 'YYYYMM') < limite
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', tabela, particao.relname);
+        IF NOT apenas_desanexar THEN
+            EXECUTE format('DROP TABLE %I', particao.relname);
+        END IF;
+        removidas := removidas + 1;
+    END LOOP;
+    RETURN removidas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- --------------------------------------------
+-- localizacoes
+-- --------------------------------------------
+ALTER TABLE localizacoes RENAME TO localizacoes_legado;
+ALTER TABLE localizacoes_legado RENAME CONSTRAINT localizacoes_pkey TO localizacoes_legado_pkey;
+
+-- Mesma sequência de id: ids existentes são preservados
+CREATE TABLE localizacoes (
+    id INTEGER NOT NULL DEFAULT nextval('localizacoes_id_seq'),
+    moto_id INTEGER NOT NULL,
+    latitude DECIMAL(10, 8) NOT NULL,
+    longitude DECIMAL(11, 8) NOT NULL,
+    velocidade DECIMAL(5, 2) DEFAULT 0,
+    direcao VARCHAR(20),
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    origem_dados VARCHAR(20) DEFAULT 'iot' CHECK (origem_dados IN ('iot', 'visao_computacional', 'manual', 'gps')),
+    precisao DECIMAL(5, 2),
+    altitude DECIMAL(8, 2),
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE localizacoes_default PARTITION OF localizacoes DEFAULT;
+
+-- Uma partição por mês desde o registro mais antigo
+SELECT criar_particoes_mensais(
+    'localizacoes', 3, (SELECT MIN(timestamp)::DATE FROM localizacoes_legado)
+);
+
+INSERT INTO localizacoes
+    (id, moto_id, latitude, longitude, velocidade, direcao,
+     timestamp, origem_dados, precisao, altitude)
+SELECT id, moto_id, latitude, longitude, velocidade, direcao,
+       COALESCE(timestamp, CURRENT_TIMESTAMP), origem_dados, precisao, altitude
+FROM localizacoes_legado;
+
+-- Índices criados após a cópia (mais rápido que mantê-los linha a linha)
+CREATE INDEX idx_localizacoes_moto_timestamp ON localizacoes(moto_id, timestamp);
+CREATE INDEX idx_localizacoes_timestamp ON localizacoes(timestamp);
+
+ALTER SEQUENCE localizacoes_id_seq OWNED BY localizacoes.id;
+DROP TABLE localizacoes_legado;
+
+-- Triggers removidos junto com a tabela antiga
+CREATE TRIGGER trigger_atualizar_moto_localizacao
+AFTER INSERT ON localizacoes
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_timestamp_moto();
+
+CREATE TRIGGER trigger_localizacao_atual
+AFTER INSERT ON localizacoes
+REFERENCING NEW TABLE AS novas_localizacoes
+FOR EACH STATEMENT
+EXECUTE FUNCTION atualizar_localizacao_atual();
+
+-- --------------------------------------------
+-- sensores_iot
+-- --------------------------------------------
+ALTER TABLE sensores_iot RENAME TO sensores_iot_legado;
+ALTER TABLE sensores_iot_legado RENAME CONSTRAINT sensores_iot_pkey TO sensores_iot_legado_pkey;
+DROP INDEX IF EXISTS idx_sensores_timestamp;
+
+CREATE TABLE sensores_iot (
+    id INTEGER NOT NULL DEFAULT nextval('sensores_iot_id_seq'),
+    moto_id INTEGER NOT NULL,
+    tipo_sensor VARCHAR(50) NOT NULL CHECK (tipo_sensor IN (
+        'gps', 'acelerometro', 'giroscopio', 'temperatura', 
+        'bateria', 'velocidade', 'pressao_pneu', 'camera'
+    )),
+    valor DECIMAL(10, 4),
+    unidade VARCHAR(20),
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    status_sensor VARCHAR(20) DEFAULT 'online' CHECK (status_sensor IN ('online', 'offline', 'erro', 'calibracao')),
+    metadata JSON,
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (moto_id) REFERENCES motos(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE sensores_iot_default PARTITION OF sensores_iot DEFAULT;
+
+SELECT criar_particoes_mensais(
+    'sensores_iot', 3, (SELECT MIN(timestamp)::DATE FROM sensores_iot_legado)
+);
+
+INSERT INTO sensores_iot
+    (id, moto_id, tipo_sensor, valor, unidade, timestamp, status_sensor, metadata)
+SELECT id, moto_id, tipo_sensor, valor, unidade,
+       COALESCE(timestamp, CURRENT_TIMESTAMP), status_sensor, metadata
+FROM sensores_iot_legado;
+
+CREATE INDEX idx_sensores_moto_tipo_timestamp ON sensores_iot(moto_id, tipo_sensor, timestamp);
+CREATE INDEX idx_sensores_timestamp ON sensores_iot(timestamp DESC);
+
+ALTER SEQUENCE sensores_iot_id_seq OWNED BY sensores_iot.id;
+DROP TABLE sensores_iot_legado;
+
+COMMIT;
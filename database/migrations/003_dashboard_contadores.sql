@@ -0,0 +1,133 @@
+-- ============================================
+-- MIGRAÇÃO 003: contadores do dashboard
+-- dashboard_contadores guarda as contagens de v_dashboard_resumo e é
+-- mantida por triggers em motos, alertas, viagens e entregadores;
+-- DashboardRepository.obter_resumo lê dela em vez de contar as tabelas.
+-- ============================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS dashboard_contadores (
+    chave VARCHAR(50) PRIMARY KEY,
+    valor BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Trigger: Manter dashboard_contadores (mesmas contagens de v_dashboard_resumo)
+-- Chaves do contador em que uma linha de `tabela` entra (NULL = nenhuma)
+CREATE OR REPLACE FUNCTION chaves_contadores_dashboard(tabela TEXT, linha JSONB)
+RETURNS TEXT[] AS $$
+    SELECT CASE tabela
+        WHEN 'motos' THEN ARRAY[
+            CASE linha->>'status'
+                WHEN 'disponivel' THEN 'motos_disponiveis'
+                WHEN 'em_uso' THEN 'motos_em_uso'
+                WHEN 'manutencao' THEN 'motos_manutencao'
+            END
+        ]
+        WHEN 'alertas' THEN ARRAY[
+            CASE WHEN (linha->>'resolvido')::BOOLEAN = FALSE THEN 'alertas_ativos' END,
+            CASE WHEN (linha->>'resolvido')::BOOLEAN = FALSE
+                      AND linha->>'severidade' = 'critica' THEN 'alertas_criticos' END
+        ]
+        WHEN 'viagens' THEN ARRAY[
+            CASE WHEN linha->>'status' = 'em_andamento' THEN 'viagens_ativas' END
+        ]
+        WHEN 'entregadores' THEN ARRAY[
+            CASE WHEN linha->>'status' = 'ativo' THEN 'entregadores_ativos' END
+        ]
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION atualizar_contadores_dashboard()
+RETURNS TRIGGER AS $$
+DECLARE
+    antigas TEXT[] := '{}';
+    novas TEXT[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        antigas := chaves_contadores_dashboard(TG_TABLE_NAME, to_jsonb(OLD));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        novas := chaves_contadores_dashboard(TG_TABLE_NAME, to_jsonb(NEW));
+    END IF;
+
+    -- UPDATE que não muda a contagem (ex.: severidade de alerta resolvido)
+    IF antigas IS NOT DISTINCT FROM novas THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE dashboard_contadores c
+    SET valor = c.valor + d.delta,
+        atualizado_em = CURRENT_TIMESTAMP
+    FROM (
+        SELECT chave, SUM(delta) AS delta
+        FROM (
+            SELECT unnest(novas), 1
+            UNION ALL
+            SELECT unnest(antigas), -1
+        ) AS mudancas(chave, delta)
+        WHERE chave IS NOT NULL
+        GROUP BY chave
+        HAVING SUM(delta) <> 0
+    ) d
+    WHERE c.chave = d.chave;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Só colunas que afetam as contagens (motos.ultima_atualizacao muda a cada localização)
+CREATE OR REPLACE TRIGGER trigger_contadores_motos
+AFTER INSERT OR UPDATE OF status OR DELETE ON motos
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE OR REPLACE TRIGGER trigger_contadores_alertas
+AFTER INSERT OR UPDATE OF resolvido, severidade OR DELETE ON alertas
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE OR REPLACE TRIGGER trigger_contadores_viagens
+AFTER INSERT OR UPDATE OF status OR DELETE ON viagens
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+CREATE OR REPLACE TRIGGER trigger_contadores_entregadores
+AFTER INSERT OR UPDATE OF status OR DELETE ON entregadores
+FOR EACH ROW
+EXECUTE FUNCTION atualizar_contadores_dashboard();
+
+-- Função: Corrigir desvios de dashboard_contadores (TRUNCATE, cargas com
+-- triggers desabilitados...) recontando com v_dashboard_resumo.
+-- Retorna só as chaves corrigidas.
+CREATE OR REPLACE FUNCTION reconciliar_contadores_dashboard()
+RETURNS TABLE (chave VARCHAR, valor_anterior BIGINT, valor_real BIGINT) AS $$
+BEGIN
+    -- Bloqueia os triggers durante a recontagem: nenhum incremento se perde
+    LOCK TABLE dashboard_contadores IN EXCLUSIVE MODE;
+
+    INSERT INTO dashboard_contadores (chave, valor)
+    SELECT r.key, 0
+    FROM v_dashboard_resumo v, jsonb_each_text(to_jsonb(v)) r
+    ON CONFLICT DO NOTHING;
+
+    RETURN QUERY
+    UPDATE dashboard_contadores c
+    SET valor = r.value::BIGINT,
+        atualizado_em = CURRENT_TIMESTAMP
+    FROM v_dashboard_resumo v,
+         jsonb_each_text(to_jsonb(v)) r,
+         (SELECT a.chave, a.valor FROM dashboard_contadores a) anterior
+    WHERE c.chave = r.key
+    AND anterior.chave = c.chave
+    AND c.valor <> r.value::BIGINT
+    RETURNING c.chave, anterior.valor, c.valor;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Sem escritas nas tabelas contadas durante a carga inicial
+LOCK TABLE motos, alertas, viagens, entregadores IN SHARE MODE;
+SELECT * FROM reconciliar_contadores_dashboard();
+
+COMMIT;
@@ -0,0 +1,56 @@
+-- ============================================
+-- MIGRAÇÃO 004: plano de índices do PostgreSQL
+-- Índices das consultas quentes do repositório: histórico por moto e
+-- últimas leituras em ordem decrescente, BRIN nas colunas de tempo das
+-- tabelas só de inserção e índices parciais para alertas abertos e
+-- viagens em andamento. benchmarks/bench_indices.py mostra os planos.
+--
+-- CREATE INDEX bloqueia escritas na tabela até o COMMIT: aplicar fora
+-- do horário de pico.
+-- ============================================
+
+BEGIN;
+
+-- localizacoes: (moto_id, timestamp DESC, id DESC) cobre o ORDER BY do
+-- histórico paginado inteiro; o B-tree em timestamp vira BRIN
+DROP INDEX IF EXISTS idx_localizacoes_moto_timestamp;
+CREATE INDEX idx_localizacoes_moto_timestamp ON localizacoes(moto_id, timestamp DESC, id DESC);
+DROP INDEX IF EXISTS idx_localizacoes_timestamp;
+CREATE INDEX idx_localizacoes_timestamp ON localizacoes USING BRIN (timestamp) WITH (autosummarize = on);
+
+-- sensores_iot: últimas leituras por moto e tipo
+DROP INDEX IF EXISTS idx_sensores_moto_tipo_timestamp;
+CREATE INDEX idx_sensores_moto_tipo_timestamp ON sensores_iot(moto_id, tipo_sensor, timestamp DESC);
+DROP INDEX IF EXISTS idx_sensores_timestamp;
+CREATE INDEX idx_sensores_timestamp ON sensores_iot USING BRIN (timestamp) WITH (autosummarize = on);
+
+-- alertas: parcial só com os abertos (substitui idx_nao_resolvidos)
+DROP INDEX IF EXISTS idx_nao_resolvidos;
+CREATE INDEX IF NOT EXISTS idx_alertas_ativos ON alertas(data_criacao DESC, id DESC) WHERE resolvido = FALSE;
+
+-- viagens: parcial com as viagens em andamento
+CREATE INDEX IF NOT EXISTS idx_viagens_ativas ON viagens(data_inicio DESC, id DESC) WHERE status = 'em_andamento';
+
+-- Índices que o schema declarava como INDEX inline (sintaxe MySQL), com
+-- nomes únicos no banco; remove as versões criadas à mão com o nome antigo
+DROP INDEX IF EXISTS idx_moto_periodo;
+CREATE INDEX IF NOT EXISTS idx_motos_areas_periodo ON motos_areas(moto_id, entrada, saida);
+DROP INDEX IF EXISTS idx_moto_alertas;
+CREATE INDEX IF NOT EXISTS idx_alertas_moto_data ON alertas(moto_id, data_criacao);
+DROP INDEX IF EXISTS idx_moto_manutencao;
+CREATE INDEX IF NOT EXISTS idx_manutencoes_moto_data ON manutencoes(moto_id, data_inicio);
+DROP INDEX IF EXISTS idx_moto_viagens;
+CREATE INDEX IF NOT EXISTS idx_viagens_moto_data ON viagens(moto_id, data_inicio);
+DROP INDEX IF EXISTS idx_entregador_viagens;
+CREATE INDEX IF NOT EXISTS idx_viagens_entregador_data ON viagens(entregador_id, data_inicio);
+DROP INDEX IF EXISTS idx_timestamp;
+DROP INDEX IF EXISTS idx_camera;
+DROP INDEX IF EXISTS idx_usuario;
+CREATE INDEX IF NOT EXISTS idx_deteccoes_timestamp ON deteccoes_visao USING BRIN (timestamp) WITH (autosummarize = on);
+CREATE INDEX IF NOT EXISTS idx_deteccoes_camera ON deteccoes_visao(camera_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs_sistema USING BRIN (timestamp) WITH (autosummarize = on);
+CREATE INDEX IF NOT EXISTS idx_logs_usuario ON logs_sistema(usuario_id, timestamp);
+
+COMMIT;
+
+ANALYZE localizacoes, sensores_iot, alertas, viagens;
@@ -0,0 +1,157 @@
+"""
+Manutenção das partições mensais - Mottu Tracking System
+
+`localizacoes` e `sensores_iot` são particionadas por mês em timestamp
+(database_postgresql.sql / migrations/002_particionamento.sql). Este job
+garante partições criadas com antecedência e, se configurada, aplica a
+retenção soltando partições inteiras em vez de DELETE linha a linha.
+
+A retenção é opcional: sem DatabaseConfig.RETENCAO_PARTICOES nenhuma
+partição é removida. Por padrão as partições vencidas só são desanexadas
+(ficam como tabelas comuns, para arquivar); o DROP exige
+DatabaseConfig.APAGAR_PARTICOES = True ou --apagar.
+
+Roda em uma thread da API (uma vez por dia) ou pelo cron:
+    python partition_maintenance.py [--retencao localizacoes=12] [--apagar]
+"""
+
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import psycopg2
+
+from database_module import Database
+
+logger = logging.getLogger(__name__)
+
+# Tabelas particionadas por mês
+TABELAS_PARTICIONADAS = ('localizacoes', 'sensores_iot')
+
+
+class ManutencaoParticoes:
+    """Cria partições futuras e desanexa/remove as que passaram da retenção"""
+
+    def __init__(self, db: Database, meses_a_frente: int = 3,
+                 retencao_meses: Optional[Dict[str, int]] = None,
+                 apenas_desanexar: Optional[bool] = None, intervalo_horas: float = 24):
+        self.db = db
+        self.meses_a_frente = meses_a_frente
+        # Tabela -> meses mantidos além do mês atual; tabelas fora do dicionário
+        # não têm retenção (padrão da configuração: nenhuma)
+        if retencao_meses is None:
+            retencao_meses = db.config.RETENCAO_PARTICOES
+        desconhecidas = set(retencao_meses) - set(TABELAS_PARTICIONADAS)
+        if desconhecidas:
+            raise ValueError(f"Tabelas sem particionamento: {sorted(desconhecidas)}")
+        self.retencao_meses = dict(retencao_meses)
+        # Desanexadas ficam como tabelas comuns (para arquivar antes de apagar)
+        if apenas_desanexar is None:
+            apenas_desanexar = not db.config.APAGAR_PARTICOES
+        self.apenas_desanexar = apenas_desanexar
+        self.intervalo = intervalo_horas * 3600
+
+        self._parar = threading.Event()
+        self._thread = None
+
+        self._execucoes = 0
+        self._criadas = {}
+        self._removidas = {}
+        self._ultima_execucao = None
+        self._ultimo_erro = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._run, name='manutencao-particoes', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._parar.is_set():
+            try:
+                self.executar()
+            except psycopg2.Error as e:
+                self._ultimo_erro = str(e).strip()
+                logger.error(f"Erro na manutenção de partições: {e}")
+            self._parar.wait(self.intervalo)
+
+    def executar(self) -> Dict:
+        """Um ciclo completo: cria partições à frente e aplica a retenção"""
+        criadas = {}
+        removidas = {}
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                for tabela in TABELAS_PARTICIONADAS:
+                    cur.execute("SELECT criar_particoes_mensais(%s, %s)", (tabela, self.meses_a_frente))
+                    criadas[tabela] = cur.fetchone()[0]
+                    removidas[tabela] = 0
+                    if tabela in self.retencao_meses:
+                        cur.execute(
+                            "SELECT remover_particoes_antigas(%s, %s, %s)",
+                            (tabela, self.retencao_meses[tabela], self.apenas_desanexar)
+                        )
+                        removidas[tabela] = cur.fetchone()[0]
+
+        for tabela in criadas:
+            self._criadas[tabela] = self._criadas.get(tabela, 0) + criadas[tabela]
+            self._removidas[tabela] = self._removidas.get(tabela, 0) + removidas[tabela]
+        self._execucoes += 1
+        self._ultima_execucao = datetime.now().isoformat()
+        logger.info(f"Manutenção de partições: criadas={criadas} removidas={removidas}")
+        return {'criadas': criadas, 'removidas': removidas}
+
+    def metricas(self) -> Dict:
+        return {
+            'execucoes': self._execucoes,
+            'ultima_execucao': self._ultima_execucao,
+            'particoes_criadas': dict(self._criadas),
+            'particoes_removidas': dict(self._removidas),
+            'retencao_meses': dict(self.retencao_meses),
+            'apenas_desanexar': self.apenas_desanexar,
+            'ultimo_erro': self._ultimo_erro
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manutenção das partições mensais')
+    parser.add_argument('--meses-a-frente', type=int, default=3)
+    parser.add_argument('--retencao', action='append', metavar='TABELA=MESES',
+                        help='Meses mantidos além do atual (padrão: DatabaseConfig.RETENCAO_PARTICOES)')
+    parser.add_argument('--apagar', action='store_true',
+                        help='Apaga as partições antigas (padrão: apenas desanexar)')
+    args = parser.parse_args()
+
+    retencao = None
+    if args.retencao:
+        try:
+            retencao = {t: int(m) for t, m in (item.split('=', 1) for item in args.retencao)}
+        except ValueError:
+            parser.error('--retencao deve ser TABELA=MESES, ex.: localizacoes=12')
+
+    db = Database()
+    try:
+        inicio = time.perf_counter()
+        manutencao = ManutencaoParticoes(
+            db, meses_a_frente=args.meses_a_frente, retencao_meses=retencao,
+            apenas_desanexar=not args.apagar
+        )
+        resultado = manutencao.executar()
+        acao = 'desanexadas' if manutencao.apenas_desanexar else 'apagadas'
+        print(f"✓ Partições criadas: {resultado['criadas']}")
+        print(f"✓ Partições {acao}: {resultado['removidas']}")
+        print(f"  ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    finally:
+        db.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
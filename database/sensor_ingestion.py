@@ -0,0 +1,243 @@
+"""
+Ingestão de leituras IoT via COPY - Mottu Tracking System
+
+Leituras são validadas, convertidas para linhas CSV e acumuladas em um
+buffer limitado em memória. Uma thread envia o buffer para `sensores_iot`
+com `COPY ... FROM STDIN (FORMAT csv)` ao atingir `flush_rows` linhas ou a
+cada `flush_interval_s`. Com o buffer cheio `registrar` levanta
+IngestaoSobrecarregada (a API responde 503 + Retry-After).
+"""
+
+import csv
+import io
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import psycopg2
+
+from database_module import Database
+
+logger = logging.getLogger(__name__)
+
+TIPOS_SENSOR = (
+    'gps', 'acelerometro', 'giroscopio', 'temperatura',
+    'bateria', 'velocidade', 'pressao_pneu', 'camera'
+)
+STATUS_SENSOR = ('online', 'offline', 'erro', 'calibracao')
+
+COPY_SQL = """
+    COPY sensores_iot (moto_id, tipo_sensor, valor, unidade, timestamp, status_sensor, metadata)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+# Só estes erros indicam uma linha ruim (isolada e descartada). Os demais
+# (banco fora, pool esgotado, conexão quebrada) devolvem o lote ao buffer:
+# as leituras já foram aceitas pela API e não podem se perder.
+ERROS_DE_DADOS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+class IngestaoSobrecarregada(Exception):
+    """Buffer de ingestão cheio: o Postgres não está acompanhando"""
+
+
+class EnvioInterrompido(Exception):
+    """Falha transitória no meio de um lote; `pendentes` volta ao buffer"""
+
+    def __init__(self, erro: Exception, pendentes: List[str], gravadas: int, descartadas: int):
+        super().__init__(str(erro))
+        self.erro = erro
+        self.pendentes = pendentes
+        self.gravadas = gravadas
+        self.descartadas = descartadas
+
+
+class SensorIngestor:
+    """Buffer limitado de leituras enviado ao Postgres com COPY em lote"""
+
+    def __init__(self, db: Database, max_buffer: int = 50000, flush_rows: int = 5000,
+                 flush_interval_s: float = 1.0, retry_backoff_s: float = 2.0):
+        self.db = db
+        self.max_buffer = max_buffer
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_s
+        self.retry_backoff = retry_backoff_s
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        self._aceitas = 0
+        self._gravadas = 0
+        self._descartadas = 0
+        self._rejeitadas = 0
+        self._flushes = 0
+        self._tempo_flush_total = 0.0
+        self._ultimo_erro = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sensor-ingestor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Envia o que restar no buffer e encerra a thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    @staticmethod
+    def formatar_linha(dados: Dict) -> str:
+        """Valida uma leitura e a converte em linha CSV para o COPY"""
+        for campo in ('moto_id', 'tipo_sensor', 'valor'):
+            if dados.get(campo) is None:
+                raise ValueError(f'Campo obrigatório: {campo}')
+        if dados['tipo_sensor'] not in TIPOS_SENSOR:
+            raise ValueError(f"tipo_sensor inválido: {dados['tipo_sensor']}")
+        status = dados.get('status_sensor', 'online')
+        if status not in STATUS_SENSOR:
+            raise ValueError(f'status_sensor inválido: {status}')
+
+        timestamp = dados.get('timestamp')
+        timestamp = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+        metadata = dados.get('metadata')
+
+        saida = io.StringIO()
+        csv.writer(saida, lineterminator='\n').writerow([
+            int(dados['moto_id']),
+            dados['tipo_sensor'],
+            float(dados['valor']),
+            dados.get('unidade'),
+            timestamp.isoformat(),
+            status,
+            json.dumps(metadata) if metadata else None
+        ])
+        return saida.getvalue()
+
+    def registrar(self, leituras: List[Dict]) -> int:
+        """
+        Enfileira leituras já validadas (tudo ou nada).
+        Levanta ValueError (item inválido) ou IngestaoSobrecarregada.
+        """
+        linhas = []
+        for indice, dados in enumerate(leituras):
+            try:
+                linhas.append(self.formatar_linha(dados))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'Item {indice}: {e}')
+
+        with self._cond:
+            if len(self._buffer) + len(linhas) > self.max_buffer:
+                self._rejeitadas += len(linhas)
+                raise IngestaoSobrecarregada(
+                    f'Buffer de ingestão cheio ({len(self._buffer)}/{self.max_buffer})'
+                )
+            self._buffer.extend(linhas)
+            self._aceitas += len(linhas)
+            if len(self._buffer) >= self.flush_rows:
+                self._cond.notify()
+        return len(linhas)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._buffer) < self.flush_rows:
+                    self._cond.wait(self.flush_interval)
+                if not self._buffer:
+                    if not self._running:
+                        return
+                    continue
+                lote = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.flush_rows))]
+
+            try:
+                self._enviar(lote)
+            except EnvioInterrompido as e:
+                # Banco indisponível/pool esgotado: devolve o que não foi
+                # gravado ao início do buffer e espera
+                self._ultimo_erro = str(e.erro).strip()
+                logger.error(f"Erro transitório na ingestão de sensores: {self._ultimo_erro}")
+                with self._cond:
+                    self._buffer.extendleft(reversed(e.pendentes))
+                if not self._running:
+                    return
+                time.sleep(self.retry_backoff)
+
+    def _copy(self, linhas: List[str]):
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(COPY_SQL, io.StringIO(''.join(linhas)))
+
+    def _enviar(self, lote: List[str]):
+        inicio = time.perf_counter()
+        try:
+            gravadas, descartadas = self._copy_isolando_erros(lote)
+        except EnvioInterrompido as e:
+            gravadas, descartadas = e.gravadas, e.descartadas
+            raise
+        finally:
+            with self._cond:
+                self._flushes += 1
+                self._gravadas += gravadas
+                self._descartadas += descartadas
+                self._tempo_flush_total += time.perf_counter() - inicio
+
+    def _copy_isolando_erros(self, linhas: List[str]) -> Tuple[int, int]:
+        """
+        Um COPY falha inteiro por uma linha ruim (ex.: moto inexistente):
+        em erro de dados divide o lote ao meio até isolar e descartar as
+        linhas com erro. Qualquer outro erro interrompe o envio com
+        EnvioInterrompido, levando as linhas ainda não gravadas.
+        Retorna (gravadas, descartadas).
+        """
+        gravadas = descartadas = 0
+        partes = [linhas]
+        while partes:
+            parte = partes.pop()
+            try:
+                self._copy(parte)
+                gravadas += len(parte)
+            except ERROS_DE_DADOS as e:
+                if len(parte) == 1:
+                    descartadas += 1
+                    self._ultimo_erro = str(e).strip()
+                    logger.warning(f"Leitura descartada na ingestão: {self._ultimo_erro}")
+                    continue
+                meio = len(parte) // 2
+                partes.append(parte[meio:])
+                partes.append(parte[:meio])
+            except psycopg2.Error as e:
+                # OperationalError, InterfaceError, PoolError ("connection pool exhausted")...
+                pendentes = parte + [linha for resto in reversed(partes) for linha in resto]
+                raise EnvioInterrompido(e, pendentes, gravadas, descartadas)
+        return gravadas, descartadas
+
+    def pressao(self) -> float:
+        """Ocupação do buffer (0 a 1)"""
+        with self._cond:
+            return len(self._buffer) / self.max_buffer
+
+    def metricas(self) -> Dict:
+        with self._cond:
+            return {
+                'buffer': len(self._buffer),
+                'capacidade': self.max_buffer,
+                'pressao': round(len(self._buffer) / self.max_buffer, 3),
+                'aceitas': self._aceitas,
+                'gravadas': self._gravadas,
+                'descartadas': self._descartadas,
+                'rejeitadas': self._rejeitadas,
+                'flushes': self._flushes,
+                'tempo_medio_flush_ms': round(self._tempo_flush_total * 1000 / self._flushes, 2)
+                if self._flushes else 0,
+                'ultimo_erro': self._ultimo_erro
+            }
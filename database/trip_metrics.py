@@ -0,0 +1,184 @@
+"""
+Métricas de trajeto das viagens - Mottu Tracking System
+
+Calcula, a partir dos pontos GPS de `localizacoes` registrados entre o
+início e o fim de cada viagem, a distância percorrida, o tempo em
+movimento e as velocidades máxima e média. O Haversine é aplicado com
+NumPy sobre todos os pontos de um lote de viagens de uma vez (um único
+SELECT por lote), em vez de ponto a ponto como calcular_distancia_km().
+
+Recalcular distancia_km das viagens concluídas em um dia (cron):
+    python trip_metrics.py [AAAA-MM-DD] [--lote 1000]
+"""
+
+import argparse
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from database_module import Database
+
+logger = logging.getLogger(__name__)
+
+RAIO_TERRA_KM = 6371.0  # mesmo raio de calcular_distancia_km()
+# Trechos abaixo disso são parada/ruído do GPS (não contam tempo em movimento)
+VELOCIDADE_MINIMA_KMH = 3.0
+# Trechos acima disso são saltos do GPS (não contam distância)
+VELOCIDADE_MAXIMA_KMH = 200.0
+
+# Pontos de cada viagem em ordem de tempo (viagem em andamento: até agora)
+PONTOS_VIAGENS_SQL = """
+    SELECT v.id, EXTRACT(EPOCH FROM l.timestamp)::float8,
+           l.latitude::float8, l.longitude::float8
+    FROM viagens v
+    JOIN localizacoes l ON l.moto_id = v.moto_id
+        AND l.timestamp >= v.data_inicio
+        AND l.timestamp <= COALESCE(v.data_fim, NOW())
+    WHERE v.id = ANY(%s)
+    ORDER BY v.id, l.timestamp, l.id
+"""
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distância em km entre pares de pontos (arrays de graus)"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def calcular_metricas(linhas: Sequence) -> Dict[int, Dict]:
+    """
+    Métricas por viagem a partir de linhas (viagem_id, epoch, lat, lon)
+    ordenadas por viagem e tempo. Cada trecho é o par de pontos
+    consecutivos; trechos entre viagens diferentes são descartados e as
+    somas por viagem saem de um reduceat. Viagens com menos de dois pontos
+    não têm trajeto e ficam fora do resultado.
+    """
+    if len(linhas) == 0:
+        return {}
+
+    pontos = np.asarray(linhas, dtype=np.float64)
+    viagens = pontos[:, 0].astype(np.int64)
+    t, lat, lon = pontos[:, 1], pontos[:, 2], pontos[:, 3]
+
+    distancia = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    dt = np.diff(t)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocidade = np.where(dt > 0, distancia / dt * 3600, 0.0)
+    valido = (viagens[1:] == viagens[:-1]) & (velocidade <= VELOCIDADE_MAXIMA_KMH)
+    movimento = valido & (velocidade >= VELOCIDADE_MINIMA_KMH)
+
+    # Trecho i começa no ponto i: um zero no fim alinha os trechos aos pontos
+    def por_ponto(valores, mascara):
+        return np.append(np.where(mascara, valores, 0.0), 0.0)
+
+    inicios = np.flatnonzero(np.r_[True, viagens[1:] != viagens[:-1]])
+    fins = np.r_[inicios[1:], len(viagens)] - 1
+    distancia_km = np.add.reduceat(por_ponto(distancia, valido), inicios)
+    movimento_s = np.add.reduceat(por_ponto(dt, movimento), inicios)
+    velocidade_max = np.maximum.reduceat(por_ponto(velocidade, valido), inicios)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocidade_media = np.where(movimento_s > 0, distancia_km / movimento_s * 3600, 0.0)
+
+    resultado = {}
+    for i, viagem_id in enumerate(viagens[inicios]):
+        if fins[i] == inicios[i]:
+            continue
+        resultado[int(viagem_id)] = {
+            'distancia_km': round(float(distancia_km[i]), 3),
+            'tempo_movimento_min': round(float(movimento_s[i]) / 60, 1),
+            'duracao_min': round(float(t[fins[i]] - t[inicios[i]]) / 60, 1),
+            'velocidade_maxima_kmh': round(float(velocidade_max[i]), 1),
+            'velocidade_media_kmh': round(float(velocidade_media[i]), 1),
+            'pontos': int(fins[i] - inicios[i] + 1)
+        }
+    return resultado
+
+
+def _lotes(ids: List[int], tamanho: int) -> Iterable[List[int]]:
+    for i in range(0, len(ids), tamanho):
+        yield ids[i:i + tamanho]
+
+
+class MetricasViagens:
+    """Métricas de trajeto de uma ou muitas viagens e recálculo de distancia_km"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def calcular(self, viagem_ids: Sequence[int], somente_leitura: bool = True) -> Dict[int, Dict]:
+        """
+        Métricas das viagens informadas (um SELECT para todas). Quem grava o
+        resultado (finalização, recálculo) passa somente_leitura=False: uma
+        réplica atrasada ainda não teria os últimos pontos da viagem.
+        """
+        if not viagem_ids:
+            return {}
+        with self.db.get_connection(somente_leitura=somente_leitura) as conn:
+            with conn.cursor() as cur:
+                cur.execute(PONTOS_VIAGENS_SQL, (list(viagem_ids),))
+                return calcular_metricas(cur.fetchall())
+
+    def recalcular(self, dia: Optional[date] = None, lote: int = 1000) -> Dict:
+        """
+        Regrava distancia_km das viagens concluídas em `dia` (padrão: ontem)
+        com a distância do trajeto GPS, em lotes de `lote` viagens. Viagens
+        sem trajeto mantêm a distância informada na finalização.
+        """
+        dia = dia or date.today() - timedelta(days=1)
+        inicio = time.perf_counter()
+
+        with self.db.get_connection(somente_leitura=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id FROM viagens
+                    WHERE status = 'concluida' AND data_fim >= %s AND data_fim < %s
+                    ORDER BY id
+                """, (dia, dia + timedelta(days=1)))
+                ids = [linha[0] for linha in cur.fetchall()]
+
+        atualizadas = 0
+        pontos = 0
+        for ids_lote in _lotes(ids, lote):
+            metricas = self.calcular(ids_lote, somente_leitura=False)
+            if not metricas:
+                continue
+            pontos += sum(m['pontos'] for m in metricas.values())
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        UPDATE viagens v SET distancia_km = x.distancia_km
+                        FROM unnest(%s::int[], %s::numeric[]) AS x(id, distancia_km)
+                        WHERE v.id = x.id
+                    """, (list(metricas), [m['distancia_km'] for m in metricas.values()]))
+                    atualizadas += cur.rowcount
+
+        resultado = {
+            'dia': dia.isoformat(),
+            'viagens': len(ids),
+            'atualizadas': atualizadas,
+            'pontos': pontos,
+            'segundos': round(time.perf_counter() - inicio, 2)
+        }
+        logger.info(f"Distâncias recalculadas: {resultado}")
+        return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recalcula distancia_km das viagens concluídas em um dia')
+    parser.add_argument('dia', nargs='?', help='AAAA-MM-DD (padrão: ontem)')
+    parser.add_argument('--lote', type=int, default=1000, help='viagens por consulta')
+    args = parser.parse_args()
+
+    db = Database()
+    try:
+        dia = datetime.strptime(args.dia, '%Y-%m-%d').date() if args.dia else None
+        r = MetricasViagens(db).recalcular(dia, lote=args.lote)
+        print(f"✓ {r['atualizadas']}/{r['viagens']} viagens de {r['dia']} recalculadas "
+              f"({r['pontos']} pontos em {r['segundos']} s)")
+    finally:
+        db.close_all_connections()
@@ -40,31 +40,21 @@ def salvar_deteccao_moto(placa, latitude, longitude, confianca=0.9):
     Salva detecção de moto no banco de dados
     """
     try:
-        # Buscar moto pela placa
-        motos = moto_repo.listar_motos()
-        moto = next((m for m in motos if m['placa'] == placa), None)
-        
-        if not moto:
-            # Criar moto se não existir
-            moto_id = moto_repo.criar_moto(
-                placa=placa,
-                modelo="Moto Detectada",
-                marca="Desconhecida",
-                ano=2024
-            )
-            print(f"✅ Nova moto criada: {placa} (ID: {moto_id})")
-        else:
-            moto_id = moto['id']
-        
-        # Registrar localização
-        loc_repo.registrar_localizacao(
-            moto_id=moto_id,
+        # Placa -> id pelo cache; moto nova criada no mesmo comando da localização
+        resultado = loc_repo.registrar_por_placa(
+            placa=placa,
             latitude=latitude,
             longitude=longitude,
+            modelo="Moto Detectada",
+            marca="Desconhecida",
+            ano=2024,
             velocidade=0,
             origem='visao_computacional'
         )
         
+        if resultado['moto_criada']:
+            print(f"✅ Nova moto criada: {placa} (ID: {resultado['moto_id']})")
+        
         print(f"✅ Localização de {placa} salva no banco!")
         return True
         
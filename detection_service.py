@@ -0,0 +1,226 @@
+"""
+Serviço de detecção com micro-batching
+
+Requisições concorrentes entram numa fila e são agrupadas em micro-lotes
+(limitados por tamanho máximo e espera máxima em ms). Cada lote passa por
+um único forward da rede e o resultado de cada imagem volta para quem a
+enviou.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import cv2
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCHING = {
+    'max_batch_size': 8,
+    'max_wait_ms': 10,
+    'max_queue': 64,
+    'request_timeout_s': 30
+}
+
+
+def _histogram_bucket(value):
+    """Agrupa em potências de 2 (0, 1, 2, 4, 8, ...)"""
+    if value <= 0:
+        return 0
+    return 1 << (int(value).bit_length() - 1)
+
+
+class MicroBatcher:
+    """
+    Agrupa imagens de várias requisições em um único forward do YOLO.
+
+    `postprocess(outs, width, height)` converte as saídas de uma imagem em
+    detecções (ex.: IoTMotorcycleDetector.parse_yolo_outputs).
+    """
+
+    def __init__(self, net, output_layers, postprocess, max_batch_size=8,
+                 max_wait_ms=10, max_queue=64, input_size=(416, 416)):
+        self.net = net
+        self.output_layers = output_layers
+        self.postprocess = postprocess
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.input_size = tuple(input_size)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._running = False
+
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._requests = 0
+        self._rejected = 0
+        self._forward_time_total = 0.0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def submit(self, frame):
+        """Enfileira um frame BGR; retorna um Future com a lista de detecções"""
+        future = Future()
+        try:
+            self._queue.put_nowait((frame, future))
+        except queue.Full:
+            with self._metrics_lock:
+                self._rejected += 1
+            raise
+        return future
+
+    def detect(self, frame, timeout=None):
+        """Atalho síncrono: enfileira e espera o resultado"""
+        return self.submit(frame).result(timeout=timeout)
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            depth = self._queue.qsize()
+            futures = [future for _, future in batch]
+            try:
+                frames = [frame for frame, _ in batch]
+                start = time.perf_counter()
+                blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, self.input_size,
+                                              swapRB=True, crop=False)
+                self.net.setInput(blob)
+                outs = self.net.forward(self.output_layers)
+                elapsed = time.perf_counter() - start
+
+                for i, (frame, future) in enumerate(batch):
+                    # Com lote > 1 a saída é (N, linhas, 85); com 1 é (linhas, 85)
+                    frame_outs = [
+                        out[i] if out.ndim == 3 else out.reshape(len(batch), -1, out.shape[-1])[i]
+                        for out in outs
+                    ]
+                    height, width = frame.shape[:2]
+                    future.set_result(self.postprocess(frame_outs, width, height))
+            except Exception as e:
+                logger.error(f"Erro no lote de deteccao: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            with self._metrics_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._queue_depths[_histogram_bucket(depth)] += 1
+                self._requests += len(batch)
+                self._forward_time_total += elapsed
+
+    def metrics(self):
+        with self._metrics_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'requests': self._requests,
+                'rejected': self._rejected,
+                'batches': batches,
+                'avg_batch_size': round(self._requests / batches, 2) if batches else 0,
+                'avg_forward_ms': round(self._forward_time_total * 1000 / batches, 2) if batches else 0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                'queue_depth_histogram': {str(k): v for k, v in sorted(self._queue_depths.items())}
+            }
+
+
+def decode_image(data):
+    """Decodifica bytes de imagem direto da memória (sem arquivo temporário)"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def _read_uploaded_image():
+    file = request.files.get('image')
+    data = file.read() if file else request.get_data()
+    return decode_image(data)
+
+
+def create_detection_blueprint(batcher, request_timeout_s=30):
+    """Cria as rotas do serviço de detecção usando o batcher informado"""
+    detection_blueprint = Blueprint('detection', __name__)
+
+    def run_detection():
+        frame = _read_uploaded_image()
+        if frame is None:
+            return None, (jsonify({'success': False, 'error': 'Imagem invalida ou ausente'}), 400)
+        try:
+            detections = batcher.detect(frame, timeout=request_timeout_s)
+        except queue.Full:
+            response = jsonify({'success': False, 'error': 'Servico de deteccao sobrecarregado'})
+            response.headers['Retry-After'] = '1'
+            return None, (response, 503)
+        except FutureTimeoutError:
+            # O frame continua no lote; o resultado é descartado quando chegar
+            return None, (jsonify({'success': False, 'error': 'Tempo esgotado aguardando a deteccao'}), 504)
+        except Exception as e:
+            # Exceção do forward/pós-processamento repassada pelo Future do lote
+            logger.error(f"Erro na deteccao: {e}")
+            return None, (jsonify({'success': False, 'error': f'Erro na deteccao: {e}'}), 500)
+        return detections, None
+
+    @detection_blueprint.route('/api/detect', methods=['POST'])
+    def detect():
+        detections, error = run_detection()
+        if error:
+            return error
+        return jsonify({'success': True, 'detections': detections, 'count': len(detections)})
+
+    @detection_blueprint.route('/upload', methods=['POST'])
+    def upload():
+        detections, error = run_detection()
+        if error:
+            return error
+        return jsonify({
+            'success': True,
+            'results': {
+                'detections': detections,
+                'motorcycles_count': len(detections)
+            }
+        })
+
+    @detection_blueprint.route('/api/detect/metrics')
+    def detect_metrics():
+        return jsonify(batcher.metrics())
+
+    return detection_blueprint
@@ -1,28 +1,61 @@
-import urllib.request
+import argparse
 import os
 import sys
+import threading
 
-def download_file(url, filepath):
-    """Download arquivo com barra de progresso"""
-    def show_progress(block_num, block_size, total_size):
-        downloaded = block_num * block_size
+from model_downloader import YOLO_FILES, ChecksumUnknownError, download, expected_checksum, verify
+
+_progress_lock = threading.Lock()
+
+def download_file(url, filepath, allow_unverified=False):
+    """Download arquivo com barra de progresso (retomável e verificado)"""
+    def show_progress(downloaded, total_size):
+        if not total_size:
+            return
         percent = min(downloaded * 100 / total_size, 100)
         bar_length = 50
         filled = int(bar_length * percent / 100)
         bar = '█' * filled + '░' * (bar_length - filled)
-        sys.stdout.write(f'\r[{bar}] {percent:.1f}% ({downloaded/1024/1024:.1f}/{total_size/1024/1024:.1f} MB)')
-        sys.stdout.flush()
+        with _progress_lock:
+            sys.stdout.write(f'\r[{bar}] {percent:.1f}% ({downloaded/1024/1024:.1f}/{total_size/1024/1024:.1f} MB)')
+            sys.stdout.flush()
     
     print(f"\nBaixando: {os.path.basename(filepath)}")
     try:
-        urllib.request.urlretrieve(url, filepath, show_progress)
+        download(url, filepath, progress=show_progress, allow_unverified=allow_unverified)
         print(f"\n✓ {os.path.basename(filepath)} baixado com sucesso!")
         return True
+    except ChecksumUnknownError as e:
+        print(f"✗ {e}")
+        print("  Para aceitar o arquivo sem verificação: python download_models.py --aceitar-sem-checksum")
+        return False
     except Exception as e:
         print(f"\n✗ Erro ao baixar {os.path.basename(filepath)}: {e}")
+        print("  Execute novamente para retomar o download de onde parou.")
         return False
 
+def convert_cached_model():
+    """Gera o cache otimizado do modelo (uma única vez por versão dos pesos)"""
+    from model_cache import convert_model, is_cache_valid
+
+    weights_path, config_path = 'models/yolov3.weights', 'models/yolov3.cfg'
+    if is_cache_valid(weights_path, config_path):
+        print("○ Cache do modelo já está atualizado")
+        return
+
+    print("\nConvertendo modelo para o cache otimizado...")
+    try:
+        convert_model(weights_path, config_path)
+        print("✓ Cache do modelo gerado em models/cache/")
+    except Exception as e:
+        print(f"✗ Não foi possível gerar o cache ({e}); os arquivos originais serão usados")
+
 def main():
+    parser = argparse.ArgumentParser(description="Baixa os arquivos do modelo YOLO")
+    parser.add_argument('--aceitar-sem-checksum', action='store_true',
+                        help="Aceita arquivos sem SHA-256 em models/SHA256SUMS e registra o hash obtido")
+    args = parser.parse_args()
+
     print("="*60)
     print("DOWNLOAD DOS ARQUIVOS YOLO")
     print("="*60)
@@ -32,15 +65,15 @@ def main():
     
     files = {
         'models/yolov3.weights': {
-            'url': 'https://pjreddie.com/media/files/yolov3.weights',
+            'url': YOLO_FILES['yolov3.weights'],
             'size': '237 MB'
         },
         'models/yolov3.cfg': {
-            'url': 'https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3.cfg',
+            'url': YOLO_FILES['yolov3.cfg'],
             'size': '8 KB'
         },
         'models/coco.names': {
-            'url': 'https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names',
+            'url': YOLO_FILES['coco.names'],
             'size': '1 KB'
         }
     }
@@ -51,13 +84,24 @@ def main():
     
     for filepath, info in files.items():
         if os.path.exists(filepath):
-            print(f"\n○ {os.path.basename(filepath)} já existe (pulando)")
-            skipped += 1
-        else:
-            if download_file(info['url'], filepath):
-                downloaded += 1
-            else:
+            try:
+                valid = verify(filepath, allow_unverified=args.aceitar_sem_checksum)
+            except ChecksumUnknownError as e:
+                print(f"\n✗ {e}")
                 failed += 1
+                continue
+            if valid:
+                known = expected_checksum(os.path.basename(filepath)) is not None
+                print(f"\n○ {os.path.basename(filepath)} já existe "
+                      f"({'verificado' if known else 'sem verificação'})")
+                skipped += 1
+                continue
+            print(f"\n⚠ {os.path.basename(filepath)} existente não confere com o checksum")
+
+        if download_file(info['url'], filepath, allow_unverified=args.aceitar_sem_checksum):
+            downloaded += 1
+        else:
+            failed += 1
     
     print("\n" + "="*60)
     print("RESUMO")
@@ -70,6 +114,7 @@ def main():
     
     if failed == 0 and (downloaded > 0 or skipped == len(files)):
         print("\n✓ Todos os arquivos estão prontos!")
+        convert_cached_model()
         print("Execute: python main.py")
     else:
         print("\n⚠ Alguns arquivos não foram baixados.")
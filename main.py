@@ -4,16 +4,62 @@ import threading
 import time
 import json
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import random
 import os
-from flask import Flask, render_template, jsonify, send_from_directory
+from flask import Flask, render_template, jsonify, request, send_from_directory
 from flask_socketio import SocketIO, emit
 import logging
+from model_cache import load_yolo_net
+from detection_service import MicroBatcher, create_detection_blueprint, DEFAULT_BATCHING
+from upload_jobs import UploadJobQueue, create_jobs_blueprint, DEFAULT_UPLOAD_JOBS
+from crop_pipeline import CropPipeline, build_analysers, DEFAULT_SECONDARY_ANALYSIS
+from sqlite_writer import SQLiteBatchWriter, sqlite_timestamp, DEFAULT_WRITER
+from sqlite_connections import SQLiteConnectionManager
+from sqlite_maintenance import MaintenanceScheduler, DEFAULT_MAINTENANCE, enable_incremental_vacuum
+from sensor_rollups import SensorRollups, parse_time_param, parse_resolution
+from sensor_archive import SensorArchive, DEFAULT_ARCHIVE
+from sensor_ring_buffer import SensorRingBuffer
+from simple_storage import WideRowStore, migrate_readings, wide_row, DEFAULT_SIMPLE_STORAGE
+
+
+def create_maintenance_scheduler(db_path, config, connection_factory=None):
+    """Inicia a manutenção (retenção, vacuum, índices) de um banco SQLite"""
+    database_config = config.get('database', {})
+    settings = dict(DEFAULT_MAINTENANCE)
+    settings.update(database_config.get('maintenance', {}))
+    
+    archive_settings = dict(DEFAULT_ARCHIVE)
+    archive_settings.update(database_config.get('archive', {}))
+    archive = None
+    if archive_settings['enabled']:
+        archive = SensorArchive(
+            archive_settings['path'],
+            archive_after_days=archive_settings['archive_after_days'],
+            retention_days=archive_settings['retention_days']
+        )
+    
+    scheduler = MaintenanceScheduler(
+        db_path,
+        database_config,
+        connection_factory=connection_factory,
+        interval_minutes=settings['interval_minutes'],
+        chunk_size=settings['chunk_size'],
+        chunk_pause_ms=settings['chunk_pause_ms'],
+        incremental_vacuum_pages=settings['incremental_vacuum_pages'],
+        archive=archive
+    )
+    scheduler.start()
+    return scheduler
+
 
 class IoTMotorcycleDetector:
     def __init__(self):
+        self.config = self.load_config()
         self.setup_database()
+        self.maintenance = create_maintenance_scheduler(
+            'iot_motorcycle_data.db', self.config, connection_factory=self.db.writer
+        )
         
         self.sensors_data = {
             'temperature': 25.0,
@@ -37,10 +83,25 @@ class IoTMotorcycleDetector:
         self.logger = logging.getLogger(__name__)
         
         self.setup_detector()
+        self.setup_detection_service()
+        self.setup_crop_pipeline()
+        self.setup_upload_jobs()
         self.create_directories()
         
         print("Sistema IoT de Detecao de Motocicletas inicializado")
     
+    @staticmethod
+    def load_config(path='config.json'):
+        """Carrega config.json (dicionário vazio se ausente ou inválido)"""
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"✗ Erro ao ler {path}: {e}")
+            return {}
+    
     def create_directories(self):
         directories = ['static', 'static/images', 'static/detections', 'models']
         for directory in directories:
@@ -59,7 +120,7 @@ class IoTMotorcycleDetector:
         if os.path.exists(weights_path) and os.path.exists(config_path):
             try:
                 print("Carregando modelo YOLOv3...")
-                self.net = cv2.dnn.readNet(weights_path, config_path)
+                self.net = load_yolo_net(weights_path, config_path)
                 
                 if cv2.cuda.getCudaEnabledDeviceCount() > 0:
                     self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
@@ -92,9 +153,93 @@ class IoTMotorcycleDetector:
             print(f"  Procurado em: {weights_path}")
             print("  Usando detector alternativo (baseado em contornos)")
     
+    def setup_detection_service(self):
+        """Registra o endpoint de detecção com micro-batching entre requisições"""
+        self.batcher = None
+        if self.net is None:
+            return
+        
+        batching = dict(DEFAULT_BATCHING)
+        batching.update(self.config.get('computer_vision', {}).get('batching', {}))
+        
+        self.batcher = MicroBatcher(
+            self.net, self.output_layers, self.parse_yolo_outputs,
+            max_batch_size=batching['max_batch_size'],
+            max_wait_ms=batching['max_wait_ms'],
+            max_queue=batching['max_queue']
+        )
+        self.batcher.start()
+        self.app.register_blueprint(
+            create_detection_blueprint(self.batcher, batching['request_timeout_s'])
+        )
+        print(f"✓ Servico de deteccao com micro-batching (lote max. {batching['max_batch_size']})")
+    
+    def setup_crop_pipeline(self):
+        """Segunda etapa: análise por recorte de cada moto detectada"""
+        self.crop_pipeline = None
+        settings = dict(DEFAULT_SECONDARY_ANALYSIS)
+        settings.update(self.config.get('computer_vision', {}).get('secondary_analysis', {}))
+        if not settings['enabled']:
+            return
+        
+        analysers = build_analysers(settings['analysers'])
+        if not analysers:
+            return
+        
+        self.crop_pipeline = CropPipeline(
+            analysers,
+            max_batch_size=settings['max_batch_size'],
+            max_wait_ms=settings['max_wait_ms'],
+            workers=settings['workers']
+        )
+        self.crop_pipeline.start()
+        print(f"✓ Analise secundaria: {', '.join(a.name for a in analysers)}")
+    
+    def setup_upload_jobs(self):
+        """Registra a API de jobs assíncronos de upload"""
+        settings = dict(DEFAULT_UPLOAD_JOBS)
+        settings.update(self.config.get('performance', {}).get('upload_jobs', {}))
+        
+        self.job_queue = UploadJobQueue(
+            self.process_upload,
+            workers=settings['workers'],
+            queue_limit=settings['queue_limit'],
+            result_ttl_s=settings['result_ttl_s'],
+            on_complete=self.notify_job_done
+        )
+        self.job_queue.start()
+        self.app.register_blueprint(create_jobs_blueprint(self.job_queue))
+    
+    def process_upload(self, frame):
+        """Processa um frame enviado por upload (usado pelos workers de jobs)"""
+        if self.batcher is not None:
+            detections = self.batcher.detect(frame, timeout=60)
+        else:
+            detections = self.detect_motorcycles_simple(frame)
+        if self.crop_pipeline is not None:
+            detections = self.crop_pipeline.submit(frame, detections).result(timeout=60)
+        return {
+            'detections': detections,
+            'motorcycles_count': len(detections)
+        }
+    
+    def notify_job_done(self, job, sid=None):
+        """Envia o resultado do job ao cliente que o criou via Socket.IO"""
+        if sid:
+            self.socketio.emit('job_done', job, to=sid)
+    
     def setup_database(self):
-        self.conn = sqlite3.connect('iot_motorcycle_data.db', check_same_thread=False)
-        cursor = self.conn.cursor()
+        # WAL + uma conexão por thread (leituras do dashboard não bloqueiam a ingestão)
+        connections = self.config.get('database', {}).get('connections', {})
+        self.db = SQLiteConnectionManager(
+            'iot_motorcycle_data.db',
+            pragmas=connections.get('pragmas'),
+            wal_autocheckpoint=connections.get('wal_autocheckpoint', 1000)
+        )
+        conn = self.db.writer()
+        # Banco novo já nasce com auto_vacuum=INCREMENTAL (sem VACUUM depois)
+        enable_incremental_vacuum(conn)
+        cursor = conn.cursor()
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sensor_data (
@@ -122,7 +267,38 @@ class IoTMotorcycleDetector:
             )
         ''')
         
-        self.conn.commit()
+        conn.commit()
+        
+        # Inserções agrupadas em uma transação por flush (group commit)
+        settings = dict(DEFAULT_WRITER)
+        settings.update(self.config.get('database', {}).get('writer', {}))
+        self.writer = SQLiteBatchWriter(
+            'iot_motorcycle_data.db',
+            batch_size=settings['batch_size'],
+            flush_interval_ms=settings['flush_interval_ms'],
+            max_queue=settings['max_queue'],
+            durability=settings['durability'],
+            connection_factory=self.db.writer
+        )
+        sensor_columns = [
+            'timestamp', 'temperature', 'humidity', 'motion', 'light_level', 'motorcycles_count'
+        ]
+        self.writer.register_table('sensor_data', sensor_columns)
+        
+        # Agregados por minuto/hora/dia atualizados na mesma transação do flush
+        self.rollups = SensorRollups(sensor_columns)
+        self.rollups.ensure_schema(conn)
+        self.writer.add_flush_hook('sensor_data', self.rollups.update)
+        
+        # Leituras recentes em memória para o dashboard
+        capacity = self.config.get('dashboard', {}).get('interface', {}).get('history_buffer_size', 3600)
+        self.history_buffer = SensorRingBuffer(capacity)
+        self.history_buffer.fill_from_db(self.db.reader())
+        self.writer.register_table('motorcycle_detections', [
+            'timestamp', 'confidence', 'bbox_x', 'bbox_y', 'bbox_width', 'bbox_height',
+            'detection_type', 'image_path'
+        ])
+        self.writer.start()
         print("✓ Banco de dados configurado com sucesso")
     
     def setup_flask_routes(self):
@@ -137,27 +313,67 @@ class IoTMotorcycleDetector:
         
         @self.app.route('/api/history')
         def get_history():
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT timestamp, temperature, humidity, motion, light_level, motorcycles_count 
-                FROM sensor_data 
-                ORDER BY timestamp DESC 
-                LIMIT 50
-            ''')
-            data = cursor.fetchall()
+            if any(request.args.get(key) for key in ('from', 'to', 'resolution')):
+                return get_history_series()
             
-            history = []
-            for row in data:
-                history.append({
-                    'timestamp': row[0],
-                    'temperature': row[1],
-                    'humidity': row[2],
-                    'motion': row[3],
-                    'light_level': row[4],
-                    'motorcycles_count': row[5]
-                })
+            # Histórico recente direto da memória (sem consulta ao SQLite)
+            try:
+                limit = min(int(request.args.get('limit', 50)), self.history_buffer.capacity)
+            except ValueError:
+                return jsonify({'success': False, 'error': "Parametro 'limit' invalido"}), 400
+            return jsonify(self.history_buffer.latest_dicts(limit))
+        
+        def get_history_series():
+            """Histórico agregado: ?from=&to=&resolution= (epoch/ISO, segundos ou minute/hour/day)"""
+            try:
+                end = parse_time_param(request.args.get('to')) or int(time.time())
+                start = parse_time_param(request.args.get('from')) or end - 86400
+                resolution = parse_resolution(request.args.get('resolution'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': f'Parametro invalido: {e}'}), 400
+            if start >= end:
+                return jsonify({'success': False, 'error': "'from' deve ser anterior a 'to'"}), 400
+            
+            if resolution is None:
+                max_points = self.config.get('dashboard', {}).get('interface', {}).get('max_data_points', 50)
+                resolution = SensorRollups.default_resolution(start, end, max_points)
+            
+            result = self.rollups.query(self.db.reader(), start, end, resolution)
+            return jsonify({
+                'success': True,
+                'data': result['series'],
+                'count': len(result['series']),
+                'resolution': result['resolution'],
+                'source': result['source']
+            })
+        
+        @self.app.route('/api/history/raw/<sensor>')
+        def get_history_raw(sensor):
+            """Leituras brutas de um sensor (arquivo colunar + SQLite), ?from=&to= em ISO UTC"""
+            archive = self.maintenance.archive
+            if archive is None:
+                return jsonify({'success': False, 'error': 'Arquivo de sensores desativado'}), 404
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            try:
+                end = request.args.get('to') or now.isoformat()
+                start = request.args.get('from') or (now - timedelta(days=1)).isoformat()
+                timestamps, values = archive.query(self.db.reader(), 'sensor_data', sensor, start, end)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': f'Parametro invalido: {e}'}), 400
             
-            return jsonify(history)
+            data = [
+                {'timestamp': str(ts).replace('T', ' ')[:19], 'value': float(value)}
+                for ts, value in zip(timestamps, values)
+            ]
+            return jsonify({'success': True, 'data': data, 'count': len(data)})
+        
+        @self.app.route('/api/db/writer')
+        def get_writer_metrics():
+            return jsonify(self.writer.metrics())
+        
+        @self.app.route('/api/db/maintenance')
+        def get_maintenance_metrics():
+            return jsonify(self.maintenance.metrics())
         
         @self.app.route('/api/detections')
         def get_detections():
@@ -226,6 +442,10 @@ class IoTMotorcycleDetector:
         self.net.setInput(blob)
         outs = self.net.forward(self.output_layers)
         
+        return self.parse_yolo_outputs(outs, width, height)
+    
+    def parse_yolo_outputs(self, outs, width, height):
+        """Converte as saídas do YOLO de uma imagem em detecções (classe + NMS)"""
         class_ids = []
         confidences = []
         boxes = []
@@ -271,22 +491,16 @@ class IoTMotorcycleDetector:
     def save_detection_data(self, detections, image_filename=""):
         """Salva dados das detecções no banco de dados"""
         try:
-            cursor = self.conn.cursor()
-            
+            timestamp = sqlite_timestamp()
             for detection in detections:
                 bbox = detection['bbox']
-                cursor.execute('''
-                    INSERT INTO motorcycle_detections 
-                    (confidence, bbox_x, bbox_y, bbox_width, bbox_height, detection_type, image_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                self.writer.write('motorcycle_detections', (
+                    timestamp,
                     detection['confidence'], 
                     bbox[0], bbox[1], bbox[2], bbox[3],
                     detection['class'],
                     image_filename
                 ))
-            
-            self.conn.commit()
         except Exception as e:
             print(f"✗ Erro ao salvar detecao: {e}")
     
@@ -313,6 +527,7 @@ class IoTMotorcycleDetector:
         
         total_detections = 0
         processed_count = 0
+        analysis_futures = []
         
         for idx, image_file in enumerate(image_files, 1):
             image_path = os.path.join(images_dir, image_file)
@@ -334,6 +549,10 @@ class IoTMotorcycleDetector:
                     
                     self.save_detection_data(detections, image_file)
                     
+                    # Recortes copiados antes de desenhar as caixas
+                    if self.crop_pipeline is not None:
+                        analysis_futures.append((image_file, self.crop_pipeline.submit(frame, detections)))
+                    
                     # Desenhar as detecções
                     for detection in detections:
                         x, y, w, h = detection['bbox']
@@ -358,6 +577,18 @@ class IoTMotorcycleDetector:
             except Exception as e:
                 print(f"✗ Erro: {e}")
         
+        # Resultados da segunda etapa (lotes formados entre imagens)
+        for image_file, future in analysis_futures:
+            try:
+                for detection in future.result(timeout=60):
+                    analysis = detection.get('analise')
+                    if analysis:
+                        print(f"  {image_file}: cor {analysis.get('cor_dominante')}, "
+                              f"modelo {analysis.get('modelo') or 'indefinido'}, "
+                              f"placa {'encontrada' if analysis.get('placa_regiao') else 'nao encontrada'}")
+            except Exception as e:
+                print(f"✗ Erro na analise secundaria de {image_file}: {e}")
+        
         print(f"\n{'='*60}")
         print(f"RESUMO DO PROCESSAMENTO")
         print(f"{'='*60}")
@@ -398,20 +629,18 @@ class IoTMotorcycleDetector:
                 base_light = random.uniform(50, 150)
             self.sensors_data['light'] = round(max(10, base_light + random.uniform(-50, 50)), 1)
             
-            # Salvar no banco
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO sensor_data 
-                (temperature, humidity, motion, light_level, motorcycles_count)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
+            reading = (
+                sqlite_timestamp(),
                 self.sensors_data['temperature'],
                 self.sensors_data['humidity'],
                 int(self.sensors_data['motion']),
                 self.sensors_data['light'],
                 self.sensors_data['motorcycles_detected']
-            ))
-            self.conn.commit()
+            )
+            
+            # Salvar no banco (commit em grupo pela thread de escrita)
+            self.writer.write('sensor_data', reading)
+            self.history_buffer.append(reading)
             
             # Emitir para dashboard
             self.socketio.emit('sensor_update', self.sensors_data)
@@ -457,7 +686,14 @@ class IoTMotorcycleDetector:
         except KeyboardInterrupt:
             print("\n\nEncerrando sistema...")
             self.running = False
-            self.conn.close()
+            self.job_queue.stop()
+            self.maintenance.stop()
+            if self.crop_pipeline:
+                self.crop_pipeline.stop()
+            if self.batcher:
+                self.batcher.stop()
+            self.writer.stop()
+            self.db.close_all()
             print("✓ Sistema encerrado com sucesso")
 
 
@@ -473,17 +709,24 @@ class SimpleIoTSystem:
         }
         self.running = True
         
+        config = IoTMotorcycleDetector.load_config()
+        
+        # Uma linha tipada por ciclo em readings_wide (converte a tabela antiga)
         self.conn = sqlite3.connect('simple_iot.db')
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS readings (
-                id INTEGER PRIMARY KEY,
-                timestamp TEXT,
-                sensor_type TEXT,
-                value REAL
-            )
-        ''')
-        self.conn.commit()
+        enable_incremental_vacuum(self.conn)
+        migrate_readings(self.conn)
+        settings = dict(DEFAULT_SIMPLE_STORAGE)
+        settings.update(config.get('database', {}).get('simple_storage', {}))
+        self.storage = WideRowStore(
+            self.conn,
+            mode=settings['mode'],
+            batch_size=settings['batch_size'],
+            flush_interval_s=settings['flush_interval_s'],
+            journal_path=settings['journal_path'],
+            fsync=settings['fsync']
+        )
+        
+        self.maintenance = create_maintenance_scheduler('simple_iot.db', config)
     
     def update_sensors(self):
         while self.running:
@@ -497,15 +740,7 @@ class SimpleIoTSystem:
             else:
                 self.sensors['motorcycles'] = 0
             
-            timestamp = datetime.now().isoformat()
-            cursor = self.conn.cursor()
-            for sensor_type, value in self.sensors.items():
-                if sensor_type != 'motion':
-                    cursor.execute(
-                        'INSERT INTO readings (timestamp, sensor_type, value) VALUES (?, ?, ?)',
-                        (timestamp, sensor_type, float(value))
-                    )
-            self.conn.commit()
+            self.storage.write(wide_row(datetime.now().isoformat(), self.sensors))
             
             print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Dados IoT:")
             print(f"  Temperatura: {self.sensors['temperature']}°C")
@@ -527,6 +762,8 @@ class SimpleIoTSystem:
         except KeyboardInterrupt:
             print("\n\nSistema encerrado")
             self.running = False
+            self.maintenance.stop()
+            self.storage.close()
             self.conn.close()
 
 
@@ -0,0 +1,362 @@
+"""
+Cache de modelo YOLO pré-convertido
+
+Converte o par Darknet (yolov3.cfg + yolov3.weights) uma única vez para um
+par Darknet fundido: as camadas de batch normalization são incorporadas aos
+pesos das convoluções. O resultado continua em float32 e no formato que o
+OpenCV lê direto do disco, sem conversão em Python na carga; a rede tem
+menos camadas e o OpenCV não precisa fundir o batch norm ao inicializar.
+O cache é identificado pelo SHA-256 dos arquivos de origem e é ignorado
+automaticamente quando está desatualizado.
+
+benchmarks/bench_model_cache.py compara a carga com e sem o cache.
+
+Uso:
+    python model_cache.py              # converte models/yolov3.*
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join("models", "cache")
+MANIFEST_NAME = "manifest.json"
+CACHE_FORMAT_VERSION = 2
+
+# Mesmo epsilon usado pelo Darknet na normalização
+BN_EPSILON = 1e-6
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Calcula o SHA-256 de um arquivo em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_info(path):
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path)
+    }
+
+
+# ============================================
+# LEITURA / ESCRITA DO FORMATO DARKNET
+# ============================================
+
+def parse_darknet_cfg(config_path):
+    """Lê o .cfg do Darknet como lista de (seção, [(chave, valor), ...])"""
+    sections = []
+    with open(config_path, 'r') as f:
+        for raw_line in f:
+            line = raw_line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                sections.append((line[1:-1].strip(), []))
+            elif '=' in line and sections:
+                key, value = line.split('=', 1)
+                sections[-1][1].append((key.strip(), value.strip()))
+    return sections
+
+
+def write_darknet_cfg(sections, config_path):
+    """Grava seções no formato .cfg do Darknet"""
+    with open(config_path, 'w') as f:
+        for name, options in sections:
+            f.write(f"[{name}]\n")
+            for key, value in options:
+                f.write(f"{key}={value}\n")
+            f.write("\n")
+
+
+def _read_weights_header(f):
+    major, minor, revision = np.fromfile(f, dtype='<i4', count=3)
+    if (major * 10 + minor) >= 2 and major < 1000 and minor < 1000:
+        seen = np.fromfile(f, dtype='<i8', count=1)
+    else:
+        seen = np.fromfile(f, dtype='<i4', count=1).astype('<i8')
+    return int(major), int(minor), int(revision), int(seen[0])
+
+
+def _header_bytes(major, minor, revision, seen):
+    return (np.array([major, minor, revision], dtype='<i4').tobytes()
+            + np.array([seen], dtype='<i8').tobytes())
+
+
+def fuse_darknet_model(config_path, weights_path):
+    """
+    Funde batch normalization nas convoluções.
+
+    Retorna (seções do cfg fundido, cabeçalho, pesos float32 concatenados).
+    """
+    sections = parse_darknet_cfg(config_path)
+    if not sections or sections[0][0] not in ('net', 'network'):
+        raise ValueError(f"Configuracao Darknet invalida: {config_path}")
+
+    net_options = dict(sections[0][1])
+    channels = int(net_options.get('channels', 3))
+
+    with open(weights_path, 'rb') as f:
+        header = _read_weights_header(f)
+        # Versões < 0.2 salvam a matriz transposta em camadas connected,
+        # que não são suportadas aqui; para convoluções o layout é igual.
+        data = np.fromfile(f, dtype='<f4')
+
+    offset = 0
+    layer_channels = []
+    fused_sections = [sections[0]]
+    fused_chunks = []
+
+    def take(count):
+        nonlocal offset
+        if offset + count > data.size:
+            raise ValueError("Arquivo de pesos menor que o esperado pelo cfg")
+        chunk = data[offset:offset + count]
+        offset += count
+        return chunk
+
+    for index, (name, options) in enumerate(sections[1:]):
+        opts = dict(options)
+        prev_channels = layer_channels[-1] if layer_channels else channels
+
+        if name in ('convolutional', 'conv'):
+            filters = int(opts.get('filters', 1))
+            size = int(opts.get('size', 1))
+            groups = int(opts.get('groups', 1))
+            batch_normalize = int(opts.get('batch_normalize', 0))
+            n_weights = filters * (prev_channels // groups) * size * size
+
+            if batch_normalize:
+                beta = take(filters)
+                gamma = take(filters)
+                mean = take(filters)
+                variance = take(filters)
+                weights = take(n_weights).reshape(filters, -1)
+
+                scale = gamma / np.sqrt(variance + BN_EPSILON)
+                weights = weights * scale[:, None]
+                biases = beta - mean * scale
+
+                options = [(k, '0' if k == 'batch_normalize' else v) for k, v in options]
+            else:
+                biases = take(filters)
+                weights = take(n_weights)
+
+            fused_chunks.append(np.asarray(biases, dtype='<f4'))
+            fused_chunks.append(np.asarray(weights, dtype='<f4').ravel())
+            layer_channels.append(filters)
+
+        elif name == 'route':
+            layers = [int(v) for v in opts['layers'].split(',')]
+            layers = [l if l >= 0 else index + l for l in layers]
+            total = sum(layer_channels[l] for l in layers)
+            groups = int(opts.get('groups', 1))
+            layer_channels.append(total // groups)
+
+        elif name == 'reorg':
+            stride = int(opts.get('stride', 2))
+            layer_channels.append(prev_channels * stride * stride)
+
+        elif name in ('shortcut', 'upsample', 'maxpool', 'yolo', 'region', 'dropout', 'avgpool'):
+            layer_channels.append(prev_channels)
+
+        else:
+            raise ValueError(f"Camada Darknet nao suportada para conversao: [{name}]")
+
+        fused_sections.append((name, options))
+
+    if offset != data.size:
+        raise ValueError(
+            f"Pesos restantes nao consumidos ({data.size - offset} floats); cfg e weights nao combinam"
+        )
+
+    return fused_sections, header, np.concatenate(fused_chunks)
+
+
+# ============================================
+# CACHE
+# ============================================
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+
+def _load_manifest(cache_dir):
+    path = _manifest_path(cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(cache_dir, manifest):
+    path = _manifest_path(cache_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _source_matches(entry, path):
+    """Compara origem com o manifesto (stat rápido, SHA-256 só se mudou)"""
+    if not os.path.exists(path):
+        return False, False
+    stat = os.stat(path)
+    if stat.st_size != entry['size']:
+        return False, False
+    if stat.st_mtime_ns == entry['mtime_ns']:
+        return True, False
+    # mtime mudou (cópia, touch): confirmar pelo conteúdo
+    if file_sha256(path) != entry['sha256']:
+        return False, False
+    entry['mtime_ns'] = stat.st_mtime_ns
+    return True, True
+
+
+def is_cache_valid(weights_path, config_path, cache_dir=CACHE_DIR):
+    """Retorna o manifesto se o cache corresponde aos arquivos de origem"""
+    manifest = _load_manifest(cache_dir)
+    if not manifest or manifest.get('format_version') != CACHE_FORMAT_VERSION:
+        return None
+
+    touched = False
+    for key, path in (('weights', weights_path), ('config', config_path)):
+        entry = manifest['sources'].get(key)
+        if entry is None:
+            return None
+        matches, changed = _source_matches(entry, path)
+        if not matches:
+            return None
+        touched = touched or changed
+
+    for filename in manifest['files'].values():
+        if not os.path.exists(os.path.join(cache_dir, filename)):
+            return None
+
+    if touched:
+        _save_manifest(cache_dir, manifest)
+    return manifest
+
+
+def convert_model(weights_path, config_path, cache_dir=CACHE_DIR):
+    """Converte o modelo Darknet para o cache otimizado"""
+    os.makedirs(cache_dir, exist_ok=True)
+
+    sources = {
+        'weights': _source_info(weights_path),
+        'config': _source_info(config_path)
+    }
+    key = hashlib.sha256(
+        (sources['weights']['sha256'] + sources['config']['sha256']).encode()
+    ).hexdigest()
+
+    sections, header, weights = fuse_darknet_model(config_path, weights_path)
+
+    base = f"{os.path.splitext(os.path.basename(weights_path))[0]}-{key[:16]}"
+    cfg_name = base + '.cfg'
+    weights_name = base + '.weights'
+
+    write_darknet_cfg(sections, os.path.join(cache_dir, cfg_name))
+    # Cabeçalho Darknet + float32: o OpenCV lê o arquivo sem cópia em Python
+    weights_file = os.path.join(cache_dir, weights_name)
+    with open(weights_file + '.tmp', 'wb') as f:
+        f.write(_header_bytes(*header))
+        weights.astype('<f4', copy=False).tofile(f)
+    os.replace(weights_file + '.tmp', weights_file)
+
+    manifest = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'key': key,
+        'header': list(header),
+        'sources': sources,
+        'files': {'config': cfg_name, 'weights': weights_name},
+        'created_at': datetime.now().isoformat()
+    }
+
+    # Remover conversões antigas
+    previous = _load_manifest(cache_dir)
+    _save_manifest(cache_dir, manifest)
+    if previous:
+        for filename in previous.get('files', {}).values():
+            if filename not in manifest['files'].values():
+                try:
+                    os.remove(os.path.join(cache_dir, filename))
+                except OSError:
+                    pass
+
+    logger.info(f"Modelo convertido para cache: {base}")
+    return manifest
+
+
+def _read_cached_net(manifest, cache_dir):
+    cfg_path = os.path.join(cache_dir, manifest['files']['config'])
+    weights_path = os.path.join(cache_dir, manifest['files']['weights'])
+
+    return cv2.dnn.readNetFromDarknet(cfg_path, weights_path)
+
+
+def load_yolo_net(weights_path, config_path, cache_dir=CACHE_DIR):
+    """
+    Carrega a rede YOLO usando o cache convertido quando válido,
+    caso contrário lê os arquivos Darknet originais.
+    """
+    try:
+        manifest = is_cache_valid(weights_path, config_path, cache_dir)
+        if manifest is not None:
+            net = _read_cached_net(manifest, cache_dir)
+            logger.info("Modelo carregado do cache")
+            return net
+        if os.path.exists(_manifest_path(cache_dir)):
+            logger.warning("Cache do modelo desatualizado; usando arquivos originais. "
+                           "Execute: python model_cache.py")
+    except Exception as e:
+        logger.warning(f"Falha ao carregar cache do modelo ({e}); usando arquivos originais")
+
+    return cv2.dnn.readNet(weights_path, config_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte o modelo YOLO para o cache otimizado")
+    parser.add_argument('--weights', default='models/yolov3.weights')
+    parser.add_argument('--config', default='models/yolov3.cfg')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    for path in (args.weights, args.config):
+        if not os.path.exists(path):
+            print(f"✗ Arquivo nao encontrado: {path}")
+            print("Execute: python download_models.py")
+            sys.exit(1)
+
+    if is_cache_valid(args.weights, args.config, args.cache_dir):
+        print("○ Cache do modelo ja esta atualizado")
+        return
+
+    print("Convertendo modelo YOLO (pode levar alguns segundos)...")
+    manifest = convert_model(args.weights, args.config, args.cache_dir)
+    print(f"✓ Cache gerado em {args.cache_dir} (chave {manifest['key'][:16]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Download de modelos com retomada, partes paralelas e verificação SHA-256
+
+O arquivo é baixado para `<destino>.part` usando requisições HTTP Range
+divididas em partes paralelas. O progresso de cada parte é salvo em
+`<destino>.part.json`, então um download interrompido continua de onde
+parou. O arquivo só é movido para o destino final depois que o SHA-256
+confere.
+
+Os checksums esperados ficam em `models/SHA256SUMS` (formato do
+`sha256sum`, versionado com os hashes dos arquivos de YOLO_FILES; o cfg e
+o names vêm de um commit fixo do darknet para que o hash não mude com o
+branch master). Sem checksum conhecido o download é recusado
+(ChecksumUnknownError): confiar no primeiro download registraria o hash de
+um arquivo adulterado como o correto. `allow_unverified=True` aceita o
+arquivo assim mesmo e registra o hash, com aviso, para verificar os
+próximos.
+"""
+
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHECKSUMS_FILE = os.path.join("models", "SHA256SUMS")
+
+DEFAULT_PARTS = 4
+CHUNK_SIZE = 256 * 1024
+# Intervalo (em bytes) entre gravações do estado de retomada
+STATE_SAVE_INTERVAL = 8 * 1024 * 1024
+MAX_RETRIES = 3
+
+DARKNET_COMMIT = 'f6afaabcdf85f77e7aff2ec55c020c0e297c77f9'
+YOLO_FILES = {
+    'yolov3.weights': 'https://pjreddie.com/media/files/yolov3.weights',
+    'yolov3.cfg': f'https://raw.githubusercontent.com/pjreddie/darknet/{DARKNET_COMMIT}/cfg/yolov3.cfg',
+    'coco.names': f'https://raw.githubusercontent.com/pjreddie/darknet/{DARKNET_COMMIT}/data/coco.names'
+}
+
+
+class ChecksumMismatchError(Exception):
+    """SHA-256 do arquivo baixado não confere com o esperado"""
+
+
+class ChecksumUnknownError(Exception):
+    """Nenhum SHA-256 conhecido para verificar o arquivo"""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Calcula o SHA-256 de um arquivo em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_checksums(path=CHECKSUMS_FILE):
+    """Lê um arquivo no formato `sha256sum` como {nome: hash}"""
+    checksums = {}
+    if not os.path.exists(path):
+        return checksums
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            digest, name = line.split(None, 1)
+            checksums[name.lstrip('*').strip()] = digest.lower()
+    return checksums
+
+
+def record_checksum(filename, digest, path=CHECKSUMS_FILE):
+    """Registra o hash de um arquivo no SHA256SUMS"""
+    checksums = load_checksums(path)
+    checksums[filename] = digest
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for name in sorted(checksums):
+            f.write(f"{checksums[name]}  {name}\n")
+    os.replace(tmp_path, path)
+
+
+def expected_checksum(filename, sha256=None, checksums_file=CHECKSUMS_FILE):
+    """Hash esperado: `sha256` ou o registrado em `checksums_file` (None se nenhum)"""
+    return (sha256 or load_checksums(checksums_file).get(filename) or '').lower() or None
+
+
+def _unknown_checksum(filename, checksums_file):
+    return ChecksumUnknownError(
+        f"{filename} sem SHA-256 conhecido: adicione '<sha256>  {filename}' em "
+        f"{checksums_file} ou aceite o arquivo sem verificação (allow_unverified)"
+    )
+
+
+def verify(dest, sha256=None, checksums_file=CHECKSUMS_FILE, allow_unverified=False):
+    """
+    Confere o SHA-256 de um arquivo já baixado.
+
+    Retorna True se confere (ou, com `allow_unverified`, se não há hash
+    conhecido) e False se não confere.
+    """
+    filename = os.path.basename(dest)
+    expected = expected_checksum(filename, sha256, checksums_file)
+    if expected is None:
+        if not allow_unverified:
+            raise _unknown_checksum(filename, checksums_file)
+        logger.warning(f"{filename} existente aceito sem verificação (sem checksum conhecido)")
+        return True
+    return file_sha256(dest) == expected
+
+
+def _open(url, headers=None, timeout=30):
+    request = urllib.request.Request(url, headers=headers or {})
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def probe(url, timeout=30):
+    """
+    Descobre tamanho e suporte a Range do servidor.
+
+    Retorna (tamanho ou None, aceita_range, validador) onde o validador
+    (ETag/Last-Modified) detecta se o arquivo remoto mudou entre retomadas.
+    """
+    try:
+        with _open(url, headers={'Range': 'bytes=0-0'}, timeout=timeout) as response:
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if response.status == 206:
+                content_range = response.headers.get('Content-Range', '')
+                total = content_range.rsplit('/', 1)[-1]
+                return (int(total) if total.isdigit() else None), True, validator
+            length = response.headers.get('Content-Length')
+            return (int(length) if length else None), False, validator
+    except urllib.error.HTTPError as e:
+        # 416 em arquivo vazio; demais erros sobem
+        if e.code == 416:
+            return 0, False, None
+        raise
+
+
+class _ResumeState:
+    """Estado de retomada persistido em <destino>.part.json"""
+
+    def __init__(self, path, url, size, validator, parts):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.validator = validator
+        self.parts = parts
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load_or_create(cls, path, url, size, validator, n_parts):
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if (data['url'] == url and data['size'] == size
+                        and data.get('validator') == validator):
+                    return cls(path, url, size, validator, data['parts'])
+            except (OSError, ValueError, KeyError):
+                pass
+            logger.info("Estado de download anterior incompatível; reiniciando")
+        return cls.create(path, url, size, validator, n_parts)
+
+    @classmethod
+    def create(cls, path, url, size, validator, n_parts):
+        part_size = -(-size // n_parts) if size else 0
+        parts = []
+        for i in range(n_parts):
+            start = i * part_size
+            end = min(size, start + part_size) - 1
+            if start <= end:
+                # [início, fim inclusivo, próximo byte a baixar]
+                parts.append([start, end, start])
+        return cls(path, url, size, validator, parts)
+
+    @property
+    def downloaded(self):
+        return sum(next_byte - start for start, _, next_byte in self.parts)
+
+    def advance(self, index, next_byte):
+        with self.lock:
+            self.parts[index][2] = next_byte
+
+    def save(self):
+        with self.lock:
+            data = {
+                'url': self.url,
+                'size': self.size,
+                'validator': self.validator,
+                'parts': [list(p) for p in self.parts]
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+
+def _download_part(url, part_path, state, index, timeout, progress):
+    start, end, next_byte = state.parts[index]
+    attempt = 0
+
+    while next_byte <= end:
+        before = next_byte
+        try:
+            headers = {'Range': f'bytes={next_byte}-{end}'}
+            with _open(url, headers=headers, timeout=timeout) as response, \
+                    open(part_path, 'r+b') as f:
+                if response.status != 206:
+                    raise IOError(f"Servidor ignorou Range (HTTP {response.status})")
+                f.seek(next_byte)
+                unsaved = 0
+                while next_byte <= end:
+                    chunk = response.read(min(CHUNK_SIZE, end - next_byte + 1))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    next_byte += len(chunk)
+                    unsaved += len(chunk)
+                    if progress:
+                        progress(len(chunk))
+                    if unsaved >= STATE_SAVE_INTERVAL:
+                        # Dados no disco antes do estado que os referencia
+                        f.flush()
+                        os.fsync(f.fileno())
+                        state.advance(index, next_byte)
+                        state.save()
+                        unsaved = 0
+                f.flush()
+                os.fsync(f.fileno())
+                state.advance(index, next_byte)
+            if next_byte == before:
+                raise IOError("Servidor encerrou a resposta sem enviar dados")
+            attempt = 0
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            state.advance(index, next_byte)
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                raise
+            logger.warning(f"Parte {index} falhou ({e}); tentativa {attempt}/{MAX_RETRIES}")
+            time.sleep(min(2 ** attempt, 10))
+
+
+def _download_single(url, part_path, timeout, progress):
+    """Download sequencial para servidores sem suporte a Range"""
+    with _open(url, timeout=timeout) as response, open(part_path, 'wb') as f:
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+            f.write(chunk)
+            if progress:
+                progress(len(chunk))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def download(url, dest, sha256=None, parts=DEFAULT_PARTS, timeout=30,
+             progress=None, checksums_file=CHECKSUMS_FILE, allow_unverified=False):
+    """
+    Baixa `url` para `dest` com retomada e verificação.
+
+    `sha256` tem prioridade sobre o hash registrado em `checksums_file`.
+    Sem nenhum dos dois levanta ChecksumUnknownError antes de baixar, a
+    menos que `allow_unverified` seja True (o hash obtido é registrado).
+    `progress(baixado, total)` é chamado conforme os bytes chegam.
+    Retorna o SHA-256 do arquivo final.
+    """
+    filename = os.path.basename(dest)
+    expected = expected_checksum(filename, sha256, checksums_file)
+    if expected is None and not allow_unverified:
+        raise _unknown_checksum(filename, checksums_file)
+
+    if os.path.exists(dest):
+        digest = file_sha256(dest)
+        if expected is None or digest == expected:
+            return digest
+        logger.warning(f"{filename} existente não confere com o checksum; baixando novamente")
+
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    part_path = dest + '.part'
+    state_path = part_path + '.json'
+
+    size, accepts_ranges, validator = probe(url, timeout=timeout)
+
+    counter_lock = threading.Lock()
+    downloaded = [0]
+
+    def report(n_bytes):
+        with counter_lock:
+            downloaded[0] += n_bytes
+            current = downloaded[0]
+        if progress:
+            progress(current, size)
+
+    if accepts_ranges and size:
+        state = _ResumeState.load_or_create(state_path, url, size, validator, max(1, parts))
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            # .part perdido ou truncado: o estado salvo não é confiável
+            state = _ResumeState.create(state_path, url, size, validator, max(1, parts))
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+        state.save()
+
+        downloaded[0] = state.downloaded
+        if downloaded[0]:
+            logger.info(f"Retomando {filename} a partir de {downloaded[0]} bytes")
+
+        pending = [i for i, (_, end, next_byte) in enumerate(state.parts) if next_byte <= end]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+                futures = [
+                    executor.submit(_download_part, url, part_path, state, i, timeout, report)
+                    for i in pending
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            state.save()
+    else:
+        _download_single(url, part_path, timeout, report)
+
+    digest = file_sha256(part_path)
+    if expected is not None and digest != expected:
+        os.remove(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        raise ChecksumMismatchError(
+            f"SHA-256 de {filename} não confere: esperado {expected}, obtido {digest}"
+        )
+
+    os.replace(part_path, dest)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    if expected is None:
+        logger.warning(f"{filename} aceito sem verificação; registrando {digest[:16]}... em {checksums_file}")
+        record_checksum(filename, digest, checksums_file)
+
+    return digest
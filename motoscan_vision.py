@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from model_cache import load_yolo_net
 
 def detect_motorcycle(image_path, weights_path='models/yolov3.weights', 
                      config_path='models/yolov3.cfg', 
@@ -8,7 +9,7 @@ def detect_motorcycle(image_path, weights_path='models/yolov3.weights',
     Detecta motocicletas em uma imagem usando YOLO
     """
     # Carregar YOLO
-    net = cv2.dnn.readNet(weights_path, config_path)
+    net = load_yolo_net(weights_path, config_path)
     
     # Carregar classes
     with open(names_path, 'r') as f:
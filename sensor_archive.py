@@ -0,0 +1,385 @@
+"""
+Arquivo colunar comprimido das leituras antigas de sensores
+
+Leituras com mais de `archive_after_days` dias saem do SQLite para
+segmentos por sensor e por dia:
+
+    <path>/<tabela>/<sensor>/<AAAA-MM-DD>/
+        segment.npz     dois arrays comprimidos com deflate (np.savez_compressed):
+          timestamps    deltas entre timestamps (µs / escala) no menor inteiro sem sinal
+          values        palavras de 64 bits separadas em planos de bytes; planos
+                        inteiramente zerados não são gravados
+        meta.json       primeiro timestamp, escala, codificação, planos mantidos, contagem
+
+As palavras dos valores dependem da codificação:
+    'decimal'  valores com até MAX_DECIMALS casas (as leituras do simulador e
+               da maioria dos sensores): inteiros escalados, delta do anterior
+               em zigzag. Variações pequenas só ocupam o plano de bytes baixo.
+    'xor'      demais valores: bits do float64 em XOR com o valor anterior.
+Os planos de bytes agrupam os bytes semelhantes antes do deflate; as duas
+codificações são sem perda (o float64 lido é idêntico ao gravado).
+
+O segmento é lido inteiro e decodificado na memória (deltas e XOR só têm
+sentido acumulados desde o início do dia), então não é aberto com mmap.
+Timestamps ficam no relógio da tabela de origem (UTC em sensor_data, hora
+local em readings e readings_wide). `query` combina os segmentos com as
+linhas ainda no SQLite a partir da marca `archived_until` de cada tabela.
+"""
+
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE = {
+    'enabled': True,
+    'path': 'archive',
+    'archive_after_days': 7,
+    'retention_days': 365
+}
+
+# Tabela de origem -> formato das linhas
+#   'columns': uma coluna por sensor (sensor_data, readings_wide)
+#   'rows':    (timestamp, sensor_type, value) (readings, formato antigo)
+ARCHIVE_SOURCES = {
+    'sensor_data': {
+        'layout': 'columns',
+        'clock': 'utc',
+        'sensors': ['temperature', 'humidity', 'motion', 'light_level', 'motorcycles_count']
+    },
+    'readings': {
+        'layout': 'rows',
+        'clock': 'local'
+    },
+    'readings_wide': {
+        'layout': 'columns',
+        'clock': 'local',
+        'sensors': ['temperature', 'humidity', 'light', 'motorcycles', 'motion']
+    }
+}
+
+_UNSIGNED = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+SEGMENT_FORMAT = 1
+# Maior número de casas decimais tentado na codificação 'decimal'
+MAX_DECIMALS = 6
+
+
+def to_datetime64(timestamps):
+    """Textos ISO/SQLite -> datetime64[us] (sem fuso, no relógio da tabela)"""
+    return np.array([value.replace(' ', 'T') for value in timestamps], dtype='datetime64[us]')
+
+
+def encode_timestamps(timestamps):
+    """datetime64[us] ordenado -> (deltas no menor uint, meta)"""
+    micros = timestamps.astype(np.int64)
+    deltas = np.diff(micros)
+    scale = int(np.gcd.reduce(deltas)) if deltas.size and deltas.any() else 1
+    deltas = deltas // scale
+    top = int(deltas.max()) if deltas.size else 0
+    dtype = next(t for t in _UNSIGNED if top <= np.iinfo(t).max)
+    meta = {'first': int(micros[0]), 'scale': scale}
+    return deltas.astype(dtype), meta
+
+
+def decode_timestamps(deltas, meta):
+    micros = np.empty(deltas.size + 1, dtype=np.int64)
+    micros[0] = 0
+    np.cumsum(deltas, dtype=np.int64, out=micros[1:])
+    micros = micros * meta['scale'] + meta['first']
+    return micros.astype('datetime64[us]')
+
+
+def _decimal_places(values):
+    """Menor número de casas que representa todos os valores sem perda (ou None)"""
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = values * 10.0 ** decimals
+        if not np.all(np.abs(scaled) < 2 ** 53):
+            return None
+        decoded = np.rint(scaled).astype(np.int64) / 10.0 ** decimals
+        if np.array_equal(decoded, values) and np.array_equal(np.signbit(decoded), np.signbit(values)):
+            return decimals
+    return None
+
+
+def encode_values(values):
+    """float64 -> (planos de bytes, meta com codificação e planos mantidos)"""
+    values = np.ascontiguousarray(values, dtype='<f8')
+    decimals = _decimal_places(values) if values.size else None
+    if decimals is not None:
+        scaled = np.rint(values * 10.0 ** decimals).astype(np.int64)
+        deltas = np.diff(scaled, prepend=np.int64(0))
+        # zigzag: deltas pequenos (positivos ou negativos) viram inteiros pequenos
+        words = ((deltas << 1) ^ (deltas >> 63)).view('<u8')
+        meta = {'encoding': 'decimal', 'decimals': decimals}
+    else:
+        bits = values.view('<u8')
+        words = bits.copy()
+        words[1:] ^= bits[:-1]
+        meta = {'encoding': 'xor'}
+    planes = words.view(np.uint8).reshape(-1, 8)
+    meta['planes'] = [j for j in range(8) if planes[:, j].any()]
+    return np.ascontiguousarray(planes[:, meta['planes']].T), meta
+
+
+def decode_values(planes, meta, count):
+    full = np.zeros((count, 8), dtype=np.uint8)
+    if meta['planes']:
+        full[:, meta['planes']] = np.asarray(planes).T
+    words = full.view('<u8').ravel()
+    if meta['encoding'] == 'decimal':
+        deltas = (words >> np.uint64(1)).view(np.int64) ^ -(words & np.uint64(1)).view(np.int64)
+        return np.cumsum(deltas).astype(np.float64) / 10.0 ** meta['decimals']
+    return np.bitwise_xor.accumulate(words).view('<f8')
+
+
+class SensorArchive:
+    """Segmentos colunares por sensor/dia e consulta combinada com o SQLite"""
+
+    def __init__(self, path='archive', archive_after_days=7, retention_days=365):
+        self.path = path
+        self.archive_after_days = archive_after_days
+        self.retention_days = retention_days
+
+    # --- segmentos -------------------------------------------------------
+
+    def _segment_dir(self, table, sensor, day):
+        return os.path.join(self.path, table, sensor, day)
+
+    def write_segment(self, table, sensor, day, timestamps, values):
+        """Grava (ou mescla com) o segmento de um dia de forma atômica"""
+        segment_dir = self._segment_dir(table, sensor, day)
+        if os.path.isdir(segment_dir):
+            old_ts, old_values = self.read_segment(table, sensor, day)
+            timestamps = np.concatenate([old_ts, timestamps])
+            values = np.concatenate([old_values, values])
+
+        # Ordena e descarta pares repetidos (reexecução após falha antes do DELETE)
+        records = np.empty(timestamps.size, dtype=[('t', '<i8'), ('v', '<u8')])
+        records['t'] = timestamps.astype(np.int64)
+        records['v'] = np.asarray(values, dtype='<f8').view('<u8')
+        records = np.unique(records)
+        timestamps = records['t'].astype('datetime64[us]')
+        values = records['v'].view('<f8')
+
+        deltas, meta = encode_timestamps(timestamps)
+        planes, value_meta = encode_values(values)
+        meta.update(value_meta)
+        meta.update({'format': SEGMENT_FORMAT, 'count': int(values.size),
+                     'clock': ARCHIVE_SOURCES[table]['clock']})
+
+        tmp_dir = segment_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.savez_compressed(os.path.join(tmp_dir, 'segment.npz'), timestamps=deltas, values=planes)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        old_dir = segment_dir + '.old'
+        if os.path.isdir(segment_dir):
+            os.replace(segment_dir, old_dir)
+        os.replace(tmp_dir, segment_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return meta
+
+    def read_segment(self, table, sensor, day):
+        """(timestamps datetime64[us], valores float64) de um segmento"""
+        segment_dir = self._segment_dir(table, sensor, day)
+        with open(os.path.join(segment_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        with np.load(os.path.join(segment_dir, 'segment.npz')) as segment:
+            deltas, planes = segment['timestamps'], segment['values']
+        return decode_timestamps(deltas, meta), decode_values(planes, meta, meta['count'])
+
+    def days(self, table, sensor):
+        sensor_dir = os.path.join(self.path, table, sensor)
+        if not os.path.isdir(sensor_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(sensor_dir)
+            if len(name) == 10 and os.path.isdir(os.path.join(sensor_dir, name))
+        )
+
+    def sensors(self, table):
+        table_dir = os.path.join(self.path, table)
+        if not os.path.isdir(table_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(table_dir)
+            if os.path.isdir(os.path.join(table_dir, name))
+        )
+
+    # --- marca d'água ----------------------------------------------------
+
+    def _state_path(self, table):
+        return os.path.join(self.path, table, 'state.json')
+
+    def archived_until(self, table):
+        """Início do primeiro dia ainda no SQLite ('' se nada foi arquivado)"""
+        try:
+            with open(self._state_path(table)) as f:
+                return json.load(f).get('archived_until', '')
+        except (OSError, ValueError):
+            return ''
+
+    def _set_archived_until(self, table, day):
+        os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        tmp_path = self._state_path(table) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'archived_until': day}, f)
+        os.replace(tmp_path, self._state_path(table))
+
+    # --- arquivamento ----------------------------------------------------
+
+    def _cutoff_day(self, table):
+        if ARCHIVE_SOURCES[table]['clock'] == 'utc':
+            now = datetime.now(timezone.utc)
+        else:
+            now = datetime.now()
+        return (now - timedelta(days=self.archive_after_days)).strftime('%Y-%m-%d')
+
+    def _table_exists(self, conn, table):
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def archive(self, conn, delete_chunked):
+        """
+        Move dias completos anteriores ao corte para segmentos e remove as
+        linhas com `delete_chunked(conn, table, condition, params)`.
+        Retorna {tabela: linhas arquivadas}.
+        """
+        archived = {}
+        for table in ARCHIVE_SOURCES:
+            if not self._table_exists(conn, table):
+                continue
+            cutoff_day = self._cutoff_day(table)
+            days = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT substr(timestamp, 1, 10) FROM {table} "
+                f"WHERE timestamp < ? ORDER BY 1", (cutoff_day,)
+            )]
+            total = 0
+            for day in days:
+                next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+                total += self._archive_day(conn, table, day, next_day)
+                # A marca avança antes do DELETE: consultas já leem o dia do arquivo
+                self._set_archived_until(table, max(next_day, self.archived_until(table)))
+                delete_chunked(conn, table, 'timestamp >= ? AND timestamp < ?', (day, next_day))
+            if cutoff_day > self.archived_until(table):
+                self._set_archived_until(table, cutoff_day)
+            archived[table] = total
+        return archived
+
+    def _archive_day(self, conn, table, day, next_day):
+        source = ARCHIVE_SOURCES[table]
+        if source['layout'] == 'columns':
+            columns = ', '.join(source['sensors'])
+            rows = conn.execute(
+                f"SELECT timestamp, {columns} FROM {table} "
+                f"WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp", (day, next_day)
+            ).fetchall()
+            if not rows:
+                return 0
+            timestamps = to_datetime64([row[0] for row in rows])
+            for i, sensor in enumerate(source['sensors'], start=1):
+                values = np.array([row[i] for row in rows], dtype=np.float64)
+                valid = ~np.isnan(values)
+                if valid.any():
+                    self.write_segment(table, sensor, day, timestamps[valid], values[valid])
+            return len(rows)
+
+        rows = conn.execute(
+            f"SELECT timestamp, sensor_type, value FROM {table} "
+            f"WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp", (day, next_day)
+        ).fetchall()
+        by_sensor = {}
+        for timestamp, sensor, value in rows:
+            if value is not None:
+                by_sensor.setdefault(sensor, ([], []))
+                by_sensor[sensor][0].append(timestamp)
+                by_sensor[sensor][1].append(value)
+        for sensor, (timestamps, values) in by_sensor.items():
+            self.write_segment(table, sensor, day, to_datetime64(timestamps),
+                               np.array(values, dtype=np.float64))
+        return len(rows)
+
+    def prune(self):
+        """Remove segmentos com mais de `retention_days` dias"""
+        if not self.retention_days:
+            return 0
+        limit = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        removed = 0
+        for table in ARCHIVE_SOURCES:
+            for sensor in self.sensors(table):
+                for day in self.days(table, sensor):
+                    if day < limit:
+                        shutil.rmtree(self._segment_dir(table, sensor, day), ignore_errors=True)
+                        removed += 1
+        return removed
+
+    # --- consulta --------------------------------------------------------
+
+    @staticmethod
+    def format_timestamp(table, value):
+        """datetime/texto ISO -> texto no formato gravado pela tabela (comparável)"""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace(' ', 'T'))
+        if ARCHIVE_SOURCES[table]['clock'] == 'utc':
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value.isoformat()
+
+    def query(self, conn, table, sensor, start, end):
+        """
+        Leituras de `sensor` em [start, end) (datetime ou texto ISO no
+        relógio da tabela), unindo o arquivo e as linhas ainda no SQLite.
+        Retorna (timestamps datetime64[us], valores float64).
+        """
+        start, end = self.format_timestamp(table, start), self.format_timestamp(table, end)
+        start64 = to_datetime64([start])[0]
+        end64 = to_datetime64([end])[0]
+        watermark = self.archived_until(table)
+
+        parts_ts, parts_values = [], []
+        for day in self.days(table, sensor):
+            if day < start[:10] or day > end[:10]:
+                continue
+            timestamps, values = self.read_segment(table, sensor, day)
+            mask = (timestamps >= start64) & (timestamps < end64)
+            parts_ts.append(timestamps[mask])
+            parts_values.append(values[mask])
+
+        live_start = max(start, watermark) if watermark else start
+        if conn is not None and live_start < end and self._table_exists(conn, table):
+            if ARCHIVE_SOURCES[table]['layout'] == 'columns':
+                if sensor not in ARCHIVE_SOURCES[table]['sensors']:
+                    raise ValueError(f"Sensor desconhecido: {sensor}")
+                rows = conn.execute(
+                    f"SELECT timestamp, {sensor} FROM {table} WHERE timestamp >= ? AND timestamp < ? "
+                    f"AND {sensor} IS NOT NULL ORDER BY timestamp", (live_start, end)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT timestamp, value FROM {table} WHERE sensor_type = ? AND timestamp >= ? "
+                    f"AND timestamp < ? AND value IS NOT NULL ORDER BY timestamp", (sensor, live_start, end)
+                ).fetchall()
+            if rows:
+                parts_ts.append(to_datetime64([row[0] for row in rows]))
+                parts_values.append(np.array([row[1] for row in rows], dtype=np.float64))
+
+        if not parts_ts:
+            return np.array([], dtype='datetime64[us]'), np.array([], dtype=np.float64)
+        timestamps = np.concatenate(parts_ts)
+        values = np.concatenate(parts_values)
+        order = np.argsort(timestamps, kind='stable')
+        return timestamps[order], values[order]
+
+    def disk_usage(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
@@ -0,0 +1,70 @@
+"""
+Buffer circular das leituras recentes de sensores
+
+Array estruturado do NumPy de capacidade fixa, preenchido a partir do
+SQLite na inicialização e alimentado pela thread de sensores. Serve o
+histórico recente do dashboard direto da memória; um lock curto protege
+escrita e cópia, então threads do Flask leem com segurança.
+"""
+
+import threading
+
+import numpy as np
+
+SENSOR_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[s]'),
+    ('temperature', 'f8'),
+    ('humidity', 'f8'),
+    ('motion', 'i1'),
+    ('light_level', 'f8'),
+    ('motorcycles_count', 'i4')
+])
+
+
+class SensorRingBuffer:
+    """Últimas `capacity` leituras de sensor_data (mais antigas são sobrescritas)"""
+
+    def __init__(self, capacity=3600, dtype=SENSOR_DTYPE):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        """Acrescenta uma tupla na ordem dos campos do dtype (timestamp em texto ISO/SQLite)"""
+        with self._lock:
+            self._data[self._head] = row
+            self._head = (self._head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def fill_from_db(self, conn, table='sensor_data'):
+        """Carrega as leituras mais recentes do banco (chamado na inicialização)"""
+        fields = ', '.join(self._data.dtype.names)
+        rows = conn.execute(
+            f"SELECT {fields} FROM {table} ORDER BY timestamp DESC LIMIT ?", (self.capacity,)
+        ).fetchall()
+        for row in reversed(rows):
+            self.append(tuple(0 if value is None else value for value in row))
+        return len(rows)
+
+    def latest(self, n):
+        """Cópia das `n` leituras mais recentes, da mais nova para a mais antiga"""
+        with self._lock:
+            n = min(max(0, int(n)), self._size)
+            indexes = (self._head - 1 - np.arange(n)) % self.capacity
+            return self._data[indexes]
+
+    def latest_dicts(self, n):
+        """Mesmo formato de /api/history (timestamp 'AAAA-MM-DD HH:MM:SS')"""
+        records = self.latest(n)
+        timestamps = np.datetime_as_string(records['timestamp'], unit='s')
+        fields = [name for name in records.dtype.names if name != 'timestamp']
+        columns = {name: records[name].tolist() for name in fields}
+        return [
+            {'timestamp': timestamps[i].replace('T', ' '), **{name: columns[name][i] for name in fields}}
+            for i in range(len(records))
+        ]
@@ -0,0 +1,217 @@
+"""
+Agregados de sensores por intervalo de tempo (minuto, hora, dia)
+
+As tabelas `sensor_rollup_<nível>` guardam, por bucket (epoch UTC do
+início do intervalo), o total de linhas e, de cada sensor e da contagem de
+motos, min/max/soma e quantas leituras não nulas entraram na soma (a média
+divide por essa contagem, não pelo total de linhas). São atualizadas
+incrementalmente com UPSERT na mesma transação em que o SQLiteBatchWriter
+grava `sensor_data`, então consultas de um dia ou de um mês leem no máximo
+algumas centenas de linhas.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Nível -> tamanho do bucket em segundos (do mais fino ao mais grosso)
+ROLLUP_LEVELS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+ROLLUP_METRICS = ['temperature', 'humidity', 'motion', 'light_level', 'motorcycles_count']
+
+# Teto de pontos por consulta com resolução explícita (um dia por minuto)
+MAX_POINTS = 1440
+
+
+def parse_sqlite_timestamp(value):
+    """'YYYY-MM-DD HH:MM:SS' (UTC) -> epoch em segundos"""
+    moment = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+
+def parse_time_param(value):
+    """Epoch (segundos) ou ISO 8601; sem fuso é tratado como UTC"""
+    if value is None or value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def parse_resolution(value):
+    """Segundos ou nome do nível ('minute', 'hour', 'day')"""
+    if value is None or value == '':
+        return None
+    if value in ROLLUP_LEVELS:
+        return ROLLUP_LEVELS[value]
+    return max(1, int(value))
+
+
+class SensorRollups:
+    """Mantém e consulta os agregados de `sensor_data`"""
+
+    def __init__(self, columns, source_table='sensor_data'):
+        # Ordem das colunas nas tuplas recebidas do escritor
+        self.source_table = source_table
+        self.timestamp_index = columns.index('timestamp')
+        self.metric_indexes = [(metric, columns.index(metric)) for metric in ROLLUP_METRICS]
+
+        stats = []
+        for metric in ROLLUP_METRICS:
+            stats += [f'{metric}_min', f'{metric}_max', f'{metric}_sum', f'{metric}_count']
+        self._stat_columns = stats
+
+        updates = ['count = count + excluded.count']
+        for metric in ROLLUP_METRICS:
+            updates += [
+                f'{metric}_min = min(coalesce({metric}_min, excluded.{metric}_min), '
+                f'coalesce(excluded.{metric}_min, {metric}_min))',
+                f'{metric}_max = max(coalesce({metric}_max, excluded.{metric}_max), '
+                f'coalesce(excluded.{metric}_max, {metric}_max))',
+                f'{metric}_sum = coalesce({metric}_sum, 0) + coalesce(excluded.{metric}_sum, 0)',
+                f'{metric}_count = {metric}_count + excluded.{metric}_count'
+            ]
+        columns_sql = ', '.join(['bucket', 'count'] + stats)
+        placeholders = ', '.join('?' for _ in range(len(stats) + 2))
+        self._upserts = {
+            level: (
+                f"INSERT INTO sensor_rollup_{level} ({columns_sql}) VALUES ({placeholders}) "
+                f"ON CONFLICT(bucket) DO UPDATE SET {', '.join(updates)}"
+            )
+            for level in ROLLUP_LEVELS
+        }
+
+    @staticmethod
+    def table(level):
+        return f'sensor_rollup_{level}'
+
+    def ensure_schema(self, conn):
+        """Cria as tabelas; se estiverem vazias, recalcula a partir de sensor_data"""
+        stat_sql = ',\n                    '.join(
+            f'{column} INTEGER NOT NULL DEFAULT 0' if column.endswith('_count') else f'{column} REAL'
+            for column in self._stat_columns
+        )
+        for level in ROLLUP_LEVELS:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.table(level)} (
+                    bucket INTEGER PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    {stat_sql}
+                )
+            ''')
+        conn.commit()
+
+        empty = conn.execute(f"SELECT 1 FROM {self.table('minute')} LIMIT 1").fetchone() is None
+        if empty:
+            self.rebuild(conn)
+
+    def rebuild(self, conn):
+        """Recalcula todos os níveis a partir das linhas em sensor_data"""
+        for level, size in ROLLUP_LEVELS.items():
+            aggregates = []
+            for metric in ROLLUP_METRICS:
+                aggregates += [f'MIN({metric})', f'MAX({metric})', f'SUM({metric})', f'COUNT({metric})']
+            conn.execute(f"DELETE FROM {self.table(level)}")
+            conn.execute(f'''
+                INSERT INTO {self.table(level)} (bucket, count, {', '.join(self._stat_columns)})
+                SELECT (CAST(strftime('%s', timestamp) AS INTEGER) / {size}) * {size} AS bucket,
+                       COUNT(*), {', '.join(aggregates)}
+                FROM {self.source_table}
+                WHERE timestamp IS NOT NULL
+                GROUP BY bucket
+            ''')
+        conn.commit()
+
+    def update(self, conn, rows):
+        """Hook do SQLiteBatchWriter: agrega o lote em memória e faz UPSERT por bucket"""
+        epochs = [parse_sqlite_timestamp(row[self.timestamp_index]) for row in rows]
+        for level, size in ROLLUP_LEVELS.items():
+            buckets = {}
+            for epoch, row in zip(epochs, rows):
+                bucket = epoch - epoch % size
+                acc = buckets.get(bucket)
+                if acc is None:
+                    acc = buckets[bucket] = [0] + [None, None, None, 0] * len(self.metric_indexes)
+                acc[0] += 1
+                for i, (_, index) in enumerate(self.metric_indexes):
+                    value = row[index]
+                    if value is None:
+                        continue
+                    value = float(value)
+                    base = 1 + i * 4
+                    acc[base] = value if acc[base] is None else min(acc[base], value)
+                    acc[base + 1] = value if acc[base + 1] is None else max(acc[base + 1], value)
+                    acc[base + 2] = value if acc[base + 2] is None else acc[base + 2] + value
+                    acc[base + 3] += 1
+            conn.executemany(
+                self._upserts[level],
+                [(bucket, *acc) for bucket, acc in buckets.items()]
+            )
+
+    @staticmethod
+    def pick_level(resolution):
+        """Nível mais grosso cujo bucket divide a resolução (já normalizada)"""
+        chosen = 'minute'
+        for level, size in ROLLUP_LEVELS.items():
+            if size <= resolution and resolution % size == 0:
+                chosen = level
+        return chosen
+
+    @staticmethod
+    def default_resolution(start, end, max_points):
+        """Menor resolução (múltipla de um nível) com até `max_points` pontos"""
+        needed = -(-max(1, end - start) // max(1, max_points))
+        base = ROLLUP_LEVELS['minute']
+        for size in ROLLUP_LEVELS.values():
+            if size <= needed:
+                base = size
+        return base * max(1, -(-needed // base))
+
+    @classmethod
+    def normalize_resolution(cls, start, end, resolution, max_points=MAX_POINTS):
+        """
+        Arredonda a resolução para o múltiplo mais próximo do maior bucket que
+        cabe nela e a aumenta até caber em `max_points` pontos: toda consulta
+        lê um nível de agregados, com custo proporcional ao número de pontos.
+        """
+        size = max([s for s in ROLLUP_LEVELS.values() if s <= resolution], default=ROLLUP_LEVELS['minute'])
+        resolution = size * max(1, round(resolution / size))
+        return max(resolution, cls.default_resolution(start, end, max_points))
+
+    def query(self, conn, start, end, resolution, max_points=MAX_POINTS):
+        """Série agregada em [start, end) re-agrupada em buckets de `resolution` segundos"""
+        resolution = self.normalize_resolution(start, end, resolution, max_points)
+        level = self.pick_level(resolution)
+        source = self.table(level)
+        aggregates = []
+        for metric in ROLLUP_METRICS:
+            aggregates += [f'MIN({metric}_min)', f'MAX({metric}_max)', f'SUM({metric}_sum)',
+                           f'SUM({metric}_count)']
+
+        rows = conn.execute(f'''
+            SELECT (bucket / {resolution}) * {resolution} AS slot, SUM(count), {', '.join(aggregates)}
+            FROM {source}
+            WHERE bucket >= ? AND bucket < ?
+            GROUP BY slot
+            ORDER BY slot
+        ''', (start - start % ROLLUP_LEVELS[level], end)).fetchall()
+
+        series = []
+        for row in rows:
+            point = {
+                'timestamp': datetime.fromtimestamp(row[0], timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                'count': row[1]
+            }
+            for i, metric in enumerate(ROLLUP_METRICS):
+                low, high, total, count = row[2 + i * 4: 6 + i * 4]
+                point[metric] = {
+                    'min': low,
+                    'max': high,
+                    'avg': round(total / count, 3) if total is not None and count else None
+                }
+            series.append(point)
+        return {'source': source, 'resolution': resolution, 'series': series}
@@ -0,0 +1,180 @@
+"""
+Armazenamento em linha larga do SimpleIoTSystem
+
+Em vez de uma linha de `readings` por sensor a cada ciclo (timestamp
+repetido e um índice atualizado por sensor), cada ciclo vira uma única
+linha tipada em `readings_wide`.
+
+Modos:
+    'wide'    - uma linha e um commit por ciclo
+    'batched' - ciclos acumulados em memória e gravados em lote a cada
+                `flush_interval_s` ou `batch_size` ciclos. Cada ciclo é
+                anexado antes a um journal (JSON por linha); na abertura o
+                journal é reaplicado com INSERT OR IGNORE (timestamp único),
+                então uma queda não perde nem duplica leituras.
+"""
+
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMPLE_STORAGE = {
+    'mode': 'batched',
+    'batch_size': 100,
+    'flush_interval_s': 30,
+    'journal_path': 'simple_iot.journal',
+    'fsync': False
+}
+
+WIDE_COLUMNS = ['timestamp', 'temperature', 'humidity', 'light', 'motorcycles', 'motion']
+
+# sensor_type da tabela antiga -> coluna em readings_wide
+LEGACY_SENSOR_COLUMNS = {
+    'temperature': 'temperature',
+    'humidity': 'humidity',
+    'light': 'light',
+    'motorcycles': 'motorcycles'
+}
+
+
+def create_wide_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS readings_wide (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            temperature REAL,
+            humidity REAL,
+            light REAL,
+            motorcycles INTEGER,
+            motion INTEGER
+        )
+    ''')
+    # Único: torna a reaplicação do journal idempotente e serve ORDER BY timestamp
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_readings_wide_timestamp ON readings_wide(timestamp)')
+    conn.commit()
+
+
+def migrate_readings(conn):
+    """Converte a tabela `readings` (uma linha por sensor) para `readings_wide` e a remove"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'readings'"
+    ).fetchone()
+    if not exists:
+        return 0
+
+    create_wide_table(conn)
+    pivots = ', '.join(
+        f"MAX(CASE WHEN sensor_type = '{sensor}' THEN value END)"
+        for sensor in LEGACY_SENSOR_COLUMNS
+    )
+    with conn:
+        cursor = conn.execute(f'''
+            INSERT OR IGNORE INTO readings_wide (timestamp, {', '.join(LEGACY_SENSOR_COLUMNS.values())})
+            SELECT timestamp, {pivots}
+            FROM readings
+            GROUP BY timestamp
+        ''')
+        migrated = cursor.rowcount
+        conn.execute('DROP TABLE readings')
+    logger.info(f"Migradas {migrated} leituras de readings para readings_wide")
+    return migrated
+
+
+def wide_row(timestamp, sensors):
+    """Dicionário de sensores do SimpleIoTSystem -> tupla na ordem de WIDE_COLUMNS"""
+    return (
+        timestamp,
+        float(sensors['temperature']),
+        float(sensors['humidity']),
+        float(sensors['light']),
+        int(sensors['motorcycles']),
+        int(bool(sensors['motion']))
+    )
+
+
+class WideRowStore:
+    """Grava uma linha por ciclo em readings_wide, direto ou em lotes com journal"""
+
+    def __init__(self, conn, mode='batched', batch_size=100, flush_interval_s=30,
+                 journal_path='simple_iot.journal', fsync=False):
+        if mode not in ('wide', 'batched'):
+            raise ValueError("mode deve ser 'wide' ou 'batched'")
+        self.conn = conn
+        self.mode = mode
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_s))
+        self.journal_path = journal_path
+        self.fsync = fsync
+
+        placeholders = ', '.join('?' for _ in WIDE_COLUMNS)
+        self._insert = (
+            f"INSERT OR IGNORE INTO readings_wide ({', '.join(WIDE_COLUMNS)}) VALUES ({placeholders})"
+        )
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._journal = None
+
+        create_wide_table(conn)
+        if mode == 'batched':
+            self._replay_journal()
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _replay_journal(self):
+        """Reaplica ciclos do journal que não chegaram ao banco antes de uma queda"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        rows = []
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rows.append(tuple(json.loads(line)))
+                except ValueError:
+                    # Última linha truncada pela queda
+                    break
+        if rows:
+            with self.conn:
+                self.conn.executemany(self._insert, rows)
+            logger.info(f"Reaplicados {len(rows)} ciclos do journal {self.journal_path}")
+        os.remove(self.journal_path)
+        return len(rows)
+
+    def write(self, row):
+        """Registra um ciclo (tupla de wide_row)"""
+        if self.mode == 'wide':
+            with self.conn:
+                self.conn.execute(self._insert, row)
+            return
+
+        self._journal.write(json.dumps(row) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending.append(row)
+
+        if (len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Grava os ciclos pendentes em uma transação e esvazia o journal"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return 0
+        with self.conn:
+            self.conn.executemany(self._insert, self._pending)
+        count = len(self._pending)
+        self._pending = []
+        if self._journal is not None:
+            self._journal.truncate(0)
+            self._journal.seek(0)
+        return count
+
+    def close(self):
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            os.remove(self.journal_path)
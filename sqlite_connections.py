@@ -0,0 +1,112 @@
+"""
+Gerenciador de conexões SQLite por thread
+
+Ativa o modo WAL e pragmas ajustados e entrega a cada thread a sua própria
+conexão, em vez de uma conexão compartilhada com check_same_thread=False.
+Consultas do dashboard usam conexões somente leitura: no modo WAL leitores
+não bloqueiam o escritor e o escritor não bloqueia leitores.
+
+Servidores com uma thread por requisição (Flask threaded) criam threads
+sem parar: as conexões de threads já encerradas são fechadas quando uma
+nova conexão é aberta, então o total fica limitado às threads vivas.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -16000,       # ~16 MB por conexão
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,     # 256 MB
+    'foreign_keys': 'ON'
+}
+
+
+class SQLiteConnectionManager:
+    """Uma conexão de escrita e uma de leitura por thread, em modo WAL"""
+
+    def __init__(self, db_path, pragmas=None, wal_autocheckpoint=1000):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        self.pragmas.update(pragmas or {})
+        self.wal_autocheckpoint = wal_autocheckpoint
+
+        self._local = threading.local()
+        self._connections = {}      # thread dona -> conexões abertas por ela
+        self._lock = threading.Lock()
+
+        self._enable_wal()
+
+    def _enable_wal(self):
+        # journal_mode=WAL é persistente no arquivo; basta ativar uma vez
+        conn = sqlite3.connect(self.db_path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"Nao foi possivel ativar WAL em {self.db_path} (modo: {mode})")
+        finally:
+            conn.close()
+
+    def _apply_pragmas(self, conn, readonly):
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn.execute(f"PRAGMA wal_autocheckpoint={self.wal_autocheckpoint}")
+
+    def _open(self, readonly):
+        # Cada conexão é usada só pela thread dona; check_same_thread=False
+        # apenas permite fechá-la de outra thread (threads encerradas, close_all)
+        self.prune()
+        if readonly:
+            uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._apply_pragmas(conn, readonly)
+        with self._lock:
+            self._connections.setdefault(threading.current_thread(), []).append(conn)
+        return conn
+
+    def prune(self):
+        """Fecha as conexões de threads que já terminaram; retorna quantas"""
+        with self._lock:
+            mortas = [t for t in self._connections if not t.is_alive()]
+            connections = [conn for t in mortas for conn in self._connections.pop(t)]
+        for conn in connections:
+            conn.close()
+        return len(connections)
+
+    def open_connections(self):
+        with self._lock:
+            return sum(len(conns) for conns in self._connections.values())
+
+    def writer(self):
+        """Conexão de leitura/escrita da thread atual"""
+        conn = getattr(self._local, 'writer', None)
+        if conn is None:
+            conn = self._local.writer = self._open(readonly=False)
+        return conn
+
+    def reader(self):
+        """Conexão somente leitura da thread atual (dashboard, APIs)"""
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = self._local.reader = self._open(readonly=True)
+        return conn
+
+    def close_all(self):
+        """Fecha as conexões abertas por todas as threads"""
+        with self._lock:
+            connections = [conn for conns in self._connections.values() for conn in conns]
+            self._connections = {}
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -0,0 +1,306 @@
+"""
+Manutenção periódica dos bancos SQLite
+
+Um agendador em segundo plano aplica `database.retention_policy`
+(remoção em pequenos lotes, com pausa entre eles, para não travar a thread
+de escrita), roda `PRAGMA incremental_vacuum` conforme
+`database.optimization` e cria os índices listados em `database.tables`.
+
+Os nomes de `config.json` são lógicos; TABLE_TARGETS os liga às tabelas
+físicas de cada banco (iot_motorcycle_data.db, simple_iot.db). Tabelas ou
+colunas que não existem no banco aberto são ignoradas.
+
+O vacuum incremental exige auto_vacuum=INCREMENTAL no arquivo. Bancos novos
+já são criados assim (enable_incremental_vacuum). Um banco existente
+precisa de um VACUUM completo, que bloqueia as escritas enquanto reescreve
+o arquivo; por isso o agendador não converte: a conversão é um comando
+avulso, com a aplicação parada:
+
+    python sqlite_maintenance.py iot_motorcycle_data.db simple_iot.db
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAINTENANCE = {
+    'interval_minutes': 60,
+    'chunk_size': 500,
+    'chunk_pause_ms': 20,
+    'incremental_vacuum_pages': 2000
+}
+
+# Tabela lógica -> chave em retention_policy
+RETENTION_KEYS = {
+    'sensor_readings': 'sensor_readings_days',
+    'motorcycle_detections': 'detections_days',
+    'system_events': 'system_events_days'
+}
+
+# Tabela lógica -> tabelas físicas: (tabela, coluna de tempo, fuso do timestamp)
+# 'utc' = CURRENT_TIMESTAMP/sqlite_timestamp(); 'local' = datetime.now().isoformat()
+TABLE_TARGETS = {
+    'sensor_readings': [
+        ('sensor_data', 'timestamp', 'utc'),
+        ('readings', 'timestamp', 'local'),
+        ('readings_wide', 'timestamp', 'local')
+    ],
+    'motorcycle_detections': [
+        ('motorcycle_detections', 'timestamp', 'utc')
+    ]
+}
+
+# Nome de coluna em config.json -> nome usado nas tabelas físicas
+COLUMN_ALIASES = {
+    'detection_timestamp': 'timestamp',
+    'confidence_score': 'confidence'
+}
+
+
+def enable_incremental_vacuum(conn):
+    """
+    Ativa auto_vacuum=INCREMENTAL em um banco ainda sem tabelas (o VACUUM
+    de um arquivo vazio é imediato). Retorna True se o modo está ativo.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        if conn.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0:
+            conn.commit()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def convert_to_incremental(db_path):
+    """
+    Converte um banco existente para auto_vacuum=INCREMENTAL com um VACUUM
+    completo (uma única vez, com a aplicação parada). Retorna False se já
+    estava convertido.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+def retention_cutoff(days, clock, now=None):
+    """Limite de retenção no mesmo formato texto gravado pela tabela"""
+    if clock == 'utc':
+        now = now or datetime.now(timezone.utc)
+        return (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).isoformat()
+
+
+class MaintenanceScheduler:
+    """Retenção em lotes, vacuum incremental e índices de um banco SQLite"""
+
+    def __init__(self, db_path, database_config, connection_factory=None,
+                 interval_minutes=60, chunk_size=500, chunk_pause_ms=20,
+                 incremental_vacuum_pages=2000, archive=None):
+        self.db_path = db_path
+        self.retention_policy = database_config.get('retention_policy', {})
+        self.optimization = database_config.get('optimization', {})
+        self.tables = database_config.get('tables', {})
+        self.connection_factory = connection_factory
+        # SensorArchive opcional: dias antigos vão para o arquivo antes da retenção
+        self.archive = archive
+
+        self.interval = max(1.0, interval_minutes * 60.0)
+        self.chunk_size = max(1, int(chunk_size))
+        self.chunk_pause = max(0.0, chunk_pause_ms / 1000.0)
+        self.incremental_vacuum_pages = max(1, int(incremental_vacuum_pages))
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_vacuum = 0.0
+        self._vacuum_warned = False
+        self._indexes_checked = False
+
+        self._metrics_lock = threading.Lock()
+        self._runs = 0
+        self._deleted = {}
+        self._archived = {}
+        self._pages_freed = 0
+        self._last_run = None
+        self._last_run_ms = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sqlite-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _connect(self):
+        if self.connection_factory is not None:
+            return self.connection_factory()
+        return sqlite3.connect(self.db_path)
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once(conn)
+                except sqlite3.Error as e:
+                    logger.error(f"Erro na manutencao de {self.db_path}: {e}")
+                self._stop.wait(self.interval)
+        finally:
+            if self.connection_factory is None:
+                conn.close()
+
+    def run_once(self, conn):
+        """Executa um ciclo completo de manutenção na conexão informada"""
+        start = time.perf_counter()
+        if not self._indexes_checked:
+            if self.optimization.get('index_optimization', True):
+                self.ensure_indexes(conn)
+            self._indexes_checked = True
+
+        archived = {}
+        if self.archive is not None:
+            archived = self.archive.archive(conn, self.delete_chunked)
+            self.archive.prune()
+
+        deleted = self.apply_retention(conn)
+
+        pages = 0
+        vacuum_interval = self.optimization.get('vacuum_interval', 168) * 3600
+        if self.optimization.get('auto_vacuum', False) and time.time() - self._last_vacuum >= vacuum_interval:
+            pages = self.incremental_vacuum(conn)
+            self._last_vacuum = time.time()
+
+        if self.optimization.get('index_optimization', True):
+            conn.execute("PRAGMA optimize")
+
+        with self._metrics_lock:
+            self._runs += 1
+            for table, count in deleted.items():
+                self._deleted[table] = self._deleted.get(table, 0) + count
+            for table, count in archived.items():
+                self._archived[table] = self._archived.get(table, 0) + count
+            self._pages_freed += pages
+            self._last_run = datetime.now().isoformat()
+            self._last_run_ms = (time.perf_counter() - start) * 1000
+        return {'archived': archived, 'deleted': deleted, 'pages_freed': pages}
+
+    def _columns(self, conn, table):
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+    def _targets(self, conn, logical):
+        """Tabelas físicas de `logical` que existem neste banco"""
+        targets = []
+        for table, column, clock in TABLE_TARGETS.get(logical, []):
+            columns = self._columns(conn, table)
+            if column in columns:
+                targets.append((table, column, clock, columns))
+        return targets
+
+    def ensure_indexes(self, conn):
+        """CREATE INDEX IF NOT EXISTS para as colunas de database.tables"""
+        created = []
+        for logical, spec in self.tables.items():
+            for table, _, _, columns in self._targets(conn, logical):
+                for name in spec.get('indexes', []):
+                    column = COLUMN_ALIASES.get(name, name)
+                    if column not in columns:
+                        continue
+                    index = f"idx_{table}_{column}"
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table}({column})")
+                    created.append(index)
+        conn.commit()
+        return created
+
+    def apply_retention(self, conn):
+        """Remove linhas expiradas em lotes de `chunk_size`, cada um em sua transação"""
+        deleted = {}
+        for logical, key in RETENTION_KEYS.items():
+            days = self.retention_policy.get(key)
+            if not days:
+                continue
+            primary_key = self.tables.get(logical, {}).get('primary_key', 'id')
+            for table, column, clock, _ in self._targets(conn, logical):
+                cutoff = retention_cutoff(days, clock)
+                deleted[table] = self.delete_chunked(
+                    conn, table, f'{column} < ?', (cutoff,), primary_key=primary_key
+                )
+        return deleted
+
+    def delete_chunked(self, conn, table, condition, params, primary_key='id'):
+        """DELETE ... WHERE `condition` em lotes de `chunk_size`, cada um em sua transação"""
+        total = 0
+        statement = (
+            f"DELETE FROM {table} WHERE {primary_key} IN ("
+            f"SELECT {primary_key} FROM {table} WHERE {condition} LIMIT ?)"
+        )
+        while not self._stop.is_set():
+            cursor = conn.execute(statement, (*params, self.chunk_size))
+            conn.commit()
+            total += cursor.rowcount
+            if cursor.rowcount < self.chunk_size:
+                break
+            # Libera o lock de escrita entre lotes
+            time.sleep(self.chunk_pause)
+        return total
+
+    def incremental_vacuum(self, conn):
+        """Devolve ao sistema as páginas livres (só em bancos com auto_vacuum=INCREMENTAL)"""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Converter exige um VACUUM completo: não é feito em segundo plano
+            if not self._vacuum_warned:
+                logger.warning(f"{self.db_path} sem auto_vacuum=INCREMENTAL; vacuum incremental "
+                               f"ignorado. Com a aplicação parada: python sqlite_maintenance.py {self.db_path}")
+                self._vacuum_warned = True
+            return 0
+
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute(f"PRAGMA incremental_vacuum({self.incremental_vacuum_pages})").fetchall()
+        conn.commit()
+        free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return free_before - free_after
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'db_path': self.db_path,
+                'runs': self._runs,
+                'last_run': self._last_run,
+                'last_run_ms': round(self._last_run_ms, 2),
+                'rows_deleted': dict(self._deleted),
+                'rows_archived': dict(self._archived),
+                'pages_freed': self._pages_freed
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Converte bancos SQLite existentes para auto_vacuum=INCREMENTAL (VACUUM completo)"
+    )
+    parser.add_argument('databases', nargs='+', help="Arquivos .db (com a aplicação parada)")
+    args = parser.parse_args()
+
+    for db_path in args.databases:
+        start = time.perf_counter()
+        if convert_to_incremental(db_path):
+            print(f"✓ {db_path} convertido ({time.perf_counter() - start:.1f} s)")
+        else:
+            print(f"○ {db_path} já usa auto_vacuum=INCREMENTAL")
+
+
+if __name__ == "__main__":
+    main()
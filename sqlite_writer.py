@@ -0,0 +1,225 @@
+"""
+Escritor SQLite com group commit
+
+Uma thread dedicada consome uma fila limitada e grava as linhas com
+`executemany` em uma única transação por intervalo de flush ou tamanho de
+lote, em vez de um INSERT + commit (fsync) por leitura.
+
+Durabilidade configurável:
+    'off'    - PRAGMA synchronous=OFF (mais rápido; perde dados em queda de energia)
+    'normal' - PRAGMA synchronous=NORMAL (padrão)
+    'full'   - PRAGMA synchronous=FULL
+`write(..., wait=True)` bloqueia até a linha estar commitada.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITER = {
+    'batch_size': 256,
+    'flush_interval_ms': 1000,
+    'max_queue': 10000,
+    'durability': 'normal'
+}
+
+SYNCHRONOUS_LEVELS = {'off': 'OFF', 'normal': 'NORMAL', 'full': 'FULL'}
+
+
+def sqlite_timestamp(moment=None):
+    """Timestamp UTC no mesmo formato do CURRENT_TIMESTAMP do SQLite"""
+    moment = moment or datetime.now(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class _FlushMarker:
+    """Item de controle: sinaliza quando tudo antes dele foi commitado"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+
+class SQLiteBatchWriter:
+    """Thread de escrita com fila limitada e commit em grupo"""
+
+    def __init__(self, db_path, batch_size=256, flush_interval_ms=1000,
+                 max_queue=10000, durability='normal', connection_factory=None):
+        if durability not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"durability deve ser um de {list(SYNCHRONOUS_LEVELS)}")
+
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, flush_interval_ms / 1000.0)
+        self.durability = durability
+        # Ex.: SQLiteConnectionManager.writer (conexão própria da thread de escrita)
+        self.connection_factory = connection_factory
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._statements = {}
+        self._hooks = defaultdict(list)
+        self._thread = None
+        self._running = False
+
+        self._metrics_lock = threading.Lock()
+        self._flushes = 0
+        self._rows_written = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def register_table(self, table, columns):
+        """Declara as colunas gravadas em uma tabela (ordem das tuplas em write)"""
+        placeholders = ', '.join('?' for _ in columns)
+        self._statements[table] = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        )
+
+    def add_flush_hook(self, table, hook):
+        """
+        `hook(conn, rows)` roda na mesma transação, após os INSERTs da
+        tabela (ex.: manter agregados).
+        """
+        self._hooks[table].append(hook)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Grava o que estiver pendente e encerra a thread"""
+        if not self._running:
+            return
+        self.flush(timeout=timeout)
+        self._running = False
+        self._thread.join(timeout=timeout)
+
+    def write(self, table, row, wait=False, block=True, timeout=None):
+        """
+        Enfileira uma linha. Com a fila cheia bloqueia (block=True) ou
+        levanta queue.Full. Com wait=True só retorna após o commit.
+        """
+        if table not in self._statements:
+            raise KeyError(f"Tabela nao registrada no escritor: {table}")
+        self._queue.put((table, tuple(row)), block=block, timeout=timeout)
+        if wait:
+            self.flush(timeout=timeout)
+
+    def flush(self, timeout=None):
+        """Bloqueia até que tudo enfileirado antes da chamada esteja commitado"""
+        marker = _FlushMarker()
+        self._queue.put(marker, timeout=timeout)
+        if not marker.event.wait(timeout):
+            raise TimeoutError("Timeout aguardando flush do escritor SQLite")
+        if marker.error:
+            raise marker.error
+
+    def _connect(self):
+        if self.connection_factory is not None:
+            conn = self.connection_factory()
+        else:
+            conn = sqlite3.connect(self.db_path)
+        # Transações explícitas (BEGIN/COMMIT) controladas pelo escritor
+        conn.isolation_level = None
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS_LEVELS[self.durability]}")
+        return conn
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        items = [first]
+        if isinstance(first, _FlushMarker):
+            return items
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            if isinstance(item, _FlushMarker):
+                break
+        return items
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while self._running or not self._queue.empty():
+                items = self._collect()
+                if items:
+                    self._commit(conn, items)
+        finally:
+            if self.connection_factory is None:
+                conn.close()
+
+    def _commit(self, conn, items):
+        markers = [item for item in items if isinstance(item, _FlushMarker)]
+        rows_by_table = defaultdict(list)
+        for item in items:
+            if not isinstance(item, _FlushMarker):
+                rows_by_table[item[0]].append(item[1])
+
+        error = None
+        if rows_by_table:
+            start = time.perf_counter()
+            try:
+                conn.execute("BEGIN")
+                for table, rows in rows_by_table.items():
+                    conn.executemany(self._statements[table], rows)
+                    for hook in self._hooks[table]:
+                        hook(conn, rows)
+                conn.execute("COMMIT")
+            except Exception as e:
+                error = e
+                logger.error(f"Erro no flush do escritor SQLite: {e}")
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            n_rows = sum(len(rows) for rows in rows_by_table.values())
+            with self._metrics_lock:
+                self._flushes += 1
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+                if error:
+                    self._errors += 1
+                else:
+                    self._rows_written += n_rows
+
+        for marker in markers:
+            marker.error = error
+            marker.event.set()
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'durability': self.durability,
+                'flushes': self._flushes,
+                'rows_written': self._rows_written,
+                'errors': self._errors,
+                'last_flush_ms': round(self._last_flush_ms, 2),
+                'max_flush_ms': round(self._max_flush_ms, 2),
+                'avg_flush_ms': round(self._total_flush_ms / self._flushes, 2) if self._flushes else 0
+            }
@@ -10,6 +10,9 @@ document.addEventListener('DOMContentLoaded', function() {
     const conditionResult = document.getElementById('condition-result');
     const locationResult = document.getElementById('location-result');
 
+    // Socket.IO (opcional): recebe o resultado do job sem polling
+    const socket = window.io ? io() : null;
+
     // Exibir preview da imagem quando selecionada
     imageInput.addEventListener('change', function(event) {
         const file = event.target.files[0];
@@ -41,12 +44,8 @@ document.addEventListener('DOMContentLoaded', function() {
         // Mostrar indicador de carregamento
         document.body.style.cursor = 'wait';
         
-        // Enviar para o servidor
-        fetch('/upload', {
-            method: 'POST',
-            body: formData
-        })
-        .then(response => response.json())
+        // Enviar para o servidor como job assíncrono
+        analisarImagem(formData)
         .then(data => {
             // Processar a resposta
             if (data.error) {
@@ -67,6 +66,71 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Cria o job de análise e aguarda o resultado
+    function analisarImagem(formData) {
+        if (socket && socket.id) {
+            formData.append('sid', socket.id);
+        }
+        
+        return fetch('/api/jobs', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json())
+        .then(job => {
+            if (!job.success) {
+                return { error: job.error };
+            }
+            return aguardarJob(job.job_id);
+        });
+    }
+
+    // Espera o evento 'job_done' do Socket.IO ou consulta o status periodicamente
+    function aguardarJob(jobId) {
+        return new Promise((resolve, reject) => {
+            let timer = null;
+            let concluido = false;
+            
+            function concluir(job) {
+                if (concluido) return;
+                concluido = true;
+                clearTimeout(timer);
+                if (socket) socket.off('job_done', onJobDone);
+                
+                if (job.status === 'error') {
+                    resolve({ error: job.error });
+                } else {
+                    resolve({ results: job.results });
+                }
+            }
+            
+            function onJobDone(job) {
+                if (job.job_id === jobId) concluir(job);
+            }
+            
+            function consultar() {
+                fetch('/api/jobs/' + jobId)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        reject(new Error(data.error));
+                        return;
+                    }
+                    if (data.job.status === 'done' || data.job.status === 'error') {
+                        concluir(data.job);
+                    } else if (!concluido) {
+                        // Com Socket.IO o polling é só um fallback
+                        timer = setTimeout(consultar, socket ? 2000 : 500);
+                    }
+                })
+                .catch(reject);
+            }
+            
+            if (socket) socket.on('job_done', onJobDone);
+            consultar();
+        });
+    }
+
     // Função para exibir os resultados
     function showResults(results) {
         // Preencher os campos de resultado
@@ -0,0 +1,28 @@
+"""Campos numéricos do corpo convertidos antes de chegar ao asyncpg"""
+
+import pytest
+
+from apirest_asgi import converter_numeros
+
+
+def test_texto_numerico_vira_o_tipo_da_coluna():
+    dados = {'moto_id': '1', 'latitude': '-23.5', 'longitude': -46, 'altitude': None}
+    converter_numeros(dados, inteiros=['moto_id'], decimais=['latitude', 'longitude', 'altitude'])
+
+    assert dados == {'moto_id': 1, 'latitude': -23.5, 'longitude': -46.0, 'altitude': None}
+    assert type(dados['moto_id']) is int and type(dados['longitude']) is float
+
+
+@pytest.mark.parametrize('dados', [
+    {'moto_id': 'x'},
+    {'moto_id': 2 ** 40},
+    {'moto_id': True},
+    {'moto_id': 1.5},
+    {'moto_id': [1]},
+    {'latitude': 'abc'},
+    {'latitude': 'NaN'},
+    {'latitude': False},
+])
+def test_valor_invalido_levanta_value_error(dados):
+    with pytest.raises(ValueError):
+        converter_numeros(dados, inteiros=['moto_id'], decimais=['latitude'])
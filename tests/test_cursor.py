@@ -0,0 +1,44 @@
+"""Cursores de paginação: formato validado antes de a consulta chegar ao banco"""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from database_module import codificar_cursor, decodificar_cursor
+
+
+def cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+
+def test_ida_e_volta():
+    momento = datetime(2025, 1, 1, 10, 30, 0, 123456)
+    assert decodificar_cursor(codificar_cursor([momento, 42]), 2) == [momento, 42]
+    assert decodificar_cursor(codificar_cursor([7]), 1) == [7]
+    assert decodificar_cursor(codificar_cursor([2 ** 31 - 1]), 1) == [2 ** 31 - 1]
+
+
+@pytest.mark.parametrize('valores, tamanho', [
+    (["x", 1], 2),
+    (["2025-01-01T00:00:00", "1"], 2),
+    ([1, 1], 2),
+    ([None, 1], 2),
+    (["2025-01-01T00:00:00", 1.5], 2),
+    ([True], 1),
+    (["1"], 1),
+    ([2 ** 63], 1),
+    ([2 ** 31], 1),
+    (["2025-01-01T00:00:00", 2 ** 40], 2),
+    ([1, 2], 1),
+    ({"id": 1}, 1),
+])
+def test_cursor_malformado_levanta_value_error(valores, tamanho):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor(valores), tamanho)
+
+
+def test_cursor_que_nao_e_base64_json():
+    with pytest.raises(ValueError):
+        decodificar_cursor('%%%', 1)
@@ -0,0 +1,48 @@
+"""Erros do micro-batcher viram respostas JSON em /api/detect e /upload"""
+
+import queue
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+from detection_service import create_detection_blueprint
+
+_, PNG = cv2.imencode('.png', np.zeros((8, 8, 3), dtype=np.uint8))
+
+
+class Batcher:
+    """Stand-in do MicroBatcher: o Future nunca é resolvido ou falha com `erro`"""
+
+    def __init__(self, erro=None):
+        self.erro = erro
+
+    def detect(self, frame, timeout=None):
+        future = Future()
+        if isinstance(self.erro, queue.Full):
+            raise self.erro
+        if self.erro is not None:
+            future.set_exception(self.erro)
+        return future.result(timeout=timeout)
+
+
+def cliente(batcher):
+    app = Flask(__name__)
+    app.register_blueprint(create_detection_blueprint(batcher, request_timeout_s=0.01))
+    return app.test_client()
+
+
+@pytest.mark.parametrize('rota', ['/api/detect', '/upload'])
+@pytest.mark.parametrize('erro, status', [
+    (None, 504),
+    (RuntimeError('forward falhou'), 500),
+    (queue.Full(), 503),
+])
+def test_erros_do_lote_retornam_json(rota, erro, status):
+    resposta = cliente(Batcher(erro)).post(rota, data=PNG.tobytes())
+
+    assert resposta.status_code == status
+    assert resposta.is_json
+    assert resposta.get_json()['success'] is False
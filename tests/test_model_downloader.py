@@ -0,0 +1,152 @@
+"""model_downloader contra um servidor HTTP local: Range, retomada e checksum"""
+
+import hashlib
+import os
+import re
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import model_downloader
+from model_downloader import ChecksumMismatchError, ChecksumUnknownError, download
+
+DADOS = os.urandom(1024 * 1024 + 123)
+SHA256 = hashlib.sha256(DADOS).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serve DADOS com suporte a Range. `cortar_apos` encerra cada resposta
+    depois de tantos bytes e `respostas` limita as respostas com dados
+    (as seguintes recebem 503, como um servidor que caiu).
+    """
+
+    def do_GET(self):
+        servidor = self.server
+        faixa = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        sonda = self.headers.get('Range') == 'bytes=0-0'
+        with servidor.lock:
+            caiu = not sonda and servidor.respostas == 0
+            if not sonda and servidor.respostas:
+                servidor.respostas -= 1
+        if caiu:
+            self.send_error(503)
+            return
+        if faixa:
+            inicio = int(faixa.group(1))
+            fim = int(faixa.group(2) or len(DADOS) - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {inicio}-{fim}/{len(DADOS)}')
+        else:
+            inicio, fim = 0, len(DADOS) - 1
+            self.send_response(200)
+        self.send_header('Content-Length', str(fim - inicio + 1))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+
+        corpo = DADOS[inicio:fim + 1]
+        if servidor.cortar_apos is not None and len(corpo) > 1:
+            corpo = corpo[:servidor.cortar_apos]
+        with servidor.lock:
+            servidor.pedidos.append((self.headers.get('Range'), len(corpo)))
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.cortar_apos = None
+    httpd.respostas = None
+    httpd.pedidos = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    # Blocos pequenos: uma resposta cortada ainda grava parte dos dados
+    monkeypatch.setattr(model_downloader, 'CHUNK_SIZE', 16 * 1024)
+    monkeypatch.setattr(model_downloader.time, 'sleep', lambda s: None)
+
+
+def url(servidor):
+    return f'http://127.0.0.1:{servidor.server_address[1]}/yolov3.weights'
+
+
+def test_download_em_partes_com_range(servidor, tmp_path):
+    destino = tmp_path / 'yolov3.weights'
+    digest = download(url(servidor), str(destino), sha256=SHA256, parts=4,
+                      checksums_file=str(tmp_path / 'SHA256SUMS'))
+
+    assert digest == SHA256
+    assert destino.read_bytes() == DADOS
+    faixas = [r for r, _ in servidor.pedidos if r != 'bytes=0-0']
+    assert len(faixas) == 4
+    parte = -(-len(DADOS) // 4)
+    assert sorted(int(re.match(r'bytes=(\d+)-', r).group(1)) for r in faixas) == [
+        0, parte, 2 * parte, 3 * parte]
+    assert not os.path.exists(str(destino) + '.part')
+    assert not os.path.exists(str(destino) + '.part.json')
+
+
+def test_download_interrompido_retoma_de_onde_parou(servidor, tmp_path, monkeypatch):
+    destino = tmp_path / 'yolov3.weights'
+    monkeypatch.setattr(model_downloader, 'MAX_RETRIES', 0)
+    # Uma resposta cortada por parte e o servidor cai
+    servidor.cortar_apos = 100 * 1024
+    servidor.respostas = 2
+
+    with pytest.raises(urllib.error.HTTPError):
+        download(url(servidor), str(destino), sha256=SHA256, parts=2,
+                 checksums_file=str(tmp_path / 'SHA256SUMS'))
+    assert not destino.exists()
+    assert os.path.exists(str(destino) + '.part.json')
+
+    servidor.cortar_apos = None
+    servidor.respostas = None
+    servidor.pedidos.clear()
+    download(url(servidor), str(destino), sha256=SHA256, parts=2,
+             checksums_file=str(tmp_path / 'SHA256SUMS'))
+
+    assert destino.read_bytes() == DADOS
+    retomadas = [(r, n) for r, n in servidor.pedidos if r != 'bytes=0-0']
+    # Cada parte continua depois dos bytes já gravados, não do início
+    inicios = sorted(int(re.match(r'bytes=(\d+)-', r).group(1)) for r, _ in retomadas)
+    metade = -(-len(DADOS) // 2)
+    assert inicios == [100 * 1024, metade + 100 * 1024]
+    assert sum(n for _, n in retomadas) < len(DADOS)
+
+
+def test_checksum_divergente_descarta_o_arquivo(servidor, tmp_path):
+    destino = tmp_path / 'yolov3.weights'
+
+    with pytest.raises(ChecksumMismatchError):
+        download(url(servidor), str(destino), sha256='0' * 64,
+                 checksums_file=str(tmp_path / 'SHA256SUMS'))
+
+    assert not destino.exists()
+    assert not os.path.exists(str(destino) + '.part')
+    assert not os.path.exists(str(destino) + '.part.json')
+
+
+def test_sem_checksum_conhecido_recusa_antes_de_baixar(servidor, tmp_path):
+    destino = tmp_path / 'yolov3.weights'
+    checksums = tmp_path / 'SHA256SUMS'
+
+    with pytest.raises(ChecksumUnknownError):
+        download(url(servidor), str(destino), checksums_file=str(checksums))
+    assert servidor.pedidos == []
+    assert not checksums.exists()
+
+    # Aceito explicitamente: o hash obtido passa a ser o esperado
+    download(url(servidor), str(destino), checksums_file=str(checksums), allow_unverified=True)
+    assert checksums.read_text() == f"{SHA256}  yolov3.weights\n"
@@ -0,0 +1,46 @@
+"""Codificação dos segmentos do arquivo: sem perda, inclusive ao mesclar um dia"""
+
+import os
+
+import numpy as np
+import pytest
+
+from sensor_archive import SensorArchive, decode_values, encode_values
+
+TIMESTAMPS = np.datetime64('2025-01-01T00:00:00', 'us') + np.arange(6) * np.timedelta64(3, 's')
+
+
+@pytest.mark.parametrize('values, encoding', [
+    ([23.4, 23.5, 23.3, 23.3, -4.1, 0.0], 'decimal'),
+    ([1.0, 0.0, 0.0, 1.0, 1.0, 0.0], 'decimal'),
+    ([0.0, 0.5, 1e12, -1e12, 0.25, 3.0], 'decimal'),
+    ([-0.0, 0.5, 1.5, 2.0, 2.5, 3.0], 'xor'),
+    ([0.1 + 0.2, np.pi, 1e300, -np.inf, 5e-324, 2.0], 'xor'),
+])
+def test_valores_voltam_identicos(values, encoding):
+    values = np.array(values, dtype=np.float64)
+    planes, meta = encode_values(values)
+
+    assert meta['encoding'] == encoding
+    decoded = decode_values(planes, meta, values.size)
+    assert np.array_equal(decoded.view('<u8'), values.view('<u8'))
+
+
+def test_segmento_mesclado_mantem_leituras_sem_repetir(tmp_path):
+    values = np.array([20.5, 20.6, 20.6, 21.0, 19.9, 20.0])
+    archive = SensorArchive(str(tmp_path))
+    archive.write_segment('sensor_data', 'temperature', '2025-01-01', TIMESTAMPS, values)
+
+    timestamps, read = archive.read_segment('sensor_data', 'temperature', '2025-01-01')
+    assert np.array_equal(timestamps, TIMESTAMPS)
+    assert np.array_equal(read, values)
+
+    # Reexecução após falha grava de novo o mesmo dia junto com leituras novas
+    archive.write_segment('sensor_data', 'temperature', '2025-01-01',
+                          np.concatenate([TIMESTAMPS, TIMESTAMPS + np.timedelta64(1, 'h')]),
+                          np.concatenate([values, values + 1]))
+    segment_dir = tmp_path / 'sensor_data' / 'temperature' / '2025-01-01'
+    assert sorted(os.listdir(segment_dir)) == ['meta.json', 'segment.npz']
+    timestamps, read = archive.read_segment('sensor_data', 'temperature', '2025-01-01')
+    assert np.array_equal(timestamps, np.concatenate([TIMESTAMPS, TIMESTAMPS + np.timedelta64(1, 'h')]))
+    assert np.array_equal(read, np.concatenate([values, values + 1]))
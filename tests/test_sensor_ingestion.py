@@ -0,0 +1,115 @@
+"""SensorIngestor: lotes devolvidos ao buffer em falha transitória, linha ruim descartada"""
+
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+from sensor_ingestion import SensorIngestor
+
+
+class BancoFalso:
+    """get_connection/copy_expert em memória; falhas programáveis"""
+
+    def __init__(self, pool_esgotado=0, linhas_ruins=()):
+        self.pool_esgotado = pool_esgotado
+        self.linhas_ruins = set(linhas_ruins)
+        self.gravadas = []
+
+    @contextmanager
+    def get_connection(self, somente_leitura=False):
+        if self.pool_esgotado:
+            self.pool_esgotado -= 1
+            raise pool.PoolError("connection pool exhausted")
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, arquivo):
+        linhas = arquivo.getvalue().splitlines()
+        if any(linha.split(',')[0] in self.linhas_ruins for linha in linhas):
+            raise psycopg2.IntegrityError('insert or update violates foreign key constraint')
+        self.gravadas.extend(linhas)
+
+
+def leituras(n, moto_id=1):
+    return [{'moto_id': moto_id, 'tipo_sensor': 'temperatura', 'valor': 20 + i} for i in range(n)]
+
+
+def esperar_gravacao(ing, total, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        m = ing.metricas()
+        if m['gravadas'] + m['descartadas'] >= total and m['buffer'] == 0:
+            return
+        time.sleep(0.01)
+
+
+def ingestor(banco):
+    return SensorIngestor(banco, flush_rows=100, flush_interval_s=0.01, retry_backoff_s=0.01)
+
+
+def test_pool_esgotado_devolve_lote_e_grava_depois():
+    banco = BancoFalso(pool_esgotado=3)
+    ing = ingestor(banco)
+    ing.registrar(leituras(8))
+    ing.start()
+    esperar_gravacao(ing, 8)
+    ing.stop()
+
+    m = ing.metricas()
+    assert len(banco.gravadas) == 8
+    assert m['gravadas'] == 8
+    assert m['descartadas'] == 0
+    assert m['buffer'] == 0
+    assert m['ultimo_erro'] == 'connection pool exhausted'
+
+
+def test_erro_de_dados_descarta_so_a_linha_ruim():
+    banco = BancoFalso(linhas_ruins={'999'})
+    ing = ingestor(banco)
+    ing.registrar(leituras(5) + leituras(1, moto_id=999) + leituras(4))
+    ing.start()
+    esperar_gravacao(ing, 10)
+    ing.stop()
+
+    m = ing.metricas()
+    assert len(banco.gravadas) == 9
+    assert m['gravadas'] == 9
+    assert m['descartadas'] == 1
+
+
+def test_falha_transitoria_durante_isolamento_nao_duplica():
+    banco = BancoFalso(linhas_ruins={'999'})
+    ing = ingestor(banco)
+    lote = [ing.formatar_linha(d) for d in leituras(4) + leituras(1, moto_id=999) + leituras(3)]
+
+    copy_original = ing._copy
+    chamadas = []
+
+    def copy_falhando(linhas):
+        # Primeira metade grava; pool esgota na segunda tentativa do isolamento
+        chamadas.append(len(linhas))
+        if len(chamadas) == 3:
+            raise pool.PoolError("connection pool exhausted")
+        copy_original(linhas)
+
+    ing._copy = copy_falhando
+    ing._buffer.extend(lote)
+    ing.start()
+    esperar_gravacao(ing, 8)
+    ing.stop()
+
+    m = ing.metricas()
+    assert len(banco.gravadas) == 7
+    assert len(set(banco.gravadas)) == 7
+    assert m['gravadas'] == 7
+    assert m['descartadas'] == 1
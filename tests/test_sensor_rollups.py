@@ -0,0 +1,80 @@
+"""Médias dos agregados ignoram leituras nulas, como AVG() nos dados brutos"""
+
+import sqlite3
+
+import pytest
+
+from sensor_rollups import ROLLUP_METRICS, SensorRollups
+
+COLUMNS = ['timestamp'] + ROLLUP_METRICS
+# Duas linhas sem temperatura em um minuto com quatro leituras
+ROWS = [
+    ('2025-01-01 10:00:05', 20.0, 50.0, 0, 100.0, 1),
+    ('2025-01-01 10:00:20', None, 52.0, 1, 110.0, 2),
+    ('2025-01-01 10:00:35', 30.0, None, 0, 120.0, 0),
+    ('2025-01-01 10:00:50', None, 54.0, 1, 130.0, 1),
+]
+START = 1735725600  # 2025-01-01 10:00:00 UTC
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"CREATE TABLE sensor_data (id INTEGER PRIMARY KEY, {', '.join(COLUMNS)})")
+    return conn
+
+
+def insert(conn, rollups, rows):
+    conn.executemany(f"INSERT INTO sensor_data ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    rollups.update(conn, rows)
+    conn.commit()
+
+
+def media(conn, rollups, resolution, metric):
+    return rollups.query(conn, START, START + 3600, resolution)['series'][0][metric]['avg']
+
+
+# 90 s não é múltiplo de nenhum nível: arredondada para 120 s nos agregados por minuto
+@pytest.mark.parametrize('resolution', [90, 60, 3600, 86400])
+def test_media_divide_pelas_leituras_nao_nulas(conn, resolution):
+    rollups = SensorRollups(COLUMNS)
+    rollups.ensure_schema(conn)
+    insert(conn, rollups, ROWS)
+
+    assert media(conn, rollups, resolution, 'temperature') == 25.0
+    assert media(conn, rollups, resolution, 'humidity') == 52.0
+    assert media(conn, rollups, resolution, 'light_level') == 115.0
+
+
+def test_rebuild_e_update_incremental_concordam(conn):
+    rollups = SensorRollups(COLUMNS)
+    rollups.ensure_schema(conn)
+    insert(conn, rollups, ROWS[:2])
+    insert(conn, rollups, ROWS[2:])
+    incremental = rollups.query(conn, START, START + 3600, 60)
+
+    rollups.rebuild(conn)
+    assert rollups.query(conn, START, START + 3600, 60) == incremental
+
+
+
+@pytest.mark.parametrize('resolution, expected', [(1, 60), (90, 120), (150, 120), (5400, 7200), (86400, 86400)])
+def test_resolucao_arredondada_para_um_nivel(conn, resolution, expected):
+    rollups = SensorRollups(COLUMNS)
+    rollups.ensure_schema(conn)
+
+    result = rollups.query(conn, START, START + 3600, resolution)
+    assert result['resolution'] == expected
+    assert result['source'].startswith('sensor_rollup_')
+
+
+def test_intervalo_longo_limita_o_numero_de_pontos(conn):
+    rollups = SensorRollups(COLUMNS)
+    rollups.ensure_schema(conn)
+    insert(conn, rollups, ROWS)
+
+    # Um mês pedido a cada 10 s: no máximo 1440 pontos, lidos dos agregados
+    result = rollups.query(conn, START, START + 30 * 86400, 10)
+    assert result['resolution'] == 1800
+    assert result['source'] == 'sensor_rollup_minute'
+    assert result['series'][0]['temperature']['avg'] == 25.0
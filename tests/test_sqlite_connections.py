@@ -0,0 +1,36 @@
+"""SQLiteConnectionManager: conexões de threads encerradas não se acumulam"""
+
+import os
+import threading
+
+from sqlite_connections import SQLiteConnectionManager
+
+
+def contar_fds():
+    return len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+
+
+def test_conexoes_de_threads_encerradas_sao_fechadas(tmp_path):
+    manager = SQLiteConnectionManager(str(tmp_path / 'teste.db'))
+    manager.writer().execute("CREATE TABLE t (x INTEGER)")
+    manager.writer().commit()
+    fds_antes = contar_fds()
+
+    def requisicao():
+        manager.writer().execute("INSERT INTO t VALUES (1)")
+        manager.writer().commit()
+        manager.reader().execute("SELECT count(*) FROM t").fetchone()
+
+    # Uma thread por requisição, como o servidor threaded do Flask
+    for _ in range(200):
+        t = threading.Thread(target=requisicao)
+        t.start()
+        t.join()
+
+    manager.prune()
+    # Só as conexões da thread principal continuam abertas
+    assert manager.open_connections() == 1
+    assert contar_fds() - fds_antes < 10
+    assert manager.reader().execute("SELECT count(*) FROM t").fetchone()[0] == 200
+    manager.close_all()
+    assert manager.open_connections() == 0
@@ -0,0 +1,194 @@
+"""
+Jobs assíncronos de upload
+
+O upload é decodificado direto da memória (cv2.imdecode), enfileirado e a
+API responde na hora com o id do job. Workers consomem a fila e o cliente
+recebe o resultado por polling (GET /api/jobs/<id>) ou pelo evento
+Socket.IO `job_done`.
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from detection_service import decode_image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_JOBS = {
+    'workers': 2,
+    'queue_limit': 32,
+    'result_ttl_s': 300
+}
+
+
+class UploadJobQueue:
+    """
+    Fila limitada de jobs processados por um pool de workers.
+
+    `process(frame)` retorna o dicionário de resultados do job;
+    `on_complete(job, sid)` é chamado quando o job termina (ex.: emitir Socket.IO).
+    """
+
+    def __init__(self, process, workers=2, queue_limit=32, result_ttl_s=300, on_complete=None):
+        self.process = process
+        self.n_workers = max(1, int(workers))
+        self.result_ttl = result_ttl_s
+        self.on_complete = on_complete
+
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        self._running = False
+
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.n_workers):
+            worker = threading.Thread(target=self._run, name=f'upload-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        self._running = False
+        for worker in self._workers:
+            worker.join(timeout=2)
+        self._workers = []
+
+    def submit(self, frame, sid=None):
+        """Enfileira um frame já decodificado; levanta queue.Full se a fila estiver cheia"""
+        self._expire_jobs()
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'results': None,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, frame, sid))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+                self._rejected += 1
+            raise
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if not k.startswith('_')}
+
+    def _expire_jobs(self):
+        limit = time.time() - self.result_ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get('_finished_ts', float('inf')) < limit
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _run(self):
+        while self._running:
+            try:
+                job_id, frame, sid = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job['status'] = 'processing'
+
+            try:
+                results = self.process(frame)
+                update = {'status': 'done', 'results': results}
+            except Exception as e:
+                logger.error(f"Erro no job {job_id}: {e}")
+                update = {'status': 'error', 'error': str(e)}
+
+            with self._lock:
+                job.update(update)
+                job['finished_at'] = datetime.now().isoformat()
+                job['_finished_ts'] = time.time()
+                if update['status'] == 'done':
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                public_job = {k: v for k, v in job.items() if not k.startswith('_')}
+
+            if self.on_complete:
+                try:
+                    self.on_complete(public_job, sid)
+                except Exception as e:
+                    logger.warning(f"Falha ao notificar job {job_id}: {e}")
+
+    def metrics(self):
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'processing'))
+            return {
+                'workers': self.n_workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_limit': self._queue.maxsize,
+                'pending': pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected
+            }
+
+
+def create_jobs_blueprint(job_queue):
+    """Cria as rotas da API de jobs assíncronos"""
+    jobs_blueprint = Blueprint('upload_jobs', __name__)
+
+    @jobs_blueprint.route('/api/jobs', methods=['POST'])
+    def criar_job():
+        file = request.files.get('image')
+        frame = decode_image(file.read() if file else request.get_data())
+        if frame is None:
+            return jsonify({'success': False, 'error': 'Imagem invalida ou ausente'}), 400
+
+        try:
+            job_id = job_queue.submit(frame, sid=request.form.get('sid'))
+        except queue.Full:
+            response = jsonify({'success': False, 'error': 'Fila de processamento cheia'})
+            response.headers['Retry-After'] = '2'
+            return response, 429
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+
+    @jobs_blueprint.route('/api/jobs/<job_id>', methods=['GET'])
+    def obter_job(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job nao encontrado'}), 404
+        return jsonify({'success': True, 'job': job})
+
+    @jobs_blueprint.route('/api/jobs/metrics', methods=['GET'])
+    def metricas_jobs():
+        return jsonify(job_queue.metrics())
+
+    return jobs_blueprint
@@ -3,7 +3,8 @@ import numpy as np
 import os
 from datetime import datetime
 import json
-import urllib.request
+from model_cache import load_yolo_net
+from model_downloader import YOLO_FILES, download
 
 class YOLOMotorcycleDetector:
     """
@@ -33,13 +34,7 @@ class YOLOMotorcycleDetector:
         """
         print("\nBaixando arquivos YOLO (isso pode demorar alguns minutos)...")
         
-        files = {
-            'yolov3.weights': 'https://pjreddie.com/media/files/yolov3.weights',
-            'yolov3.cfg': 'https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3.cfg',
-            'coco.names': 'https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names'
-        }
-        
-        for filename, url in files.items():
+        for filename, url in YOLO_FILES.items():
             filepath = os.path.join(self.models_folder, filename)
             
             if os.path.exists(filepath):
@@ -48,7 +43,8 @@ class YOLOMotorcycleDetector:
             
             try:
                 print(f"Baixando {filename}...")
-                urllib.request.urlretrieve(url, filepath)
+                download(url, filepath,
+                         checksums_file=os.path.join(self.models_folder, 'SHA256SUMS'))
                 print(f"Download concluido: {filename}")
             except Exception as e:
                 print(f"Erro ao baixar {filename}: {e}")
@@ -85,7 +81,7 @@ class YOLOMotorcycleDetector:
         try:
             # Carregar YOLO
             print("Carregando modelo YOLO...")
-            self.net = cv2.dnn.readNet(weights_path, config_path)
+            self.net = load_yolo_net(weights_path, config_path)
             
             # Verificar se GPU está disponível
             if cv2.cuda.getCudaEnabledDeviceCount() > 0:
@@ -123,15 +119,15 @@ class YOLOMotorcycleDetector:
         """
         print("\n=== DOWNLOAD MANUAL DOS ARQUIVOS YOLO ===")
         print("\n1. YOLOv3 Weights (237 MB):")
-        print("   https://pjreddie.com/media/files/yolov3.weights")
+        print(f"   {YOLO_FILES['yolov3.weights']}")
         print("   Salve em: models/yolov3.weights")
         
         print("\n2. YOLOv3 Config:")
-        print("   https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3.cfg")
+        print(f"   {YOLO_FILES['yolov3.cfg']}")
         print("   Salve em: models/yolov3.cfg")
         
         print("\n3. COCO Names:")
-        print("   https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names")
+        print(f"   {YOLO_FILES['coco.names']}")
         print("   Salve em: models/coco.names")
         
         print("\nApos baixar os arquivos, execute o script novamente.")